@@ -0,0 +1,241 @@
+import argparse
+import os
+import sys
+import json
+import time
+import datetime
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from src.utils import (
+    parse_github_url, CACHE_DIR, INDEX_CACHE_MAX_BYTES, EMBED_BATCH_SIZE, EMBED_THREADS,
+    ISSUE_STAGE_CONCURRENCY, LLM_CACHE_TTL_SECONDS, CONTEXT_TOKEN_BUDGET, FAISS_INDEX_TYPE,
+    DUPLICATE_SIMILARITY_THRESHOLD, CLASSIFIER, CLASSIFY_MODEL, LLM_OPTIONS, clean_workspace
+)
+from src.code_analyzer import get_embeddings
+from src.llm_handler import check_ollama_model, configure_llm_options
+from src.file_filter import configure_file_filter
+from src.metrics import use_metrics
+from main import prepare_index, run_repo_scan
+
+# Per-repo settings a manifest entry (or the manifest's "defaults") may set
+REPO_OPTIONS = {
+    "max_issues": 40,
+    "since_last_scan": False,
+    "resume": False,
+    "full_reindex": False,
+    "context_tokens": CONTEXT_TOKEN_BUDGET,
+    "index_type": FAISS_INDEX_TYPE,
+    "duplicate_threshold": DUPLICATE_SIMILARITY_THRESHOLD,
+}
+
+
+def load_manifest(path: str) -> list:
+    """
+    Reads a batch manifest: a JSON object with a "repos" list and optional
+    "defaults", or just the list. Each entry is a repo URL or an object with
+    "url" plus any of REPO_OPTIONS. Returns one settings dict per repo.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if isinstance(manifest, list):
+        manifest = {"repos": manifest}
+
+    defaults = dict(REPO_OPTIONS, **manifest.get("defaults", {}))
+    entries = []
+    for item in manifest["repos"]:
+        if isinstance(item, str):
+            item = {"url": item}
+        unknown = set(item) - set(REPO_OPTIONS) - {"url"}
+        if unknown:
+            raise ValueError(f"Unknown manifest keys for {item.get('url')}: {', '.join(sorted(unknown))}")
+        parse_github_url(item["url"])  # Fail before any work on a bad URL
+        entries.append(dict(defaults, **item))
+    return entries
+
+
+def write_batch_summary(results: list) -> str:
+    """
+    Writes the combined summary of a batch run: one row per repo.
+    """
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"batch_summary_{timestamp}.md"
+
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write("# 🤖 GitHub Bug Analysis Batch Report\n\n")
+        f.write(f"**Date:** {datetime.datetime.now().isoformat()}\n")
+        f.write(f"**Repositories:** {len(results)}\n\n")
+        f.write("| Repository | Status | Bugs | Skipped | Failed | Time (s) | Report |\n")
+        f.write("|---|---|---|---|---|---|---|\n")
+        for r in results:
+            report = f"[{r['report_file']}]({r['report_file']})" if r.get("report_file") else "-"
+            f.write(f"| {r['repo']} | {r['status']} | {r.get('bug', 0)} | {r.get('skipped', 0)} | "
+                    f"{r.get('failed', 0)} | {r['seconds']:.0f} | {report} |\n")
+        f.write("\n")
+        f.write(f"**Total Bugs Analyzed:** {sum(r.get('bug', 0) for r in results)}\n")
+    return filename
+
+
+def run_batch(entries: list, cache_dir: str = CACHE_DIR, cache_max_bytes: int = INDEX_CACHE_MAX_BYTES,
+              embed_batch_size: int = EMBED_BATCH_SIZE, embed_threads: int = EMBED_THREADS,
+              embedding_cache: bool = True, concurrency: dict = None, llm_cache: bool = True,
+              llm_cache_ttl: float = LLM_CACHE_TTL_SECONDS, metrics_prom_dir: str = None,
+              classification: str = CLASSIFIER, classify_model: str = CLASSIFY_MODEL) -> list:
+    """
+    Scans every repo in 'entries' (see load_manifest) in one process. The
+    embedding model is loaded once and shared, and the next repo is cloned and
+    indexed in a background thread while the current repo's issues are analyzed.
+    A repo that fails to index or to scan (e.g. Ollama went away) is recorded
+    and the batch moves on.
+    Each repo's metrics include the indexing done for it in the background.
+    """
+    embeddings = get_embeddings(
+        cache_dir=cache_dir, batch_size=embed_batch_size,
+        num_threads=embed_threads, use_cache=embedding_cache
+    )
+
+    def prepare(entry):
+        # Runs in its own context: indexing spans go to this repo's metrics,
+        # not to those of the scan running meanwhile
+        metrics = use_metrics()
+        with metrics.span("scan.index"):
+            index_dir = prepare_index(entry["url"], embeddings, cache_dir, cache_max_bytes,
+                                      incremental=not entry["full_reindex"], index_type=entry["index_type"])
+        return index_dir, metrics
+
+    def submit(entry):
+        return prefetch.submit(contextvars.copy_context().run, prepare, entry)
+
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch") as prefetch:
+            next_index = submit(entries[0]) if entries else None
+            for i, entry in enumerate(entries):
+                start = time.perf_counter()
+                print(f"\n=== [{i + 1}/{len(entries)}] {entry['url']} ===")
+                try:
+                    index_dir, metrics = next_index.result()
+                except Exception as e:
+                    index_dir = None
+                    print(f"Error: Could not index {entry['url']}: {e}")
+
+                # Overlap the next repo's clone and indexing with this repo's LLM work
+                if i + 1 < len(entries):
+                    next_index = submit(entries[i + 1])
+
+                owner, repo_name = parse_github_url(entry["url"])
+                if index_dir is None:
+                    results.append({"repo": f"{owner}/{repo_name}", "status": "index failed",
+                                    "seconds": time.perf_counter() - start})
+                    continue
+
+                try:
+                    summary = run_repo_scan(
+                        entry["url"], entry["max_issues"],
+                        cache_dir=cache_dir,
+                        concurrency=concurrency,
+                        llm_cache=llm_cache,
+                        llm_cache_ttl=llm_cache_ttl,
+                        since_last_scan=entry["since_last_scan"],
+                        context_tokens=entry["context_tokens"],
+                        resume=entry["resume"],
+                        embeddings=embeddings,
+                        index_dir=index_dir,
+                        clean_up=False,
+                        metrics=metrics,
+                        metrics_prom_dir=metrics_prom_dir,
+                        duplicate_threshold=entry["duplicate_threshold"],
+                        classification=classification,
+                        classify_model=classify_model,
+                    )
+                except Exception as e:
+                    print(f"Error: Could not scan {entry['url']}: {e}")
+                    results.append({"repo": f"{owner}/{repo_name}", "status": "failed",
+                                    "seconds": time.perf_counter() - start})
+                    continue
+                summary["status"] = "complete" if summary["completed"] else "interrupted"
+                summary["seconds"] = time.perf_counter() - start
+                results.append(summary)
+    finally:
+        clean_workspace()
+    return results
+
+
+def main():
+    load_dotenv()  # Load .env file
+
+    parser = argparse.ArgumentParser(description="GitHub Bug Analyzer AI (Batch Edition)")
+    parser.add_argument(
+        "manifest",
+        type=str,
+        help="JSON manifest listing the repositories to scan and their per-repo limits."
+    )
+    parser.add_argument("--cache-dir", type=str, default=CACHE_DIR,
+                        help="Directory for cached vector indexes, reused across runs.")
+    parser.add_argument("--cache-max-gb", type=float, default=INDEX_CACHE_MAX_BYTES / 1024 ** 3,
+                        help="Maximum size of the index cache.")
+    parser.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE,
+                        help="Number of chunks embedded per model batch.")
+    parser.add_argument("--embed-threads", type=int, default=EMBED_THREADS,
+                        help="CPU threads used by the embedding model (default: torch's default).")
+    parser.add_argument("--no-file-filter", action="store_true",
+                        help="Index every supported file up to the size caps, including vendored, generated and minified files.")
+    parser.add_argument("--no-embedding-cache", action="store_true",
+                        help="Embed every chunk instead of reusing cached chunk embeddings.")
+    for stage in ISSUE_STAGE_CONCURRENCY:
+        parser.add_argument(f"--{stage}-workers", type=int, default=ISSUE_STAGE_CONCURRENCY[stage],
+                            help=f"Issues in the '{stage}' pipeline stage in parallel.")
+    parser.add_argument("--classifier", choices=["tiered", "llm"], default=CLASSIFIER,
+                        help="'tiered': rules, then issue embeddings, then the LLM; 'llm': the LLM for every issue.")
+    parser.add_argument("--classify-model", type=str, default=CLASSIFY_MODEL,
+                        help="Ollama model for LLM classification (default: the analysis model).")
+    parser.add_argument("--analysis-max-tokens", type=int, default=LLM_OPTIONS["analyze"]["num_predict"],
+                        help="Maximum tokens generated per analysis (-1: no limit).")
+    parser.add_argument("--classify-max-tokens", type=int, default=LLM_OPTIONS["classify"]["num_predict"],
+                        help="Maximum tokens generated per classification (-1: no limit).")
+    parser.add_argument("--no-llm-cache", action="store_true",
+                        help="Always call the LLM instead of reusing cached responses.")
+    parser.add_argument("--llm-cache-ttl-days", type=float, default=LLM_CACHE_TTL_SECONDS / 86400,
+                        help="Cached LLM responses older than this are discarded.")
+    parser.add_argument("--metrics-prom-dir", type=str, default=None,
+                        help="Also write each repo's scan metrics as a Prometheus textfile into this directory.")
+    args = parser.parse_args()
+
+    try:
+        entries = load_manifest(args.manifest)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: Invalid manifest {args.manifest}: {e}")
+        sys.exit(1)
+
+    if not os.environ.get("GITHUB_TOKEN"):
+        print("Warning: GITHUB_TOKEN environment variable is not set.")
+        print("You will face severe API rate limits from GitHub.")
+        print("-" * 30)
+
+    if not check_ollama_model() or (args.classify_model and not check_ollama_model(args.classify_model)):
+        print("Please ensure Ollama is running and the required model is pulled.")
+        sys.exit(1)
+
+    configure_file_filter(enabled=not args.no_file_filter)
+    configure_llm_options({"analyze": {"num_predict": args.analysis_max_tokens},
+                           "classify": {"num_predict": args.classify_max_tokens}})
+    results = run_batch(
+        entries,
+        cache_dir=args.cache_dir,
+        cache_max_bytes=int(args.cache_max_gb * 1024 ** 3),
+        embed_batch_size=args.embed_batch_size,
+        embed_threads=args.embed_threads,
+        embedding_cache=not args.no_embedding_cache,
+        concurrency={stage: getattr(args, f"{stage}_workers") for stage in ISSUE_STAGE_CONCURRENCY},
+        llm_cache=not args.no_llm_cache,
+        llm_cache_ttl=args.llm_cache_ttl_days * 86400,
+        metrics_prom_dir=args.metrics_prom_dir,
+        classification=args.classifier,
+        classify_model=args.classify_model,
+    )
+    summary_file = write_batch_summary(results)
+    print(f"\n✅ Batch complete. Combined summary saved to: {summary_file}")
+
+
+if __name__ == "__main__":
+    main()
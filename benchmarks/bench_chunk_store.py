@@ -0,0 +1,206 @@
+"""
+Load time and memory of a saved index: LangChain's pickled docstore
+(FAISS.save_local / load_local) and the JSON lexical index they replaced
+vs. the memory-mapped chunk store and lexical index.
+
+Usage (from the project root):
+    python -m benchmarks.bench_chunk_store --chunks 200000
+
+A synthetic index (random vectors, code-like chunk text with the metadata
+the splitter produces) is saved in both formats. Each format is then loaded
+in its own subprocess, which looks up --lookups random chunks by ID and runs
+--queries vector and BM25 searches, so load time and RSS are measured
+independently.
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+
+import numpy as np
+
+WORDS = ["self", "return", "value", "config", "request", "handler", "result", "index", "None", "def",
+         "if", "for", "in", "raise", "error", "items", "data", "path", "key", "user"]
+RARE_IDENTIFIERS = 50000
+
+
+def _rss_mb() -> float:
+    # Current RSS where /proc exists, else peak RSS
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except OSError:
+        scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def _build(path: str, chunks: int, dim: int, chunk_chars: int, seed: int):
+    import faiss
+    from langchain_core.documents import Document
+    from langchain_community.vectorstores import FAISS
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from src.chunk_store import save_vector_store
+    from src.lexical_index import LexicalIndex
+
+    rng = np.random.default_rng(seed)
+    words = np.array(WORDS)
+    docs = {}
+    for i in range(chunks):
+        text = " ".join(words[rng.integers(0, len(WORDS), size=chunk_chars // 6)])
+        # Rarer identifiers, so BM25 has terms worth scoring
+        text += " " + " ".join(f"ident_{j}" for j in rng.integers(0, RARE_IDENTIFIERS, size=5))
+        chunk_id = f"{i // 20:016x}:{i % 20}"
+        docs[chunk_id] = Document(id=chunk_id, page_content=text, metadata={
+            "source": f"src/module_{i // 20}.py", "start_index": (i % 20) * chunk_chars,
+            "symbols": [f"func_{i}"], "start_line": (i % 20) * 40 + 1, "end_line": (i % 20) * 40 + 40,
+        })
+    index = faiss.IndexFlatL2(dim)
+    index.add(rng.normal(size=(chunks, dim)).astype("float32"))
+    store = FAISS(None, index, InMemoryDocstore(docs), dict(enumerate(docs)))
+    lexical_index = LexicalIndex()
+    lexical_index.add(list(docs), list(docs.values()))
+
+    for fmt in ("pickle", "chunk_store"):
+        out_dir = os.path.join(path, fmt)
+        os.makedirs(out_dir)
+        start = time.perf_counter()
+        if fmt == "pickle":
+            store.save_local(out_dir)
+            # The lexical index's earlier format
+            with open(os.path.join(out_dir, "lexical_index.json"), "w", encoding="utf-8") as f:
+                json.dump({"docs": lexical_index.docs,
+                           "sources": {chunk_id: doc.metadata["source"] for chunk_id, doc in docs.items()},
+                           "symbols": lexical_index.symbols}, f)
+        else:
+            save_vector_store(store, out_dir)
+            lexical_index.save(out_dir)
+        size = sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir))
+        print(f"{fmt}: saved in {time.perf_counter() - start:.2f}s, {size / 1024 ** 2:.1f} MB on disk")
+
+
+class _JsonLexicalIndex:
+    """
+    The lexical index as it was loaded and searched before: the JSON file is
+    parsed in full and inverted into in-memory postings.
+    """
+
+    def __init__(self, index_dir: str):
+        with open(os.path.join(index_dir, "lexical_index.json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.docs, self.symbols = data["docs"], data["symbols"]
+        self.postings = {}
+        for chunk_id, doc in self.docs.items():
+            for term, tf in doc["tf"].items():
+                self.postings.setdefault(term, []).append((chunk_id, tf))
+        self.avg_len = sum(doc["len"] for doc in self.docs.values()) / max(1, len(self.docs))
+
+    def search_bm25(self, query: str, k: int) -> list:
+        from collections import Counter
+        from src.lexical_index import tokenize, BM25_K1, BM25_B, MAX_DOC_FREQ_RATIO
+
+        n = len(self.docs)
+        scores = Counter()
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings or len(postings) > MAX_DOC_FREQ_RATIO * n:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings:
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.docs[chunk_id]["len"] / self.avg_len)
+                scores[chunk_id] += idf * tf * (BM25_K1 + 1) / norm
+        return [chunk_id for chunk_id, _ in scores.most_common(k)]
+
+
+def _run_single(fmt: str, path: str, lookups: int, queries: int, seed: int):
+    from langchain_community.vectorstores import FAISS
+    from src.chunk_store import load_vector_store
+    from src.lexical_index import LexicalIndex
+
+    baseline = _rss_mb()
+    start = time.perf_counter()
+    if fmt == "pickle":
+        store = FAISS.load_local(os.path.join(path, fmt), None, allow_dangerous_deserialization=True)
+    else:
+        store = load_vector_store(os.path.join(path, fmt), None)
+    vector_load_seconds = time.perf_counter() - start
+    if fmt == "pickle":
+        lexical_index = _JsonLexicalIndex(os.path.join(path, fmt))
+    else:
+        lexical_index = LexicalIndex.load(os.path.join(path, fmt))
+    load_seconds = time.perf_counter() - start
+    load_rss = _rss_mb() - baseline
+
+    rng = np.random.default_rng(seed)
+    n = store.index.ntotal
+    latencies = []
+    for row in rng.integers(0, n, size=lookups):
+        start = time.perf_counter()
+        doc = store.docstore.search(store.index_to_docstore_id[int(row)])
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert doc.page_content
+    query_vectors = rng.normal(size=(queries, store.index.d)).astype("float32")
+    start = time.perf_counter()
+    for vector in query_vectors:
+        store.similarity_search_with_score_by_vector(vector, k=10)
+    query_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(queries):
+        terms = [f"ident_{j}" for j in rng.integers(0, RARE_IDENTIFIERS, size=4)] + list(rng.choice(WORDS, size=4))
+        lexical_index.search_bm25(" ".join(terms), 10)
+    bm25_seconds = time.perf_counter() - start
+
+    print(json.dumps({
+        "format": fmt,
+        "chunks": n,
+        "vector_load_seconds": round(vector_load_seconds, 3),
+        "load_seconds": round(load_seconds, 3),
+        "load_rss_mb": round(load_rss, 1),
+        "lookup_p50_ms": round(float(np.median(latencies)), 4),
+        "query_ms": round(query_seconds / max(1, queries) * 1000, 2),
+        "bm25_ms": round(bm25_seconds / max(1, queries) * 1000, 2),
+        "rss_after_mb": round(_rss_mb() - baseline, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pickled docstore vs. chunk store benchmark")
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--single", choices=["pickle", "chunk_store"], help=argparse.SUPPRESS)
+    parser.add_argument("--path", type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        _run_single(args.single, args.path, args.lookups, args.queries, args.seed)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _build(tmp, args.chunks, args.dim, args.chunk_chars, args.seed)
+        results = []
+        for fmt in ("pickle", "chunk_store"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_chunk_store", "--single", fmt, "--path", tmp,
+                 "--lookups", str(args.lookups), "--queries", str(args.queries), "--seed", str(args.seed)],
+                check=True, capture_output=True, text=True,
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"\n{'format':<12} {'chunks':>8} {'vector load s':>14} {'total load s':>13} {'load RSS MB':>12} "
+          f"{'lookup p50 ms':>14} {'query ms':>9} {'bm25 ms':>8} {'RSS after MB':>13}")
+    for r in results:
+        print(f"{r['format']:<12} {r['chunks']:>8} {r['vector_load_seconds']:>14} {r['load_seconds']:>13} "
+              f"{r['load_rss_mb']:>12} {r['lookup_p50_ms']:>14} {r['query_ms']:>9} {r['bm25_ms']:>8} "
+              f"{r['rss_after_mb']:>13}")
+
+
+if __name__ == "__main__":
+    main()
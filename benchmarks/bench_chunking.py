@@ -0,0 +1,124 @@
+"""
+Compares syntax-aware chunking with the recursive character splitter.
+
+Usage (from the project root):
+    python -m benchmarks.bench_chunking --files 2000 --file-kb 8
+    python -m benchmarks.bench_chunking --repo path/to/checkout --fake-embeddings
+
+For each splitter, reports the chunk count, the characters embedded (source
+plus overlap), how many definitions end up whole in a single chunk, and the
+time to split the repo and to build its vector index (embedding + FAISS).
+Index build time uses the real embedding model unless --fake-embeddings is
+given; MiniLM truncates long inputs, so its cost is mostly per chunk.
+"""
+import os
+import time
+import argparse
+import tempfile
+from collections import defaultdict
+
+from benchmarks.synthetic import generate_repo
+
+
+def _definition_ranges(repo_path: str, sources: set) -> dict:
+    """
+    Character ranges of the definitions of each file that fit in one chunk,
+    as found by the syntax-aware splitter.
+    """
+    from src.code_splitter import find_boundaries, _line_offsets
+    from src.utils import CHUNK_SIZE
+
+    ranges = {}
+    for source in sources:
+        with open(os.path.join(repo_path, source), "r", encoding="utf-8") as f:
+            text = f.read()
+        offsets = _line_offsets(text)
+        boundaries = [b for b in find_boundaries(text, os.path.splitext(source)[1]) if b[1]]
+        file_ranges = []
+        for i, (line_index, _) in enumerate(boundaries):
+            start = offsets[line_index]
+            end = offsets[boundaries[i + 1][0]] if i + 1 < len(boundaries) else len(text)
+            # Only the definition's own text; trailing blank lines don't count
+            end = start + len(text[start:end].rstrip())
+            if end - start <= CHUNK_SIZE:
+                file_ranges.append((start, end))
+        ranges[source] = file_ranges
+    return ranges
+
+
+def _run(repo_path: str, syntax_aware: bool, embeddings, workers: int) -> dict:
+    from langchain_community.vectorstores import FAISS
+    from src.code_analyzer import iter_split_batches
+
+    start = time.perf_counter()
+    documents = []
+    for batch in iter_split_batches(repo_path, workers=workers, syntax_aware=syntax_aware):
+        documents.extend(batch)
+    split_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vector_store = None
+    for i in range(0, len(documents), 512):
+        batch = documents[i:i + 512]
+        if vector_store is None:
+            vector_store = FAISS.from_documents(batch, embeddings)
+        else:
+            vector_store.add_documents(batch)
+    build_seconds = time.perf_counter() - start
+
+    spans = defaultdict(list)
+    for doc in documents:
+        spans[doc.metadata["source"]].append((doc.metadata["start_index"], len(doc.page_content)))
+    definitions = _definition_ranges(repo_path, set(spans))
+    total = whole = 0
+    for source, file_ranges in definitions.items():
+        chunks = spans[source]
+        for start, end in file_ranges:
+            total += 1
+            whole += any(s <= start and end <= s + n for s, n in chunks)
+
+    return {
+        "splitter": "syntax" if syntax_aware else "recursive",
+        "chunks": len(documents),
+        "chars": sum(len(d.page_content) for d in documents),
+        "whole": whole / total if total else 1.0,
+        "split_seconds": split_seconds,
+        "build_seconds": build_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunking benchmark")
+    parser.add_argument("--repo", type=str, help="Existing checkout to chunk (default: generate one)")
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--file-kb", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--fake-embeddings", action="store_true", help="Don't load the real embedding model")
+    args = parser.parse_args()
+
+    if args.fake_embeddings:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        embeddings = DeterministicFakeEmbedding(size=384)
+    else:
+        from src.code_analyzer import get_embeddings
+        embeddings = get_embeddings(use_cache=False)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo_path = args.repo
+        if not repo_path:
+            repo_path = os.path.join(tmp, "repo")
+            info = generate_repo(repo_path, num_files=args.files, file_kb=args.file_kb)
+            print(f"Generated {info['files']} files ({info['total_bytes'] / 1024 ** 2:.1f} MB) in {repo_path}")
+        results = [_run(repo_path, syntax_aware, embeddings, args.workers) for syntax_aware in (False, True)]
+
+    print(f"\n{'splitter':<10} {'chunks':>8} {'chars MB':>9} {'whole defs':>11} {'split s':>8} {'index build s':>14}")
+    for r in results:
+        print(f"{r['splitter']:<10} {r['chunks']:>8} {r['chars'] / 1024 ** 2:>9.2f} {r['whole']:>11.1%} "
+              f"{r['split_seconds']:>8.2f} {r['build_seconds']:>14.2f}")
+    base, new = results
+    print(f"\nSyntax-aware: {new['chunks'] / base['chunks'] - 1:+.1%} chunks, "
+          f"{new['build_seconds'] / base['build_seconds'] - 1:+.1%} index build time")
+
+
+if __name__ == "__main__":
+    main()
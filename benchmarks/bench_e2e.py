@@ -0,0 +1,309 @@
+"""
+Offline end-to-end benchmark of run_repo_scan against a fake GitHub and a fake Ollama.
+
+Usage (from the project root):
+    python -m benchmarks.bench_e2e --files 2000 --total-mb 16 --issues 100 --out baseline.json
+    python -m benchmarks.bench_e2e --fake-embeddings --compare baseline.json
+
+Generates a synthetic repo (committed to a local git repo that clones are
+redirected to via GITHUB_CLONE_URL) and a synthetic issue set, serves them
+from local stand-in servers (GITHUB_API_URL, OLLAMA_HOST), and runs the scan
+in a subprocess: once with empty caches ("cold") and once more with the
+caches it left behind ("warm"). Records wall time, peak RSS, per-stage
+timings and throughput as JSON that later runs can be compared against.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+
+from benchmarks.synthetic import generate_repo, generate_noise, LANGUAGE_TEMPLATES
+from benchmarks.fake_servers import FakeGitHub, FakeOllama, generate_issues
+
+REPO_URL = "https://github.com/bench/fixture"
+# Stages compared between runs: span name -> label
+KEY_SPANS = {
+    "clone": "clone",
+    "mirror.fetch": "fetch",
+    "checkout": "checkout",
+    "index.split": "split",
+    "index.embed": "embed",
+    "index.save": "index save",
+    "index.load": "index load",
+    "scan.list_issues": "list issues",
+    "scan.fetch_comments": "comments",
+    "issue.classify": "classify",
+    "issue.retrieve": "retrieve",
+    "issue.analyze": "analyze",
+    "scan.report": "report",
+}
+
+
+def _peak_rss_mb(who) -> float:
+    # ru_maxrss is KB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(who).ru_maxrss / scale
+
+
+def _run_child(config_path: str):
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    from main import run_repo_scan
+    from src.utils import DUPLICATE_SIMILARITY_THRESHOLD
+    from src.llm_handler import configure_llm_options
+    from src.file_filter import configure_file_filter
+    configure_file_filter(enabled=config["file_filter"])
+    if not config["early_stop"]:
+        configure_llm_options({"analyze": {"num_predict": None, "stop": None}})
+    embeddings = None
+    if config["fake_embeddings"]:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        from src.embedding_cache import CachedEmbeddings, open_embedding_store
+        from src.utils import EMBED_BATCH_SIZE
+        embeddings = CachedEmbeddings(
+            DeterministicFakeEmbedding(size=384),
+            open_embedding_store(config["cache_dir"], "fake-embedding"),
+            EMBED_BATCH_SIZE,
+        )
+
+    os.chdir(config["workdir"])
+    start = time.perf_counter()
+    summary = run_repo_scan(
+        REPO_URL, config["max_issues"], cache_dir=config["cache_dir"], embeddings=embeddings,
+        duplicate_threshold=DUPLICATE_SIMILARITY_THRESHOLD if config["duplicate_detection"] else None,
+        classification=config["classifier"]
+    )
+    wall_seconds = time.perf_counter() - start
+
+    with open(summary["metrics_file"], "r", encoding="utf-8") as f:
+        metrics = json.load(f)
+    with open(config["result_path"], "w", encoding="utf-8") as f:
+        json.dump({
+            "wall_seconds": wall_seconds,
+            "peak_rss_mb": _peak_rss_mb(resource.RUSAGE_SELF),
+            "worker_peak_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+            "summary": summary,
+            "metrics": metrics,
+        }, f)
+
+
+def _digest_run(name: str, raw: dict, github_requests: int, ollama_requests: int, ollama_tokens: int) -> dict:
+    """
+    Reduces a child's result to the comparable numbers of the baseline.
+    """
+    metrics = raw["metrics"]
+    spans = metrics["spans"]
+    summary = raw["summary"]
+    issues = summary["bug"] + summary["skipped"] + summary["failed"]
+    analyze = metrics["llm"].get("analyze", {})
+    return {
+        "name": name,
+        "completed": summary["completed"],
+        "wall_seconds": round(raw["wall_seconds"], 3),
+        "peak_rss_mb": round(raw["peak_rss_mb"], 1),
+        "worker_peak_rss_mb": round(raw["worker_peak_rss_mb"], 1),
+        "issues": issues,
+        "bugs": summary["bug"],
+        "duplicates": metrics["counters"].get("issue.duplicates", 0),
+        "issues_per_second": round(issues / spans["scan.issues"]["sum"], 3) if "scan.issues" in spans else None,
+        "chunks_indexed": metrics["counters"].get("index.chunks", 0),
+        "files_indexed": metrics["counters"].get("index.files", 0),
+        "files_skipped": {name.rsplit(".", 1)[1]: value for name, value in metrics["counters"].items()
+                          if name.startswith("index.skipped_files.")},
+        "chunks_embedded_per_second": metrics["derived"].get("chunks_embedded_per_second"),
+        "seconds_per_issue": metrics["derived"].get("seconds_per_issue"),
+        "eval_tokens_per_second_p50": analyze.get("eval_tokens_per_second", {}).get("p50"),
+        "generated_tokens": ollama_tokens,
+        "analyze_seconds_per_bug": (round(spans["issue.analyze"]["sum"] / spans["issue.analyze"]["count"], 3)
+                                    if "issue.analyze" in spans else None),
+        "requests": {"github": github_requests, "ollama": ollama_requests},
+        "stages": {
+            name: {"sum": round(s["sum"], 4), "count": s["count"], "p50": round(s["p50"], 4), "p95": round(s["p95"], 4)}
+            for name, s in spans.items()
+        },
+    }
+
+
+def _commit_fixture(path: str):
+    from git import Repo, Actor
+    repo = Repo.init(path)
+    # Serve partial clones, as GitHub does
+    with repo.config_writer() as config:
+        config.set_value("uploadpack", "allowFilter", "true")
+    repo.git.add(A=True, force=True)  # Commits the noise files .gitignore excludes, too
+    author = Actor("bench", "bench@example.com")
+    repo.index.commit("Synthetic fixture", author=author, committer=author)
+    repo.close()
+
+
+def _print_runs(runs: list, baseline: dict = None):
+    base_runs = {r["name"]: r for r in (baseline or {}).get("runs", [])}
+
+    def cell(value, base):
+        if value is None:
+            return f"{'-':>10}"
+        if base:
+            return f"{value:>10.3f} ({(value - base) / base:+.0%})"
+        return f"{value:>10.3f}"
+
+    for run in runs:
+        base = base_runs.get(run["name"], {})
+        print(f"\n[{run['name']}] {run['issues']} issues ({run['bugs']} bugs, {run.get('duplicates', 0)} duplicates), "
+              f"{run['chunks_indexed']} chunks indexed, requests: {run['requests']}")
+        print(f"  {'wall s':<22} {cell(run['wall_seconds'], base.get('wall_seconds'))}")
+        print(f"  {'peak RSS MB':<22} {cell(run['peak_rss_mb'], base.get('peak_rss_mb'))}")
+        print(f"  {'issues/s':<22} {cell(run['issues_per_second'], base.get('issues_per_second'))}")
+        print(f"  {'chunks embedded/s':<22} "
+              f"{cell(run['chunks_embedded_per_second'], base.get('chunks_embedded_per_second'))}")
+        print(f"  {'generated tokens':<22} {cell(run.get('generated_tokens'), base.get('generated_tokens'))}")
+        print(f"  {'analyze s / bug':<22} "
+              f"{cell(run.get('analyze_seconds_per_bug'), base.get('analyze_seconds_per_bug'))}")
+        for span, label in KEY_SPANS.items():
+            if span in run["stages"]:
+                base_sum = base.get("stages", {}).get(span, {}).get("sum")
+                print(f"  {label + ' s (total)':<22} {cell(run['stages'][span]['sum'], base_sum)}")
+        if run.get("files_skipped"):
+            print(f"  files indexed: {run['files_indexed']}, skipped: " + ", ".join(
+                f"{reason} {files}" for reason, files in sorted(run["files_skipped"].items())))
+        tiers = {name.split(".", 1)[1]: stage for name, stage in run["stages"].items() if name.startswith("classify.")}
+        if tiers:
+            print("  classified by: " + ", ".join(
+                f"{tier} {stage['count']} (p50 {stage['p50'] * 1000:.1f} ms)" for tier, stage in sorted(tiers.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end scan benchmark")
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--total-mb", type=float, default=8.0, help="Approximate size of the synthetic repo")
+    parser.add_argument("--languages", type=str, default=",".join(LANGUAGE_TEMPLATES),
+                        help="Comma-separated file extensions to generate")
+    parser.add_argument("--issues", type=int, default=50)
+    parser.add_argument("--bug-ratio", type=float, default=0.6)
+    parser.add_argument("--comments-per-issue", type=int, default=2)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.0,
+                        help="Share of issues that repeat an earlier issue's title and body")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0, help="Fixed overhead per LLM request")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Fake model generation rate")
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=2000.0)
+    parser.add_argument("--analysis-tokens", type=int, default=400)
+    parser.add_argument("--ramble-tokens", type=int, default=0,
+                        help="Tokens the fake model keeps generating after </ANALYSIS>")
+    parser.add_argument("--no-early-stop", action="store_true",
+                        help="Analyze without the stop sequence and token limit")
+    parser.add_argument("--noise-files", type=int, default=0,
+                        help="Vendored, generated, minified and encoded files added to the repo")
+    parser.add_argument("--no-file-filter", action="store_true", help="Index the noise files too")
+    parser.add_argument("--runs", choices=["cold", "warm", "both"], default="both")
+    parser.add_argument("--fake-embeddings", action="store_true", help="Don't load the real embedding model")
+    parser.add_argument("--no-duplicate-detection", action="store_true")
+    parser.add_argument("--label-ratio", type=float, default=0.0, help="Share of issues with a type label")
+    parser.add_argument("--classifier", choices=["tiered", "llm"], default="tiered")
+    parser.add_argument("--out", type=str, help="Write the results as a JSON baseline")
+    parser.add_argument("--compare", type=str, help="Baseline JSON to compare against")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--child", type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _run_child(args.child)
+        return
+
+    from src.utils import OLLAMA_MODEL
+
+    config = {k: v for k, v in vars(args).items() if k not in ("out", "compare", "child")}
+    with tempfile.TemporaryDirectory() as tmp:
+        fixture = os.path.join(tmp, "mirrors", "bench", "fixture")
+        file_kb = max(1, int(args.total_mb * 1024 / args.files))
+        info = generate_repo(fixture, num_files=args.files, file_kb=file_kb,
+                             languages=args.languages.split(","), seed=args.seed)
+        if args.noise_files:
+            noise = generate_noise(fixture, args.noise_files, seed=args.seed)
+            print(f"Noise: {noise['files']} files ({noise['total_bytes'] / 1024 ** 2:.1f} MB)")
+        _commit_fixture(fixture)
+        issues, comments = generate_issues(info["symbols"], args.issues, args.bug_ratio,
+                                           args.comments_per_issue, seed=args.seed,
+                                           duplicate_ratio=args.duplicate_ratio, label_ratio=args.label_ratio)
+        print(f"Fixture: {info['files']} files ({info['total_bytes'] / 1024 ** 2:.1f} MB), "
+              f"{len(issues)} issues, {len(comments)} comments")
+
+        workdir = os.path.join(tmp, "run")
+        os.makedirs(workdir)
+        with FakeGitHub(issues, comments) as github, FakeOllama(
+            OLLAMA_MODEL, latency=args.llm_latency_ms / 1000, token_rate=args.tokens_per_second,
+            prompt_rate=args.prompt_tokens_per_second, analysis_tokens=args.analysis_tokens,
+            ramble_tokens=args.ramble_tokens,
+        ) as ollama:
+            env = dict(
+                os.environ,
+                GITHUB_API_URL=github.url,
+                GITHUB_CLONE_URL=f"file://{os.path.join(tmp, 'mirrors')}/{{owner}}/{{repo}}",
+                GITHUB_TOKEN="bench",
+                OLLAMA_HOST=ollama.url,
+            )
+            names = ["cold", "warm"] if args.runs == "both" else [args.runs]
+            runs = []
+            for name in names:
+                child_config = os.path.join(tmp, f"{name}.json")
+                result_path = os.path.join(tmp, f"{name}.result.json")
+                with open(child_config, "w", encoding="utf-8") as f:
+                    json.dump({
+                        "workdir": workdir,
+                        "cache_dir": os.path.join(tmp, "cache"),
+                        "max_issues": args.issues,
+                        "fake_embeddings": args.fake_embeddings,
+                        "duplicate_detection": not args.no_duplicate_detection,
+                        "classifier": args.classifier,
+                        "early_stop": not args.no_early_stop,
+                        "file_filter": not args.no_file_filter,
+                        "result_path": result_path,
+                    }, f)
+
+                github_before, ollama_before, tokens_before = github.requests, ollama.requests, ollama.eval_tokens
+                print(f"Running {name} scan...")
+                out = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_e2e", "--child", child_config],
+                    env=env, capture_output=True, text=True,
+                )
+                if out.returncode != 0 or not os.path.exists(result_path):
+                    print(out.stdout[-4000:])
+                    print(out.stderr[-4000:])
+                    sys.exit(f"The {name} scan failed.")
+                with open(result_path, "r", encoding="utf-8") as f:
+                    raw = json.load(f)
+                runs.append(_digest_run(name, raw, github.requests - github_before,
+                                        ollama.requests - ollama_before, ollama.eval_tokens - tokens_before))
+
+    result = {
+        "benchmark": "e2e",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": config,
+        "runs": runs,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print("Warning: the baseline was recorded with a different configuration.")
+    _print_runs(runs, baseline)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Recall@k vs. memory vs. query latency of the FAISS index types (Flat, HNSW, IVF-PQ).
+
+Usage (from the project root):
+    python -m benchmarks.bench_faiss --vectors 200000
+    python -m benchmarks.bench_faiss --store cache/embeddings/<slug>   # real cached embeddings
+
+Indexes are built the way create_vector_store builds them (a flat index
+converted with src.faiss_index.convert_index), then searched with a sweep of
+nprobe / efSearch values. Recall@k is measured against exact Flat results.
+The default corpus is synthetic: clustered Gaussian vectors in 384
+dimensions, roughly the shape of sentence embeddings of code chunks.
+"""
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+import faiss
+
+from src.faiss_index import convert_index, tune_index
+
+
+def _synthetic_vectors(n: int, d: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, d)).astype("float32")
+    labels = rng.integers(0, clusters, size=n)
+    vectors = centers[labels] + 0.6 * rng.normal(size=(n, d)).astype("float32")
+    return vectors.astype("float32")
+
+
+def _stored_vectors(store_dir: str, limit: int) -> np.ndarray:
+    with open(os.path.join(store_dir, "meta.json"), "r", encoding="utf-8") as f:
+        dim = json.load(f)["dim"]
+    vectors = np.fromfile(os.path.join(store_dir, "vectors.f32"), dtype="float32").reshape(-1, dim)
+    return np.ascontiguousarray(vectors[:limit])
+
+
+def _search(index, queries: np.ndarray, k: int) -> tuple:
+    """
+    Searches one query at a time, as the retriever does. Returns (ids, latencies in ms).
+    """
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    latencies = []
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, found = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids[i] = found[0]
+    return ids, sorted(latencies)
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS index type benchmark")
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--store", type=str, help="Embedding cache store directory to take vectors from")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.store:
+        corpus = _stored_vectors(args.store, args.vectors + args.queries)
+    else:
+        corpus = _synthetic_vectors(args.vectors + args.queries, args.dim, args.clusters, args.seed)
+    # Held-out vectors serve as queries
+    vectors, queries = corpus[:-args.queries], corpus[-args.queries:]
+    n, d = vectors.shape
+    print(f"Corpus: {n} vectors x {d} dims, {len(queries)} queries, recall@{args.k} vs. exact search\n")
+
+    flat = faiss.IndexFlatL2(d)
+    flat.add(vectors)
+    truth, _ = _search(flat, queries, args.k)
+
+    configs = [
+        ("flat", None, None, [None]),
+        ("hnsw", None, "efSearch", [16, 64, 128]),
+        ("ivfpq", None, "nprobe", [4, 16, 64]),
+        ("ivfpq", "sq8", "nprobe", [4, 16, 64]),
+    ]
+    print(f"{'index':<10} {'knob':<14} {'recall@' + str(args.k):>9} {'memory MB':>10} {'bytes/vec':>10} "
+          f"{'build s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for index_type, refine, knob, values in configs:
+        start = time.perf_counter()
+        index = convert_index(flat, index_type, refine=refine)
+        build_seconds = time.perf_counter() - start
+        memory = len(faiss.serialize_index(index))
+
+        for value in values:
+            if knob == "efSearch":
+                tune_index(index, ef_search=value)
+            elif knob == "nprobe":
+                tune_index(index, nprobe=value)
+            found, latencies = _search(index, queries, args.k)
+            knob_str = f"{knob}={value}" if knob else "-"
+            name = f"{index_type}+{refine}" if refine else index_type
+            print(f"{name:<10} {knob_str:<14} {_recall(found, truth):>9.3f} {memory / 1024 ** 2:>10.1f} "
+                  f"{memory / n:>10.0f} {build_seconds:>8.1f} {latencies[len(latencies) // 2]:>8.3f} "
+                  f"{latencies[int(len(latencies) * 0.95) - 1]:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
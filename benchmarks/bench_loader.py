@@ -0,0 +1,110 @@
+"""
+Compares the original single-threaded loader with the streaming process-pool loader.
+
+Usage (from the project root):
+    python -m benchmarks.bench_loader --files 5000 --file-kb 8
+    python -m benchmarks.bench_loader --repo path/to/checkout
+
+Each loader runs in its own subprocess so peak RSS is measured independently.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+
+from benchmarks.synthetic import generate_repo
+
+
+def _legacy_load(repo_path: str) -> int:
+    """The loader as it was before streaming: load everything, then split."""
+    from langchain_community.document_loaders import TextLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from src.code_analyzer import SUPPORTED_EXTENSIONS
+    from src.utils import CHUNK_SIZE, CHUNK_OVERLAP
+
+    all_docs = []
+    for root, _, files in os.walk(repo_path):
+        if ".git" in root:
+            continue
+        for file in files:
+            if any(file.endswith(ext) for ext in SUPPORTED_EXTENSIONS):
+                docs = TextLoader(os.path.join(root, file), encoding="utf-8").load()
+                all_docs.extend(docs)
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return len(splitter.split_documents(all_docs))
+
+
+def _streaming_load(repo_path: str, workers: int) -> int:
+    from src.code_analyzer import iter_split_batches
+
+    chunk_count = 0
+    for batch in iter_split_batches(repo_path, workers=workers):
+        # Stand-in for the embedder: the batch is dropped once consumed
+        chunk_count += len(batch)
+    return chunk_count
+
+
+def _peak_rss_mb(who) -> float:
+    # ru_maxrss is KB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(who).ru_maxrss / scale
+
+
+def _run_single(mode: str, repo_path: str, workers: int):
+    start = time.perf_counter()
+    if mode == "legacy":
+        chunks = _legacy_load(repo_path)
+    else:
+        chunks = _streaming_load(repo_path, workers)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "mode": mode,
+        "chunks": chunks,
+        "wall_seconds": round(elapsed, 3),
+        "peak_rss_mb": round(_peak_rss_mb(resource.RUSAGE_SELF), 1),
+        "worker_peak_rss_mb": round(_peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Repo loader benchmark")
+    parser.add_argument("--repo", type=str, help="Existing checkout to load (default: generate one)")
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--file-kb", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--single", choices=["legacy", "streaming"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        _run_single(args.single, args.repo, args.workers)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo_path = args.repo
+        if not repo_path:
+            repo_path = os.path.join(tmp, "repo")
+            info = generate_repo(repo_path, num_files=args.files, file_kb=args.file_kb)
+            print(f"Generated {info['files']} files ({info['total_bytes'] / 1024 ** 2:.1f} MB) in {repo_path}")
+
+        results = []
+        for mode in ("legacy", "streaming"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_loader", "--single", mode,
+                 "--repo", repo_path, "--workers", str(args.workers)],
+                check=True, capture_output=True, text=True,
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"\n{'mode':<10} {'chunks':>8} {'wall s':>8} {'peak RSS MB':>12} {'worker RSS MB':>14}")
+    for r in results:
+        print(f"{r['mode']:<10} {r['chunks']:>8} {r['wall_seconds']:>8} {r['peak_rss_mb']:>12} {r['worker_peak_rss_mb']:>14}")
+
+
+if __name__ == "__main__":
+    main()
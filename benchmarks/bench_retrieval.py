@@ -0,0 +1,115 @@
+"""
+Retrieval quality and latency: vector-only (MMR) vs. hybrid (vector + BM25 + symbols).
+
+Usage (from the project root):
+    python -m benchmarks.bench_retrieval --files 500 --queries 200
+    python -m benchmarks.bench_retrieval --fake-embeddings   # no model download; latency only
+
+Builds a synthetic fixture repo, indexes it, and asks bug-report style queries
+that name a function. A query is a hit when the file defining that function is
+among the sources of the top-k retrieved chunks.
+"""
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+from benchmarks.synthetic import generate_repo
+
+
+def _load_embeddings(fake: bool):
+    if fake:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        return DeterministicFakeEmbedding(size=384)
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    from src.utils import EMBEDDING_MODEL
+    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL, encode_kwargs={"batch_size": 128})
+
+
+def _evaluate(retriever, queries: list, k: int) -> dict:
+    hits, reciprocal_ranks, latencies = 0, [], []
+    for query, expected_source in queries:
+        start = time.perf_counter()
+        docs = retriever.invoke(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        sources = []
+        for doc in docs:
+            source = doc.metadata.get("source")
+            if source not in sources:
+                sources.append(source)
+        sources = sources[:k]
+        if expected_source in sources:
+            hits += 1
+            reciprocal_ranks.append(1 / (sources.index(expected_source) + 1))
+        else:
+            reciprocal_ranks.append(0.0)
+
+    latencies.sort()
+    return {
+        f"hit@{k}": hits / len(queries),
+        "mrr": statistics.mean(reciprocal_ranks),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hybrid retrieval benchmark")
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--file-kb", type=int, default=6)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5, help="Files considered per query")
+    parser.add_argument("--fake-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    from langchain_community.vectorstores import FAISS
+    from src.code_analyzer import iter_split_batches, assign_chunk_ids, HybridRetriever, _mmr_retriever
+    from src.lexical_index import LexicalIndex
+
+    embeddings = _load_embeddings(args.fake_embeddings)
+    with tempfile.TemporaryDirectory() as tmp:
+        info = generate_repo(tmp, num_files=args.files, file_kb=args.file_kb)
+
+        vector_store, lexical_index, chunk_map = None, LexicalIndex(), {}
+        vector_seconds = lexical_seconds = 0.0
+        for batch in iter_split_batches(tmp, workers=1):
+            ids = assign_chunk_ids(batch, chunk_map)
+            start = time.perf_counter()
+            if vector_store is None:
+                vector_store = FAISS.from_documents(batch, embeddings, ids=ids)
+            else:
+                vector_store.add_documents(batch, ids=ids)
+            vector_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            lexical_index.add(ids, batch)
+            lexical_seconds += time.perf_counter() - start
+
+    rng = random.Random(1)
+    queries = []
+    for _ in range(args.queries):
+        source = rng.choice(sorted(info["symbols"]))
+        name = rng.choice(info["symbols"][source])
+        queries.append((f"Calling {name} with a large value crashes instead of returning a result", source))
+
+    print(f"Fixture: {info['files']} files, {sum(len(v) for v in chunk_map.values())} chunks")
+    print(f"Index build: embedding + FAISS {vector_seconds:.2f}s, lexical {lexical_seconds:.2f}s "
+          f"({lexical_seconds / (vector_seconds + lexical_seconds):.1%} of total)")
+    if args.fake_embeddings:
+        print("(fake embeddings: the build-time share and vector quality are not representative)")
+    print()
+
+    print(f"{'retriever':<10} {f'hit@{args.k}':>8} {'MRR':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    with tempfile.TemporaryDirectory() as index_dir:
+        # Retrieval searches the saved, memory-mapped lexical index
+        lexical_index.save(index_dir)
+        for name, retriever in [("vector", _mmr_retriever(vector_store)),
+                                ("hybrid", HybridRetriever(vector_store, LexicalIndex.load(index_dir)))]:
+            r = _evaluate(retriever, queries, args.k)
+            print(f"{name:<10} {r[f'hit@{args.k}']:>8.2f} {r['mrr']:>6.2f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Per-issue latency of the analyzer service against a fake GitHub and a fake Ollama.
+
+Usage (from the project root):
+    python -m benchmarks.bench_service --files 500 --issues 30
+    python -m benchmarks.bench_service --burst 200 --queue-size 20
+
+Starts service.AnalyzerService in-process on a synthetic repo (see bench_e2e),
+indexes the repo once, then delivers 'issues opened' webhooks one at a time
+and measures each job's latency next to the time its LLM calls took: with
+the index, model and clients resident, the difference is the service's own
+overhead. A burst of webhooks then shows the bounded queue turning requests
+away (HTTP 503) instead of growing, and a push event times an index refresh.
+Embeddings are fake unless --real-embeddings is given; the LLM cache is off.
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+import threading
+import statistics
+import urllib.request
+import urllib.error
+
+from benchmarks.synthetic import generate_repo, LANGUAGE_TEMPLATES
+from benchmarks.fake_servers import FakeGitHub, FakeOllama, generate_issues
+from benchmarks.bench_e2e import REPO_URL, _commit_fixture
+
+
+def _post(url: str, payload: dict, headers: dict = None) -> tuple:
+    request = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"), method="POST",
+                                     headers=dict({"Content-Type": "application/json"}, **(headers or {})))
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def _get(url: str) -> dict:
+    with urllib.request.urlopen(url) as response:
+        return json.load(response)
+
+
+def _wait(base_url: str, job_id: str, poll: float = 0.01) -> dict:
+    while True:
+        job = _get(f"{base_url}/jobs/{job_id}")
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(poll)
+
+
+def _llm_seconds(metrics) -> float:
+    return sum(series.sum for name, series in metrics.spans.items() if name.startswith("llm."))
+
+
+def _webhook(issue: dict) -> tuple:
+    payload = {"action": "opened", "issue": issue,
+               "repository": {"html_url": REPO_URL, "default_branch": "main"}}
+    return payload, {"X-GitHub-Event": "issues"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyzer service latency benchmark")
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--total-mb", type=float, default=4.0)
+    parser.add_argument("--issues", type=int, default=30, help="Issues delivered one at a time")
+    parser.add_argument("--burst", type=int, default=100, help="Webhooks delivered at once")
+    parser.add_argument("--queue-size", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--analysis-tokens", type=int, default=400)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.0,
+                        help="Share of issues that repeat an earlier issue's title and body")
+    parser.add_argument("--real-embeddings", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from src.utils import OLLAMA_MODEL, EMBED_BATCH_SIZE
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixture = os.path.join(tmp, "mirrors", "bench", "fixture")
+        file_kb = max(1, int(args.total_mb * 1024 / args.files))
+        info = generate_repo(fixture, num_files=args.files, file_kb=file_kb,
+                             languages=list(LANGUAGE_TEMPLATES), seed=args.seed)
+        _commit_fixture(fixture)
+        issues, comments = generate_issues(info["symbols"], args.issues + args.burst, seed=args.seed,
+                                           duplicate_ratio=args.duplicate_ratio)
+        workdir = os.path.join(tmp, "run")
+        os.makedirs(workdir)
+        cache_dir = os.path.join(tmp, "cache")
+
+        with FakeGitHub(issues, comments) as github, FakeOllama(
+            OLLAMA_MODEL, latency=args.llm_latency_ms / 1000, token_rate=args.tokens_per_second,
+            analysis_tokens=args.analysis_tokens,
+        ) as ollama:
+            os.environ.update(
+                GITHUB_API_URL=github.url,
+                GITHUB_CLONE_URL=f"file://{os.path.join(tmp, 'mirrors')}/{{owner}}/{{repo}}",
+                GITHUB_TOKEN="bench",
+                OLLAMA_HOST=ollama.url,
+            )
+            os.chdir(workdir)
+
+            from service import AnalyzerService, serve
+            from src.llm_handler import configure_llm_cache
+            configure_llm_cache(cache_dir, enabled=False)
+            embeddings = None
+            if not args.real_embeddings:
+                from langchain_core.embeddings import DeterministicFakeEmbedding
+                from src.embedding_cache import CachedEmbeddings, open_embedding_store
+                embeddings = CachedEmbeddings(DeterministicFakeEmbedding(size=384),
+                                              open_embedding_store(cache_dir, "fake-embedding"), EMBED_BATCH_SIZE)
+
+            service = AnalyzerService(cache_dir=cache_dir, workers=args.workers, queue_size=args.queue_size,
+                                      embeddings=embeddings)
+            server = serve(service, "127.0.0.1", 0)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+            try:
+                _, accepted = _post(f"{base_url}/refresh", {"repo": REPO_URL})
+                job = _wait(base_url, accepted["job"])
+                print(f"Initial index: {job['seconds']:.2f}s ({info['files']} files)")
+
+                latencies, llm_times, duplicates = [], [], 0
+                for issue in issues[:args.issues]:
+                    llm_before = _llm_seconds(service.metrics)
+                    status, accepted = _post(f"{base_url}/webhook", *_webhook(issue))
+                    job = _wait(base_url, accepted["job"])
+                    latencies.append(job["finished_at"] - job["submitted_at"])
+                    llm_times.append(_llm_seconds(service.metrics) - llm_before)
+                    duplicates += job["result"].get("duplicate_of") is not None
+
+                overheads = sorted(l - m for l, m in zip(latencies, llm_times))
+                latencies.sort()
+                llm_times.sort()
+                print(f"\nSequential webhooks ({len(latencies)} issues, {duplicates} answered as duplicates):")
+                print(f"  {'':<22} {'p50 s':>8} {'p95 s':>8}")
+                for label, values in (("job latency", latencies), ("LLM time", llm_times),
+                                      ("service overhead", overheads)):
+                    print(f"  {label:<22} {statistics.median(values):>8.3f} "
+                          f"{values[max(0, int(len(values) * 0.95) - 1)]:>8.3f}")
+
+                start = time.perf_counter()
+                statuses, job_ids = [], []
+                for issue in issues[args.issues:]:
+                    status, accepted = _post(f"{base_url}/webhook", *_webhook(issue))
+                    statuses.append(status)
+                    if status == 202:
+                        job_ids.append(accepted["job"])
+                for job_id in job_ids:
+                    _wait(base_url, job_id, poll=0.05)
+                burst_seconds = time.perf_counter() - start
+                print(f"\nBurst of {args.burst} webhooks (queue size {args.queue_size}, {args.workers} workers): "
+                      f"{statuses.count(202)} accepted, {statuses.count(503)} refused with 503, "
+                      f"accepted jobs done in {burst_seconds:.1f}s")
+
+                status, accepted = _post(f"{base_url}/webhook",
+                                         {"ref": "refs/heads/main",
+                                          "repository": {"html_url": REPO_URL, "default_branch": "main"}},
+                                         {"X-GitHub-Event": "push"})
+                job = _wait(base_url, accepted["job"])
+                print(f"Push refresh (no changes): {job['seconds']:.2f}s, index changed: {job['result']['changed']}")
+            finally:
+                server.shutdown()
+                server.server_close()
+                service.stop()
+                os.chdir(os.path.dirname(workdir))
+
+
+if __name__ == "__main__":
+    main()
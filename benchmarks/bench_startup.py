@@ -0,0 +1,108 @@
+"""
+CLI startup time and import-time regression check.
+
+Usage (from the project root):
+    python -m benchmarks.bench_startup --runs 10
+    python -m benchmarks.bench_startup --max-seconds 0.5   # exit 1 if --help gets slower
+
+Times fresh interpreters for `main.py --help`, `batch --help`, a scan that
+fails the Ollama check (OLLAMA_HOST pointed at a closed port) and the import
+a loader worker process pays (src.code_analyzer). It then lists the slowest
+imports of `import main` (python -X importtime) and fails if importing main
+or batch pulls in any of HEAVY_MODULES, which must only be imported at first use.
+"""
+import os
+import sys
+import socket
+import argparse
+import statistics
+import subprocess
+import time
+
+# Modules that take 0.1s or more to import (torch: seconds) and are only needed once work starts
+HEAVY_MODULES = [
+    "torch", "sentence_transformers", "faiss", "numpy", "langchain_core", "langchain_community",
+    "langchain_text_splitters", "ollama", "requests", "git", "tqdm",
+]
+
+
+def _closed_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _time(cmd: list, runs: int, env: dict = None) -> list:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _slowest_imports(module: str, top: int) -> list:
+    """
+    (cumulative microseconds, module) of the top-level imports of 'module', slowest first.
+    """
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         capture_output=True, text=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and not name.startswith("    "):
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def _leaked_heavy_modules(module: str) -> list:
+    code = (f"import sys, {module}; "
+            f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return out.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI startup benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports of main to list")
+    parser.add_argument("--max-seconds", type=float, help="Fail if the median `main.py --help` exceeds this")
+    args = parser.parse_args()
+
+    env = dict(os.environ, OLLAMA_HOST=f"http://127.0.0.1:{_closed_port()}", GITHUB_TOKEN="bench")
+    cases = [
+        ("python (no imports)", [sys.executable, "-c", "pass"], None),
+        ("main.py --help", [sys.executable, "main.py", "--help"], None),
+        ("batch --help", [sys.executable, "-m", "batch", "--help"], None),
+        ("scan, Ollama down", [sys.executable, "main.py", "https://github.com/bench/fixture"], env),
+        ("loader worker import", [sys.executable, "-c", "import src.code_analyzer"], None),
+    ]
+    print(f"{'case':<22} {'median s':>9} {'min s':>7}")
+    medians = {}
+    for name, cmd, case_env in cases:
+        timings = _time(cmd, args.runs, case_env)
+        medians[name] = statistics.median(timings)
+        print(f"{name:<22} {medians[name]:>9.3f} {min(timings):>7.3f}")
+
+    print("\nSlowest imports of `import main` (cumulative):")
+    for micros, name in _slowest_imports("main", args.top):
+        print(f"  {micros / 1000:>8.1f} ms  {name}")
+
+    failed = False
+    for module in ("main", "batch"):
+        leaked = _leaked_heavy_modules(module)
+        if leaked:
+            failed = True
+            print(f"\nFAIL: `import {module}` imports {', '.join(leaked)}; import these at first use instead.")
+    if args.max_seconds is not None and medians["main.py --help"] > args.max_seconds:
+        failed = True
+        print(f"\nFAIL: `main.py --help` took {medians['main.py --help']:.3f}s (limit {args.max_seconds}s).")
+    if failed:
+        sys.exit(1)
+    print("\nNo heavy modules are imported at startup.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Local stand-ins for the GitHub REST API and the Ollama chat API, for offline benchmarks.
+
+FakeGitHub serves a fixed set of issues and comments with pagination (Link
+headers), ETags / 304s and rate limit headers. FakeOllama answers /api/tags and
+/api/chat, sleeping to simulate a model with a given latency and token rates.
+"""
+import re
+import json
+import time
+import random
+import hashlib
+import datetime
+import threading
+from urllib.parse import urlparse, parse_qs, urlencode
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+LABELS = {"BUG": "bug", "FEATURE": "enhancement", "QUESTION": "question"}
+ISSUE_KINDS = {
+    "BUG": ("{name} crashes with a large value", "Calling `{name}` in `{path}` raises an overflow error "
+            "instead of returning a result.\n\nSteps: call {name}(10**6)."),
+    "FEATURE": ("Feature request: make {name} configurable", "It would be nice if `{name}` accepted an option."),
+    "QUESTION": ("Question about {name}", "How is `{name}` meant to be used?"),
+}
+
+
+def generate_issues(symbols: dict, num_issues: int, bug_ratio: float = 0.6,
+                    comments_per_issue: int = 2, seed: int = 0,
+                    duplicate_ratio: float = 0.0, label_ratio: float = 0.0) -> tuple[list, list]:
+    """
+    Builds GitHub-shaped issue and comment JSON for a synthetic repo
+    ('symbols' as returned by generate_repo). Returns (issues, comments),
+    issues newest first. A 'duplicate_ratio' share of issues repeat the
+    title and body of an earlier issue, and a 'label_ratio' share carry a
+    type label ("bug", "enhancement", "question").
+    """
+    rng = random.Random(seed)
+    base = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    paths = sorted(symbols)
+    issues, comments = [], []
+    for number in range(1, num_issues + 1):
+        kind = "BUG" if rng.random() < bug_ratio else rng.choice(["FEATURE", "QUESTION"])
+        path = rng.choice(paths)
+        name = rng.choice(symbols[path])
+        title, body = ISSUE_KINDS[kind]
+        title, body = title.format(name=name, path=path), body.format(name=name, path=path)
+        if issues and rng.random() < duplicate_ratio:
+            original = rng.choice(issues)
+            title, body = original["title"], original["body"]
+        created = base + datetime.timedelta(hours=number)
+        n_comments = rng.randint(0, comments_per_issue * 2)
+        issues.append({
+            "number": number,
+            "title": title,
+            "body": body,
+            "html_url": f"https://github.com/bench/fixture/issues/{number}",
+            "state": "open",
+            "labels": [{"name": LABELS[kind]}] if rng.random() < label_ratio else [],
+            "comments": n_comments,
+            "created_at": created.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "updated_at": created.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        })
+        for c in range(n_comments):
+            comments.append({
+                "issue_url": f"https://api.github.com/repos/bench/fixture/issues/{number}",
+                "user": {"login": f"user{c}"},
+                "body": f"I can reproduce this with {name} as well.",
+                "created_at": (created + datetime.timedelta(minutes=c + 1)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            })
+    issues.reverse()
+    return issues, comments
+
+
+class _Server:
+    def __init__(self, handler_class):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+        self.httpd.daemon_threads = True
+        self.httpd.app = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, body, headers: dict = None):
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class _GitHubHandler(_Handler):
+    def do_GET(self):
+        app = self.server.app
+        app.count()
+        parsed = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        per_page = int(query.get("per_page", 30))
+        page = int(query.get("page", 1))
+
+        match = re.fullmatch(r"/repos/[^/]+/[^/]+/issues(?:/(\d+))?(/comments)?", parsed.path)
+        if not match:
+            return self._send_json(404, {"message": "Not Found"})
+        number, comments = match.groups()
+        since = query.get("since", "")
+        if number and not comments:
+            issue = next((i for i in app.issues if i["number"] == int(number)), None)
+            if issue is None:
+                return self._send_json(404, {"message": "Not Found"})
+            return self._send_json(200, issue)
+        if number and comments:
+            items = [c for c in app.comments if c["issue_url"].endswith(f"/{number}")]
+        elif comments:
+            items = sorted((c for c in app.comments if c["created_at"] >= since), key=lambda c: c["created_at"],
+                           reverse=query.get("direction") == "desc")
+        else:
+            state = query.get("state", "open")
+            items = [i for i in app.issues if (state == "all" or i["state"] == state) and i["updated_at"] >= since]
+
+        body = items[(page - 1) * per_page:page * per_page]
+        headers = {"X-RateLimit-Remaining": str(max(0, 5000 - app.requests))}
+        if page * per_page < len(items):
+            next_query = dict(query, page=page + 1)
+            headers["Link"] = f'<{app.url}{parsed.path}?{urlencode(next_query)}>; rel="next"'
+
+        etag = '"' + hashlib.sha1(json.dumps([body, headers.get("Link")]).encode()).hexdigest() + '"'
+        headers["ETag"] = etag
+        if self.headers.get("If-None-Match") == etag:
+            return self._send_json(304, None, headers)
+        self._send_json(200, body, headers)
+
+
+class FakeGitHub(_Server):
+    """
+    Serves /repos/<owner>/<repo>/issues, /issues/<n>, /issues/comments and /issues/<n>/comments.
+    """
+
+    def __init__(self, issues: list, comments: list):
+        super().__init__(_GitHubHandler)
+        self.issues = issues
+        self.comments = comments
+
+
+class _OllamaHandler(_Handler):
+    def do_GET(self):
+        app = self.server.app
+        if urlparse(self.path).path != "/api/tags":
+            return self._send_json(404, {"error": "not found"})
+        self._send_json(200, {"models": [{"model": app.model, "name": app.model, "size": 0}]})
+
+    def do_POST(self):
+        app = self.server.app
+        app.count()
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if urlparse(self.path).path != "/api/chat":
+            return self._send_json(404, {"error": "not found"})
+        if not request.get("stream"):
+            return self._send_json(200, app.respond(request))
+
+        # NDJSON lines in HTTP chunks, one per token, like Ollama's streaming API
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for chunk in app.stream(request):
+                line = json.dumps(chunk).encode("utf-8") + b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading; so does generation
+            app.count_cancelled()
+            self.close_connection = True
+
+
+class FakeOllama(_Server):
+    """
+    Answers chat requests like llama3 would, in shape only. Classification
+    requests (format=json) get a type guessed from the issue title; other
+    requests get an <ANALYSIS> block of 'analysis_tokens' tokens, followed by
+    'ramble_tokens' more (a model that keeps going after the closing tag).
+    The options "stop" and "num_predict" are honored, and "stream": true
+    sends one chunk per token, stopping when the client disconnects.
+    Each reply takes latency + prompt_tokens / prompt_rate + output_tokens / token_rate
+    seconds, with ~4 characters counted per prompt token. 'eval_tokens'
+    counts the tokens generated across all requests.
+    """
+
+    def __init__(self, model: str, latency: float = 0.05, token_rate: float = 200.0,
+                 prompt_rate: float = 2000.0, analysis_tokens: int = 400, ramble_tokens: int = 0):
+        super().__init__(_OllamaHandler)
+        self.model = model
+        self.latency = latency
+        self.token_rate = token_rate
+        self.prompt_rate = prompt_rate
+        self.analysis_tokens = analysis_tokens
+        self.ramble_tokens = ramble_tokens
+        self.eval_tokens = 0
+        self.cancelled = 0
+
+    def count_cancelled(self):
+        with self._lock:
+            self.cancelled += 1
+
+    def _count_tokens(self, n: int):
+        with self._lock:
+            self.eval_tokens += n
+
+    def _generate(self, request: dict) -> tuple:
+        """
+        (prompt_tokens, output tokens, done_reason) for a request.
+        """
+        prompt = "".join(m.get("content", "") for m in request.get("messages", []))
+        prompt_tokens = len(prompt) // 4 + 1
+        user_text = request["messages"][-1]["content"].lower()
+
+        if request.get("format") == "json":
+            kind = "BUG" if "crash" in user_text else ("FEATURE" if "feature" in user_text else "QUESTION")
+            return prompt_tokens, [json.dumps({"type": kind})], "stop"
+
+        candidates = (["<ANALYSIS>\n"] + ["token "] * max(0, self.analysis_tokens - 4) + ["\n</ANALYSIS>"]
+                      + [" and more"] * self.ramble_tokens)
+        options = request.get("options") or {}
+        stops = options.get("stop") or []
+        limit = options.get("num_predict")
+        tokens, text = [], ""
+        for token in candidates:
+            if limit is not None and limit >= 0 and len(tokens) >= limit:
+                return prompt_tokens, tokens, "length"
+            combined = text + token
+            cuts = [combined.find(stop) for stop in stops if stop in combined]
+            if cuts:
+                if min(cuts) > len(text):
+                    tokens.append(combined[len(text):min(cuts)])
+                return prompt_tokens, tokens, "stop"
+            tokens.append(token)
+            text = combined
+        return prompt_tokens, tokens, "stop"
+
+    def _stats(self, prompt_tokens: int, eval_tokens: int) -> dict:
+        ns = 1_000_000_000
+        prompt_seconds = prompt_tokens / self.prompt_rate
+        eval_seconds = eval_tokens / self.token_rate
+        return {
+            "total_duration": int((self.latency + prompt_seconds + eval_seconds) * ns),
+            "load_duration": int(self.latency * ns),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_seconds * ns),
+            "eval_count": eval_tokens,
+            "eval_duration": int(eval_seconds * ns),
+        }
+
+    def _message(self, content: str, done: bool) -> dict:
+        return {
+            "model": self.model,
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "message": {"role": "assistant", "content": content},
+            "done": done,
+        }
+
+    def respond(self, request: dict) -> dict:
+        prompt_tokens, tokens, done_reason = self._generate(request)
+        eval_tokens = 8 if request.get("format") == "json" else len(tokens)
+        self._count_tokens(eval_tokens)
+        stats = self._stats(prompt_tokens, eval_tokens)
+        time.sleep(stats["total_duration"] / 1e9)
+        return dict(self._message("".join(tokens), True), done_reason=done_reason, **stats)
+
+    def stream(self, request: dict):
+        prompt_tokens, tokens, done_reason = self._generate(request)
+        time.sleep(self.latency + prompt_tokens / self.prompt_rate)
+        for token in tokens:
+            time.sleep(1 / self.token_rate)
+            self._count_tokens(1)
+            yield self._message(token, False)
+        yield dict(self._message("", True), done_reason=done_reason, **self._stats(prompt_tokens, len(tokens)))
@@ -0,0 +1,95 @@
+import os
+import base64
+import random
+
+# Templates for synthetic source files, one per language
+LANGUAGE_TEMPLATES = {
+    ".py": "def {name}(value):\n    \"\"\"Computes {name}.\"\"\"\n    result = value * {n}\n    if result > {m}:\n        raise ValueError(\"{name} overflow\")\n    return result\n\n",
+    ".js": "function {name}(value) {{\n  // Computes {name}\n  const result = value * {n};\n  if (result > {m}) {{ throw new Error('{name} overflow'); }}\n  return result;\n}}\n\n",
+    ".go": "func {name}(value int) (int, error) {{\n\tresult := value * {n}\n\tif result > {m} {{\n\t\treturn 0, errors.New(\"{name} overflow\")\n\t}}\n\treturn result, nil\n}}\n\n",
+    ".java": "    public int {name}(int value) {{\n        int result = value * {n};\n        if (result > {m}) {{ throw new IllegalStateException(\"{name} overflow\"); }}\n        return result;\n    }}\n\n",
+    ".md": "## {name}\n\nThe `{name}` helper multiplies its input by {n} and fails above {m}.\n\n",
+}
+
+WORDS = [
+    "parse", "load", "fetch", "render", "update", "compute", "resolve", "validate",
+    "user", "article", "comment", "token", "session", "profile", "cache", "index",
+]
+
+
+def generate_repo(path: str, num_files: int = 1000, file_kb: int = 8,
+                  languages: list = None, seed: int = 0) -> dict:
+    """
+    Writes a synthetic source tree of num_files files of roughly file_kb KB each.
+    Returns a summary with the number of files, total bytes and the
+    function names defined in each file.
+    """
+    rng = random.Random(seed)
+    languages = languages or list(LANGUAGE_TEMPLATES)
+    symbols = {}
+    total_bytes = 0
+
+    for i in range(num_files):
+        ext = languages[i % len(languages)]
+        rel_path = f"pkg{i % 20}/module_{i}{ext}"
+        file_path = os.path.join(path, rel_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        parts, names, size = [], [], 0
+        while size < file_kb * 1024:
+            name = f"{rng.choice(WORDS)}_{rng.choice(WORDS)}_{i}_{len(names)}"
+            part = LANGUAGE_TEMPLATES[ext].format(name=name, n=rng.randint(2, 99), m=rng.randint(100, 9999))
+            parts.append(part)
+            names.append(name)
+            size += len(part)
+
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write("".join(parts))
+        symbols[rel_path] = names
+        total_bytes += size
+
+    return {"files": num_files, "total_bytes": total_bytes, "symbols": symbols}
+
+
+def generate_noise(path: str, num_files: int = 200, file_kb: int = 32, seed: int = 0) -> dict:
+    """
+    Adds num_files files that an index gains nothing from, in equal shares:
+    vendored packages (node_modules/), minified bundles, protoc output with a
+    "DO NOT EDIT" header, base64 data modules, files marked
+    linguist-generated in .gitattributes and committed build output the
+    .gitignore excludes. Returns the number of files and their total bytes.
+    """
+    rng = random.Random(seed)
+    kinds = ["vendored", "minified", "protoc", "encoded", "attributes", "ignored"]
+    with open(os.path.join(path, ".gitattributes"), "w", encoding="utf-8") as f:
+        f.write("schema/** linguist-generated\n")
+    with open(os.path.join(path, ".gitignore"), "w", encoding="utf-8") as f:
+        f.write("build/\n")
+
+    total_bytes = 0
+    for i in range(num_files):
+        kind = kinds[i % len(kinds)]
+        body = "".join(LANGUAGE_TEMPLATES[".js"].format(name=f"noise_{i}_{j}", n=j + 2, m=100 + j)
+                       for j in range(file_kb * 1024 // 160))
+        if kind == "vendored":
+            rel_path, text = f"node_modules/pkg{i % 10}/lib/file_{i}.js", body
+        elif kind == "minified":
+            rel_path, text = f"static/app_{i}.js", body.replace("\n", "").replace("  ", "")
+        elif kind == "protoc":
+            rel_path = f"api/service_{i}.go"
+            text = "// Code generated by protoc-gen-go. DO NOT EDIT.\n" + body
+        elif kind == "encoded":
+            data = base64.b64encode(rng.randbytes(file_kb * 768)).decode("ascii")
+            lines = [data[j:j + 76] for j in range(0, len(data), 76)]
+            rel_path, text = f"assets/blob_{i}.js", "const DATA = [\n" + "\n".join(f'"{l}",' for l in lines) + "\n];\n"
+        elif kind == "attributes":
+            rel_path, text = f"schema/types_{i}.ts", body
+        else:
+            rel_path, text = f"build/out_{i}.js", body
+        file_path = os.path.join(path, rel_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        total_bytes += len(text)
+
+    return {"files": num_files, "total_bytes": total_bytes}
@@ -2,159 +2,339 @@ import argparse
 import os
 import sys
 import datetime
+import itertools
 from dotenv import load_dotenv
-from src.utils import parse_github_url, temp_repo_clone, WORKSPACE_DIR, clean_workspace
-from src.github_client import fetch_all_open_issues
-from src.code_analyzer import create_vector_store, find_relevant_code, get_retriever
-from src.llm_handler import check_ollama_model, classify_issue_type, generate_analysis
+from src.utils import (
+    parse_github_url, temp_repo_checkout, get_workspace_dir, CACHE_DIR, INDEX_CACHE_MAX_BYTES,
+    EMBED_BATCH_SIZE, EMBED_THREADS, ISSUE_STAGE_CONCURRENCY, LLM_CACHE_TTL_SECONDS,
+    CONTEXT_TOKEN_BUDGET, FAISS_INDEX_TYPE, FAISS_NPROBE, FAISS_HNSW_EF_SEARCH,
+    DUPLICATE_SIMILARITY_THRESHOLD, CLASSIFIER, CLASSIFY_MODEL, LLM_OPTIONS, clean_workspace
+)
+from src.github_client import GitHubClient
+from src.repo_mirror import sync_mirror
+from src.file_filter import configure_file_filter
+from src.code_analyzer import create_vector_store, find_cached_index, get_retriever, get_embeddings
+from src.llm_handler import check_ollama_model, configure_llm_cache, configure_llm_options, get_llm_cache
+from src.issue_pipeline import iter_issue_reports
+from src.issue_dedup import find_duplicates
+from src.issue_classifier import IssueClassifier
+from src.scan_state import (
+    load_scan_state, save_scan_state, get_last_scan_time, iter_changed_issues, record_issue_result, remap_offsets
+)
+from src.results_log import ResultsLog, get_results_log_path, iter_results, read_result, completed_issue_numbers
+from src.metrics import use_metrics
 
-def write_summary_report(reports: list, repo_name: str, repo_url: str) -> str:
+REPORT_CATEGORIES = ("bug", "skipped", "failed")
+
+def _report_category(report: str) -> str:
+    if report.startswith("Skipped"):
+        return "skipped"
+    if report.startswith("Failed"):
+        return "failed"
+    return "bug"
+
+
+def _iter_final_results(results_log_path: str, run_start: int = 0, stored_offsets: dict = None):
+    """
+    Streams the results to report: each issue's last record in the log from
+    offset 'run_start' on (a resumed scan may have retried it), then the
+    records at 'stored_offsets' (issue number -> offset) of issues not
+    processed in this scan, newest first.
+    Only issue numbers and offsets are held in memory.
+    """
+    last_offset = {}
+    for offset, result in iter_results(results_log_path, run_start):
+        last_offset[result["issue"]["number"]] = offset
+
+    def generate():
+        for offset, result in iter_results(results_log_path, run_start):
+            if last_offset[result["issue"]["number"]] == offset:
+                yield result
+        for number in sorted(stored_offsets or {}, reverse=True):
+            if number not in last_offset:
+                result = read_result(results_log_path, stored_offsets[number])
+                if result is not None and result["issue"]["number"] == number:
+                    yield result
+    return generate
+
+
+def _count_results(results) -> dict:
+    counts = dict.fromkeys(REPORT_CATEGORIES, 0)
+    for item in results():
+        counts[_report_category(item['report'])] += 1
+    return counts
+
+
+def write_summary_report(results, repo_name: str, repo_url: str) -> str:
     """
     Writes all analysis results to a single summary Markdown file.
+    'results' is a callable returning a fresh iterator over the result dicts;
+    the report is written in a few streaming passes over it.
     """
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"analysis_summary_{repo_name}_{timestamp}.md"
     
     print(f"Writing summary report to {filename}...")
+
+    counts = _count_results(results)
+    duplicate_count = 0
+    tiers = {}
+    for item in results():
+        duplicate_count += item.get("duplicate_of") is not None
+        if item.get("classified_by") and item.get("duplicate_of") is None:
+            tiers[item["classified_by"]] = tiers.get(item["classified_by"], 0) + 1
     
     with open(filename, "w", encoding="utf-8") as f:
         f.write(f"# 🤖 GitHub Bug Analysis Report\n\n")
         f.write(f"**Repository:** [{repo_name}]({repo_url})\n")
         f.write(f"**Date:** {datetime.datetime.now().isoformat()}\n")
-        f.write(f"**Total Issues Processed:** {len(reports)}\n\n")
-        
-        bugs = [r for r in reports if "Skipped:" not in r['report'] and "Failed:" not in r['report']]
-        skipped = [r for r in reports if "Skipped:" in r['report']]
-        failed = [r for r in reports if "Failed:" in r['report']]
+        f.write(f"**Total Issues Processed:** {sum(counts.values())}\n\n")
         
         f.write(f"## 📊 Summary\n")
-        f.write(f"- **Bugs Analyzed:** {len(bugs)}\n")
-        f.write(f"- **Non-Bugs Skipped:** {len(skipped)}\n")
-        f.write(f"- **Failed Analyses:** {len(failed)}\n\n")
+        f.write(f"- **Bugs Analyzed:** {counts['bug']}\n")
+        f.write(f"- **Non-Bugs Skipped:** {counts['skipped']}\n")
+        f.write(f"- **Failed Analyses:** {counts['failed']}\n")
+        f.write(f"- **Duplicates (sharing another issue's result):** {duplicate_count}\n")
+        if tiers:
+            f.write(f"- **Classified by:** {', '.join(f'{tier} {n}' for tier, n in sorted(tiers.items()))}\n")
+        f.write("\n")
         
         f.write("---\n\n")
         
-        if bugs:
+        if counts["bug"]:
             f.write("## 🐞 Bug Analyses\n\n")
-            for item in bugs:
+            for item in results():
+                if _report_category(item['report']) != "bug":
+                    continue
                 issue = item['issue']
                 f.write(f"### [BUG] Issue #{issue['number']}: {issue['title']}\n\n")
                 f.write(f"**URL:** {issue['url']}\n\n")
+                if item.get("duplicate_of") is not None:
+                    f.write(f"**Duplicate of:** Issue #{item['duplicate_of']} (same analysis)\n\n")
+                    f.write(f"<details><summary>Analysis</summary>\n\n{item['report']}\n\n</details>\n\n")
+                    f.write("---\n\n")
+                    continue
+                if item.get("duplicates"):
+                    f.write(f"**Duplicates:** {', '.join(f'#{n}' for n in item['duplicates'])}\n\n")
                 f.write(f"{item['report']}\n\n")
                 f.write("---\n\n")
         
-        if skipped:
-            f.write("## ⏩ Skipped Issues (Non-Bugs)\n\n")
-            for item in skipped:
-                issue = item['issue']
-                f.write(f"* **Issue #{issue['number']}:** {issue['title']} ({item['report']})\n")
-                f.write(f"  *URL: {issue['url']}*\n\n")
-
-        if failed:
-            f.write("## ❌ Failed Analyses\n\n")
-            for item in failed:
+        for category, heading in [("skipped", "## ⏩ Skipped Issues (Non-Bugs)"), ("failed", "## ❌ Failed Analyses")]:
+            if not counts[category]:
+                continue
+            f.write(f"{heading}\n\n")
+            for item in results():
+                if _report_category(item['report']) != category:
+                    continue
                 issue = item['issue']
-                f.write(f"* **Issue #{issue['number']}:** {issue['title']} ({item['report']})\n")
+                note = f" Classified by {item['classified_by']}." if item.get("classified_by") else ""
+                if item.get("duplicate_of") is not None:
+                    note = f" Duplicate of #{item['duplicate_of']}."
+                f.write(f"* **Issue #{issue['number']}:** {issue['title']} ({item['report']}){note}\n")
                 f.write(f"  *URL: {issue['url']}*\n\n")
+                if item.get("partial_report"):
+                    f.write(f"  <details><summary>Partial analysis</summary>\n\n{item['partial_report']}\n\n"
+                            "  </details>\n\n")
     
     return filename
 
-def run_repo_scan(repo_url: str, max_issues: int):
+def write_metrics(metrics, owner: str, repo_name: str, prom_dir: str = None) -> str:
     """
-    Main function to run the end-to-end analysis for an entire repository.
+    Writes the scan's metrics JSON (and, with 'prom_dir', a Prometheus textfile).
+    Returns the JSON file name.
     """
-    
-    if not check_ollama_model():
-        print("Please ensure Ollama is running and the required model is pulled.")
-        sys.exit(1)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"analysis_metrics_{repo_name}_{timestamp}.json"
+    metrics.write_json(filename, repo=f"{owner}/{repo_name}")
+    if prom_dir:
+        os.makedirs(prom_dir, exist_ok=True)
+        metrics.write_prometheus(
+            os.path.join(prom_dir, f"bug_analyzer_{owner}__{repo_name}.prom".lower()),
+            labels={"repo": f"{owner}/{repo_name}"}
+        )
+    return filename
 
+def prepare_index(repo_url: str, embeddings, cache_dir: str = CACHE_DIR,
+                  cache_max_bytes: int = INDEX_CACHE_MAX_BYTES, incremental: bool = True,
+                  index_type: str = FAISS_INDEX_TYPE) -> str:
+    """
+    Updates the repository's mirror in cache_dir and reuses the cached index
+    of its latest commit; without one, checks out the files to index, builds
+    the index and removes the checkout again. Returns the index directory.
+    """
+    owner, repo_name = parse_github_url(repo_url)
+    repo_id = f"{owner}/{repo_name}"
+    repo_path = os.path.join(get_workspace_dir(), f"{owner}__{repo_name}")
+    mirror, commit_sha = sync_mirror(repo_url, cache_dir)
     try:
-        owner, repo_name = parse_github_url(repo_url)
-        repo_path = os.path.join(WORKSPACE_DIR, repo_name)
-    except ValueError as e:
-        print(f"Error: {e}")
-        sys.exit(1)
+        index_dir = find_cached_index(repo_id, commit_sha, cache_dir, index_type)
+        if index_dir:
+            return index_dir
+        with temp_repo_checkout(mirror, commit_sha, repo_path) as repo:
+            return create_vector_store(
+                repo, repo_id, embeddings,
+                cache_dir=cache_dir, cache_max_bytes=cache_max_bytes, incremental=incremental,
+                index_type=index_type
+            )
+    finally:
+        mirror.close()
 
-    analysis_reports = []
+def run_repo_scan(repo_url: str, max_issues: int, cache_dir: str = CACHE_DIR,
+                  cache_max_bytes: int = INDEX_CACHE_MAX_BYTES, incremental: bool = True,
+                  embed_batch_size: int = EMBED_BATCH_SIZE, embed_threads: int = EMBED_THREADS,
+                  embedding_cache: bool = True, concurrency: dict = None, llm_cache: bool = True,
+                  llm_cache_ttl: float = LLM_CACHE_TTL_SECONDS, since_last_scan: bool = False,
+                  context_tokens: int = CONTEXT_TOKEN_BUDGET, resume: bool = False,
+                  embeddings=None, index_dir: str = None, clean_up: bool = True,
+                  metrics=None, metrics_prom_dir: str = None, index_type: str = FAISS_INDEX_TYPE,
+                  nprobe: int = FAISS_NPROBE, ef_search: int = FAISS_HNSW_EF_SEARCH,
+                  duplicate_threshold: float = DUPLICATE_SIMILARITY_THRESHOLD,
+                  classification: str = CLASSIFIER, classify_model: str = CLASSIFY_MODEL) -> dict:
+    """
+    Main function to run the end-to-end analysis for an entire repository.
+    'concurrency' maps issue pipeline stages to their parallelism limits.
+    'index_type' selects the FAISS index ('auto' by chunk count); 'nprobe' and
+    'ef_search' tune approximate indexes at query time.
+    With 'since_last_scan', only issues new or updated since the last successful
+    scan are processed and the report merges them with the stored results.
+    Each result is appended to a results log as it finishes, and an analysis
+    still being generated is logged with its text so far every
+    RESULTS_PARTIAL_SECONDS; with 'resume', issues already in the log from an
+    interrupted run are not processed again.
+    Issues at least 'duplicate_threshold' similar to an earlier one (None: no
+    detection) reuse its result and are cross-linked in the report.
+    'classification' is 'tiered' (rules, then issue embeddings, then the LLM;
+    see IssueClassifier) or 'llm'; 'classify_model' is the LLM tier's model.
+
+    Batch runs pass an already loaded 'embeddings' model and a prepared
+    'index_dir', and clean the workspace themselves ('clean_up').
+
+    Stage timings and LLM token statistics are written to a metrics JSON file
+    next to the report, and to a Prometheus textfile in 'metrics_prom_dir' if
+    given. 'metrics' continues a Metrics instance that already holds the
+    indexing spans of a prepared index.
+    Returns a summary dict: repo, report file, completion flag and result counts.
+    Raises ValueError for a bad repo URL and RuntimeError when Ollama or a
+    required model is unavailable, before any work is done.
+    """
+    
+    if not check_ollama_model() or (classify_model and not check_ollama_model(classify_model)):
+        raise RuntimeError("Ollama is not running or a required model is not pulled.")
+    owner, repo_name = parse_github_url(repo_url)
+
+    metrics = use_metrics(metrics)
+    configure_llm_cache(cache_dir, enabled=llm_cache, ttl_seconds=llm_cache_ttl)
+    scan_state = load_scan_state(cache_dir, owner, repo_name)
+    results_log_path = get_results_log_path(cache_dir, owner, repo_name)
+    done_issues = set()
+    results_log = ResultsLog(results_log_path)
+    if resume:
+        run_start = scan_state.get("run_start", 0)
+        done_issues = completed_issue_numbers(results_log_path, run_start)
+        # The interrupted run may have died before saving its scan state
+        for offset, result in iter_results(results_log_path, run_start):
+            record_issue_result(scan_state, result, offset)
+        print(f"Resuming: {len(done_issues)} issues already have results.")
+    else:
+        # Earlier results stay in the log (the scan state refers to them);
+        # this scan's records start after them
+        remap_offsets(scan_state, results_log.compact())
+        run_start = scan_state["run_start"] = results_log.end_offset()
+        save_scan_state(cache_dir, owner, repo_name, scan_state)
+    issue_count = 0
+    since = get_last_scan_time(scan_state) if since_last_scan else None
+    scan_completed = False
+    github = GitHubClient(cache_dir=cache_dir)
+    classifier = None
+    summary = {"repo": f"{owner}/{repo_name}", "report_file": None, "completed": False,
+               "bug": 0, "skipped": 0, "failed": 0}
 
     try:
-        print("--- Step 1: Cloning Repo and Building Vector Store ---")
-        with temp_repo_clone(repo_url, repo_path):
-            create_vector_store(repo_path)
-            retriever = get_retriever() # Load retriever ONCE
+        if embeddings is None:
+            embeddings = get_embeddings(
+                cache_dir=cache_dir, batch_size=embed_batch_size,
+                num_threads=embed_threads, use_cache=embedding_cache
+            )
+        if index_dir is None:
+            print("--- Step 1: Cloning Repo and Building Vector Store ---")
+            with metrics.span("scan.index"):
+                index_dir = prepare_index(repo_url, embeddings, cache_dir, cache_max_bytes, incremental, index_type)
             print("--- Vector store created successfully. ---")
+        retriever = get_retriever(index_dir, embeddings, nprobe=nprobe, ef_search=ef_search) # Load retriever ONCE
+        classifier = IssueClassifier(embeddings, cache_dir, classify_model, tiered=classification == "tiered")
 
-            print("--- Step 2: Fetching and Processing Issues ---")
-            all_issues = fetch_all_open_issues(owner, repo_name)
-            
-            issue_count = 0
-            for issue in all_issues:
-                if issue_count >= max_issues:
-                    print(f"\nReached max issue limit ({max_issues}). Stopping scan.")
-                    break
-                
-                # Skip pull requests, as they are often listed as issues
-                if issue.pull_request:
-                    continue
+        print("--- Step 2: Fetching and Processing Issues ---")
+        scan_started_at = datetime.datetime.now(datetime.timezone.utc)
+        all_issues = github.iter_issues(owner, repo_name, since=since)
+        if since is not None:
+            all_issues = iter_changed_issues(all_issues, scan_state)
+
+        with metrics.span("scan.list_issues"):
+            selected_issues = list(itertools.islice(all_issues, max_issues))
+        issue_count = len(selected_issues)
+        if issue_count == max_issues:
+            print(f"Reached max issue limit ({max_issues}).")
+        if done_issues:
+            selected_issues = [i for i in selected_issues if i["number"] not in done_issues]
+            print(f"Skipping {issue_count - len(selected_issues)} issues finished in the previous run.")
+        duplicates = {}
+        if duplicate_threshold is not None:
+            duplicates = find_duplicates(selected_issues, embeddings, duplicate_threshold)
+            if duplicates:
+                print(f"Found {len(duplicates)} duplicate issues; they reuse the result of the issue they duplicate.")
+        with metrics.span("scan.fetch_comments"):
+            github.fetch_comments_bulk(owner, repo_name, selected_issues)
 
-                print("\n" + "="*50)
-                print(f"Processing Issue #{issue.number}: {issue.title}")
-                print(f"URL: {issue.html_url}")
-
-                # Format comments for the LLM
-                comments_list = []
-                try:
-                    for comment in issue.get_comments():
-                        comments_list.append({"user": comment.user.login, "body": comment.body})
-                except Exception as e:
-                    print(f"Warning: Could not fetch comments for issue #{issue.number}. Error: {e}")
-
-                issue_data = {
-                    "title": issue.title,
-                    "body": issue.body or "", # Ensure body is not None
-                    "comments": comments_list,
-                    "url": issue.html_url,
-                    "number": issue.number
-                }
-
-                try:
-                    # Step 2a: Classify
-                    issue_type = classify_issue_type(issue_data)
-                    
-                    if issue_type == "BUG":
-                        print("Type: BUG. Proceeding with analysis.")
-                        # Step 2b: RAG
-                        issue_full_text = f"Title: {issue.title}\n\nBody: {issue.body}"
-                        code_context = find_relevant_code(issue_full_text, retriever)
-                        
-                        # Step 2c: Analyze
-                        report = generate_analysis(issue_data, code_context)
-                        analysis_reports.append({"issue": issue_data, "report": report})
-                    else:
-                        print(f"Type: {issue_type}. Skipping analysis.")
-                        analysis_reports.append({"issue": issue_data, "report": f"Skipped: Issue classified as {issue_type}."})
-
-                except Exception as e:
-                    print(f"Error processing issue #{issue.number}: {e}")
-                    analysis_reports.append({"issue": issue_data, "report": f"Failed to analyze: {e}"})
-                
-                issue_count += 1
+        def fetch_comments(issue_data):
+            return github.fetch_issue_comments(owner, repo_name, issue_data["number"])
+        
+        with metrics.span("scan.issues"):
+            for report in iter_issue_reports(selected_issues, retriever, fetch_comments, concurrency,
+                                             context_tokens, duplicates, classifier, results_log.append):
+                record_issue_result(scan_state, report, results_log.append(report))
         
         print("\n--- Scan complete. ---")
+        scan_completed = True
+        print(github.usage_summary())
+        cache = get_llm_cache()
+        if cache is not None:
+            print(f"LLM cache: {cache.hits} hits, {cache.misses} model calls.")
 
     except Exception as e:
         print(f"\nAn unexpected error occurred during the scan: {e}")
     finally:
+        # Only a scan that saw every updated issue may move the 'since' mark forward;
+        # if --max-issues cut it short, the rest are picked up next time.
+        if scan_completed and issue_count < max_issues:
+            scan_state["last_scan_at"] = scan_started_at.isoformat()
+        save_scan_state(cache_dir, owner, repo_name, scan_state)
+        results_log.close()
+        if classifier is not None:
+            classifier.save()
+
+        stored_offsets = None
+        if since_last_scan:
+            stored_offsets = {int(key): entry["offset"] for key, entry in scan_state["issues"].items()}
+        results = _iter_final_results(results_log_path, run_start, stored_offsets)
+
         # Generate report even if the scan was interrupted
-        if analysis_reports:
+        summary["completed"] = scan_completed
+        summary.update(_count_results(results))
+        if sum(summary[category] for category in REPORT_CATEGORIES):
             print("--- Step 3: Generating Summary Report ---")
-            report_filename = write_summary_report(analysis_reports, repo_name, repo_url)
-            print(f"✅ Analysis complete. Report saved to: {report_filename}")
+            with metrics.span("scan.report"):
+                summary["report_file"] = write_summary_report(results, repo_name, repo_url)
+            print(f"✅ Analysis complete. Report saved to: {summary['report_file']}")
         else:
             print("No issues were processed. No report generated.")
 
-        # Clean up workspace and vector store
-        clean_workspace()
+        summary["metrics_file"] = write_metrics(metrics, owner, repo_name, metrics_prom_dir)
+        print(f"Metrics saved to: {summary['metrics_file']}")
+
+        # Clean up workspace (cached indexes are kept for the next run)
+        if clean_up:
+            clean_workspace()
+    return summary
 
 def main():
     load_dotenv()  # Load .env file
@@ -171,15 +351,196 @@ def main():
         default=40,
         help="The maximum number of open issues to scan."
     )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=CACHE_DIR,
+        help="Directory for cached vector indexes, reused across runs."
+    )
+    parser.add_argument(
+        "--cache-max-gb",
+        type=float,
+        default=INDEX_CACHE_MAX_BYTES / 1024 ** 3,
+        help="Maximum size of the index cache. Least recently used indexes are evicted beyond this."
+    )
+    parser.add_argument(
+        "--full-reindex",
+        action="store_true",
+        help="Always rebuild the index from scratch instead of updating the last cached one."
+    )
+    parser.add_argument(
+        "--no-file-filter",
+        action="store_true",
+        help="Index every supported file up to the size caps, including vendored, generated and minified files."
+    )
+    parser.add_argument(
+        "--index-type",
+        choices=["auto", "flat", "hnsw", "ivfpq"],
+        default=FAISS_INDEX_TYPE,
+        help="FAISS index type. 'auto' picks Flat, HNSW or IVF-PQ by chunk count."
+    )
+    parser.add_argument(
+        "--nprobe",
+        type=int,
+        default=FAISS_NPROBE,
+        help="Inverted lists searched per query with an IVF-PQ index (higher: better recall, slower)."
+    )
+    parser.add_argument(
+        "--ef-search",
+        type=int,
+        default=FAISS_HNSW_EF_SEARCH,
+        help="Search beam width with an HNSW index (higher: better recall, slower)."
+    )
+    parser.add_argument(
+        "--embed-batch-size",
+        type=int,
+        default=EMBED_BATCH_SIZE,
+        help="Number of chunks embedded per model batch."
+    )
+    parser.add_argument(
+        "--embed-threads",
+        type=int,
+        default=EMBED_THREADS,
+        help="CPU threads used by the embedding model (default: torch's default)."
+    )
+    parser.add_argument(
+        "--no-embedding-cache",
+        action="store_true",
+        help="Embed every chunk instead of reusing cached chunk embeddings."
+    )
+    for stage, help_text in [
+        ("comments", "Issues fetching comments from GitHub in parallel."),
+        ("classify", "Issues being classified by the LLM in parallel."),
+        ("retrieve", "Issues retrieving code context in parallel."),
+        ("analyze", "Issues being analyzed by the LLM in parallel."),
+    ]:
+        parser.add_argument(
+            f"--{stage}-workers",
+            type=int,
+            default=ISSUE_STAGE_CONCURRENCY[stage],
+            help=help_text
+        )
+    parser.add_argument(
+        "--classifier",
+        choices=["tiered", "llm"],
+        default=CLASSIFIER,
+        help="'tiered' classifies issues by labels / templates, then issue embeddings, and asks the "
+             "LLM only when those are not confident; 'llm' asks the LLM about every issue."
+    )
+    parser.add_argument(
+        "--classify-model",
+        type=str,
+        default=CLASSIFY_MODEL,
+        help="Ollama model for LLM classification (default: the analysis model)."
+    )
+    parser.add_argument(
+        "--no-llm-cache",
+        action="store_true",
+        help="Always call the LLM instead of reusing cached responses for identical requests."
+    )
+    parser.add_argument(
+        "--llm-cache-ttl-days",
+        type=float,
+        default=LLM_CACHE_TTL_SECONDS / 86400,
+        help="Cached LLM responses older than this are discarded."
+    )
+    parser.add_argument(
+        "--since-last-scan",
+        action="store_true",
+        help="Only process issues opened or updated since the last successful scan, "
+             "and merge them with the stored results in the report."
+    )
+    parser.add_argument(
+        "--context-tokens",
+        type=int,
+        default=CONTEXT_TOKEN_BUDGET,
+        help="Token budget for the code context in each analysis prompt."
+    )
+    parser.add_argument(
+        "--duplicate-threshold",
+        type=float,
+        default=DUPLICATE_SIMILARITY_THRESHOLD,
+        help="Issues whose title and body embeddings are at least this similar (cosine) "
+             "share one classification and analysis."
+    )
+    parser.add_argument(
+        "--no-duplicate-detection",
+        action="store_true",
+        help="Classify and analyze every issue separately, even near-duplicates."
+    )
+    parser.add_argument(
+        "--analysis-max-tokens",
+        type=int,
+        default=LLM_OPTIONS["analyze"]["num_predict"],
+        help="Maximum tokens generated per analysis (-1: no limit)."
+    )
+    parser.add_argument(
+        "--classify-max-tokens",
+        type=int,
+        default=LLM_OPTIONS["classify"]["num_predict"],
+        help="Maximum tokens generated per classification (-1: no limit)."
+    )
+    parser.add_argument(
+        "--metrics-prom-dir",
+        type=str,
+        default=None,
+        help="Also write scan metrics as a Prometheus textfile into this directory "
+             "(e.g. node_exporter's textfile collector directory)."
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted scan: issues that already have a result in the "
+             "results log are not processed again."
+    )
     
     args = parser.parse_args()
+
+    try:
+        parse_github_url(args.repo_url)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
     
     if not os.environ.get("GITHUB_TOKEN"):
         print("Warning: GITHUB_TOKEN environment variable is not set.")
         print("You will face severe API rate limits from GitHub.")
         print("-" * 30)
 
-    run_repo_scan(args.repo_url, args.max_issues)
+    if not check_ollama_model() or (args.classify_model and not check_ollama_model(args.classify_model)):
+        print("Please ensure Ollama is running and the required model is pulled.")
+        sys.exit(1)
+
+    configure_file_filter(enabled=not args.no_file_filter)
+    configure_llm_options({"analyze": {"num_predict": args.analysis_max_tokens},
+                           "classify": {"num_predict": args.classify_max_tokens}})
+    run_repo_scan(
+        args.repo_url, args.max_issues,
+        cache_dir=args.cache_dir,
+        cache_max_bytes=int(args.cache_max_gb * 1024 ** 3),
+        incremental=not args.full_reindex,
+        embed_batch_size=args.embed_batch_size,
+        embed_threads=args.embed_threads,
+        embedding_cache=not args.no_embedding_cache,
+        concurrency={
+            "comments": args.comments_workers,
+            "classify": args.classify_workers,
+            "retrieve": args.retrieve_workers,
+            "analyze": args.analyze_workers,
+        },
+        llm_cache=not args.no_llm_cache,
+        llm_cache_ttl=args.llm_cache_ttl_days * 86400,
+        since_last_scan=args.since_last_scan,
+        context_tokens=args.context_tokens,
+        resume=args.resume,
+        metrics_prom_dir=args.metrics_prom_dir,
+        index_type=args.index_type,
+        nprobe=args.nprobe,
+        ef_search=args.ef_search,
+        duplicate_threshold=None if args.no_duplicate_detection else args.duplicate_threshold,
+        classification=args.classifier,
+        classify_model=args.classify_model
+    )
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
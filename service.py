@@ -0,0 +1,524 @@
+import argparse
+import os
+import sys
+import hmac
+import json
+import time
+import queue
+import hashlib
+import itertools
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from dotenv import load_dotenv
+from src.utils import (
+    parse_github_url, CACHE_DIR, INDEX_CACHE_MAX_BYTES, CONTEXT_TOKEN_BUDGET, FAISS_INDEX_TYPE,
+    FAISS_NPROBE, FAISS_HNSW_EF_SEARCH, LLM_CACHE_TTL_SECONDS, SERVICE_HOST, SERVICE_PORT,
+    SERVICE_WORKERS, SERVICE_QUEUE_SIZE, SERVICE_JOB_HISTORY, SERVICE_METRICS_WINDOW,
+    SERVICE_RESULTS_COMPACT_EVERY, DUPLICATE_SIMILARITY_THRESHOLD, CLASSIFIER, CLASSIFY_MODEL, LLM_OPTIONS,
+    clean_workspace
+)
+from src.metrics import Metrics, use_metrics, span
+from src.scan_state import load_scan_state, save_scan_state, record_issue_result, remap_offsets
+from src.results_log import ResultsLog, get_results_log_path, iter_results, read_result
+from main import prepare_index
+
+# Issue webhook actions that (re)analyze the issue
+ISSUE_ACTIONS = {"opened", "edited", "reopened"}
+# GitHub caps webhook payloads at 25 MB
+MAX_BODY_BYTES = 25 * 1024 ** 2
+# Seconds a client is asked to wait (Retry-After) when the queue is full
+RETRY_AFTER_SECONDS = 30
+# Longest an /analyze request with "wait" blocks for its result
+MAX_WAIT_SECONDS = 600
+
+
+def _repo_url(repo: str) -> str:
+    # Accepts 'owner/name' as well as a full GitHub URL
+    return repo if "github.com" in repo else f"https://github.com/{repo.strip('/')}"
+
+
+def _job_view(job: dict) -> dict:
+    return {k: v for k, v in job.items() if not k.startswith("_")}
+
+
+class _Repo:
+    """
+    A repo's resident index and result bookkeeping.
+    """
+
+    def __init__(self, url: str, owner: str, name: str):
+        self.url = url
+        self.owner = owner
+        self.name = name
+        self.index_dir = None
+        self.retriever = None
+        self.index_lock = threading.Lock()    # One clone / index build at a time
+        self.results_lock = threading.Lock()
+        self.results_log = None
+        self.scan_state = None
+        self.issue_index = None  # Analyzed issues, to spot duplicates (see issue_dedup)
+
+
+class AnalyzerService:
+    """
+    Long-running analyzer: the embedding model, a GitHub client and each repo's
+    retriever stay loaded between jobs. Jobs ('analyze' an issue, 'refresh' a
+    repo's index) go on a bounded queue served by worker threads; submit()
+    raises queue.Full instead of queueing more than 'queue_size' jobs.
+    A queued job for the same issue (or repo refresh) absorbs newer requests,
+    so bursts of edits or pushes are handled once.
+    Issue stages share one set of concurrency limits across all workers.
+    An issue at least 'duplicate_threshold' similar to one already analyzed
+    reuses that issue's stored result instead of calling the LLM.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, cache_max_bytes: int = INDEX_CACHE_MAX_BYTES,
+                 workers: int = SERVICE_WORKERS, queue_size: int = SERVICE_QUEUE_SIZE,
+                 concurrency: dict = None, context_tokens: int = CONTEXT_TOKEN_BUDGET,
+                 index_type: str = FAISS_INDEX_TYPE, nprobe: int = FAISS_NPROBE,
+                 ef_search: int = FAISS_HNSW_EF_SEARCH, embeddings=None, webhook_secret: str = None,
+                 duplicate_threshold: float = DUPLICATE_SIMILARITY_THRESHOLD,
+                 classification: str = CLASSIFIER, classify_model: str = CLASSIFY_MODEL):
+        from src.code_analyzer import get_embeddings
+        from src.github_client import GitHubClient
+        from src.issue_pipeline import stage_limits
+        from src.issue_classifier import IssueClassifier
+
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self.context_tokens = context_tokens
+        self.index_type = index_type
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.webhook_secret = webhook_secret
+        self.duplicate_threshold = duplicate_threshold
+        self.embeddings = embeddings or get_embeddings(cache_dir=cache_dir)
+        self.github = GitHubClient(cache_dir=cache_dir)
+        self.classifier = IssueClassifier(self.embeddings, cache_dir, classify_model,
+                                          tiered=classification == "tiered")
+        self.limits = stage_limits(concurrency)
+        self.metrics = Metrics(window=SERVICE_METRICS_WINDOW)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.jobs = OrderedDict()  # job id -> job, oldest first
+        self._queued = {}          # (kind, repo, issue number) -> job not yet started
+        self._repos = {}           # 'owner/name' (lowercase) -> _Repo
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._workers = [
+            threading.Thread(target=self._work, name=f"service-{i}", daemon=True) for i in range(max(1, workers))
+        ]
+
+    def start(self):
+        for worker in self._workers:
+            worker.start()
+
+    def stop(self):
+        """
+        Lets the workers finish their current jobs and closes the results logs.
+        Jobs still queued are dropped.
+        """
+        with self._lock:
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+        for _ in self._workers:
+            self.queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        for repo in self._repos.values():
+            if repo.results_log:
+                repo.results_log.close()
+
+    def submit(self, kind: str, repo_url: str, number: int = None, issue: dict = None) -> dict:
+        """
+        Queues an 'analyze' job (issue 'number', or a ready 'issue' dict) or a
+        'refresh' job and returns it. Raises ValueError for a bad repo URL and
+        queue.Full when the queue is at capacity.
+        """
+        owner, name = parse_github_url(repo_url)
+        key = (kind, f"{owner}/{name}".lower(), number if kind == "analyze" else None)
+        # Ad hoc issues without a number are never merged with other jobs
+        mergeable = kind == "refresh" or number is not None
+        with self._lock:
+            job = self._queued.get(key) if mergeable else None
+            if job is not None:
+                if issue is not None:
+                    job["_issue"] = issue  # Analyze the latest version of the issue
+                return job
+
+            job = {
+                "id": str(next(self._ids)),
+                "kind": kind,
+                "repo": f"{owner}/{name}",
+                "number": number,
+                "status": "queued",
+                "submitted_at": time.time(),
+                "_url": repo_url,
+                "_issue": issue,
+                "_key": key,
+                "_done": threading.Event(),
+            }
+            self.queue.put_nowait(job)
+            if mergeable:
+                self._queued[key] = job
+            self.jobs[job["id"]] = job
+            while len(self.jobs) > SERVICE_JOB_HISTORY:
+                self.jobs.popitem(last=False)
+        return job
+
+    def handle_event(self, event: str, payload: dict):
+        """
+        Turns a GitHub webhook event into a job: issue opened / edited /
+        reopened -> analyze, push to the default branch -> refresh.
+        Returns the job, or None for events that need no work.
+        """
+        from src.github_client import issue_from_json
+
+        repository = payload.get("repository") or {}
+        if event == "issues" and payload.get("action") in ISSUE_ACTIONS:
+            issue = issue_from_json(payload["issue"])
+            return self.submit("analyze", repository["html_url"], number=issue["number"], issue=issue)
+        if event == "push" and payload.get("ref") == f"refs/heads/{repository.get('default_branch')}":
+            return self.submit("refresh", repository["html_url"])
+        return None
+
+    def verify_signature(self, body: bytes, signature: str) -> bool:
+        """
+        Checks a webhook's X-Hub-Signature-256 header. Without a configured
+        secret every delivery is accepted.
+        """
+        if not self.webhook_secret:
+            return True
+        expected = "sha256=" + hmac.new(self.webhook_secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature or "")
+
+    def get_job(self, job_id: str):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def health(self) -> dict:
+        with self._lock:
+            statuses = {}
+            for job in self.jobs.values():
+                statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+            repos = {repo_id: repo.index_dir for repo_id, repo in self._repos.items()}
+        return {"queued": self.queue.qsize(), "capacity": self.queue.maxsize, "jobs": statuses, "repos": repos}
+
+    def _repo(self, job: dict) -> _Repo:
+        repo_id = job["_key"][1]
+        with self._lock:
+            if repo_id not in self._repos:
+                owner, name = job["repo"].split("/")
+                self._repos[repo_id] = _Repo(job["_url"], owner, name)
+            return self._repos[repo_id]
+
+    def _load_index(self, repo: _Repo) -> bool:
+        """
+        Fetches the repo's mirror and builds (or incrementally updates) its index, then
+        swaps in a retriever over it. Jobs already holding the old retriever
+        finish with it. Returns whether the index changed. Call with index_lock held.
+        """
+        from src.code_analyzer import get_retriever
+
+        with span("service.index"):
+            index_dir = prepare_index(repo.url, self.embeddings, self.cache_dir, self.cache_max_bytes,
+                                      index_type=self.index_type)
+        if index_dir == repo.index_dir:
+            return False
+        repo.retriever = get_retriever(index_dir, self.embeddings, nprobe=self.nprobe, ef_search=self.ef_search)
+        repo.index_dir = index_dir
+        return True
+
+    def _refresh(self, job: dict) -> dict:
+        repo = self._repo(job)
+        with repo.index_lock:
+            changed = self._load_index(repo)
+        return {"index_dir": repo.index_dir, "changed": changed}
+
+    def _analyze(self, job: dict) -> dict:
+        from src.issue_pipeline import process_issue, shared_result
+
+        repo = self._repo(job)
+        if repo.retriever is None:
+            with repo.index_lock:
+                if repo.retriever is None:
+                    self._load_index(repo)
+        retriever = repo.retriever
+
+        issue = job["_issue"] or self.github.fetch_issue(repo.owner, repo.name, job["number"])
+
+        vector = None
+        if self.duplicate_threshold is not None and issue["number"] is not None:
+            issue_index = self._issue_index(repo)
+            vector = issue_index.embed([issue])[0]
+            with repo.results_lock:
+                original = issue_index.match(vector, exclude=issue["number"])
+                stored = repo.scan_state["issues"].get(str(original)) if original is not None else None
+                if stored is not None:
+                    stored = read_result(repo.results_log.path, stored["offset"])
+            if stored is not None:
+                print(f"Issue #{issue['number']} duplicates issue #{original}. Reusing its result.")
+                result = shared_result(issue, stored)
+                self._record(repo, result)
+                return result
+
+        def fetch_comments(issue_data):
+            return self.github.fetch_issue_comments(repo.owner, repo.name, issue_data["number"])
+
+        def on_partial(partial):
+            # Pollers of /jobs/<id> see the analysis grow. The results log only gets
+            # final records: partials would pile up in a log the service never reopens.
+            job["partial_report"] = partial["partial_report"]
+
+        result = process_issue(issue, retriever, fetch_comments, self.limits, self.context_tokens, self.classifier,
+                               on_partial)
+        job.pop("partial_report", None)
+        self.classifier.save()
+        if issue["number"] is not None:
+            self._record(repo, result, vector)
+        return result
+
+    def _open_results(self, repo: _Repo):
+        """
+        Opens the repo's results log and scan state. Call with results_lock held.
+        """
+        if repo.results_log is None:
+            path = get_results_log_path(self.cache_dir, repo.owner, repo.name)
+            repo.results_log = ResultsLog(path)
+            repo.scan_state = load_scan_state(self.cache_dir, repo.owner, repo.name)
+            remap_offsets(repo.scan_state, repo.results_log.compact())
+            save_scan_state(self.cache_dir, repo.owner, repo.name, repo.scan_state)
+
+    def _issue_index(self, repo: _Repo):
+        """
+        The repo's index of analyzed issues, built on first use from the
+        results in its scan state (leaving out the duplicates among them),
+        read back from the results log.
+        """
+        from src.issue_dedup import IssueIndex
+
+        with repo.results_lock:
+            if repo.issue_index is None:
+                self._open_results(repo)
+                issue_index = IssueIndex(self.embeddings, self.duplicate_threshold)
+                stored = {int(key): entry["offset"] for key, entry in repo.scan_state["issues"].items()}
+                analyzed = [result["issue"] for offset, result in iter_results(repo.results_log.path)
+                            if stored.get(result["issue"]["number"]) == offset and result.get("duplicate_of") is None]
+                if analyzed:
+                    for issue_data, vector in zip(analyzed, issue_index.embed(analyzed)):
+                        issue_index.add(issue_data["number"], vector)
+                repo.issue_index = issue_index
+            return repo.issue_index
+
+    def _record(self, repo: _Repo, result: dict, vector=None):
+        """
+        Appends the result to the repo's results log and scan state, where
+        main.py --since-last-scan and its reports pick it up. With the issue's
+        embedding ('vector'), a successful result is added to the issue index.
+        """
+        with repo.results_lock:
+            self._open_results(repo)
+            record_issue_result(repo.scan_state, result, repo.results_log.append(result))
+            if repo.results_log.appended >= SERVICE_RESULTS_COMPACT_EVERY:
+                remap_offsets(repo.scan_state, repo.results_log.compact())
+            save_scan_state(self.cache_dir, repo.owner, repo.name, repo.scan_state)
+            if vector is not None and repo.issue_index is not None and not result["report"].startswith("Failed"):
+                repo.issue_index.add(result["issue"]["number"], vector)
+
+    def _work(self):
+        use_metrics(self.metrics)
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if self._queued.get(job["_key"]) is job:
+                    del self._queued[job["_key"]]
+                job["status"] = "running"
+                job["started_at"] = time.time()
+            try:
+                with span(f"service.{job['kind']}"):
+                    result = self._refresh(job) if job["kind"] == "refresh" else self._analyze(job)
+                job["result"] = result
+                job["status"] = "done"
+            except Exception as e:
+                print(f"Error: Job {job['id']} ({job['kind']} {job['repo']}) failed: {e}")
+                job["error"] = str(e)
+                job["status"] = "failed"
+            finally:
+                job["finished_at"] = time.time()
+                job["seconds"] = job["finished_at"] - job["started_at"]
+                job["_done"].set()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        print(f"[service] {self.address_string()} {format % args}")
+
+    def _send(self, status: int, body, content_type: str = "application/json", headers: dict = None):
+        payload = body.encode("utf-8") if isinstance(body, str) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        service = self.server.service
+        path = urlparse(self.path).path
+        if path == "/health":
+            return self._send(200, service.health())
+        if path == "/metrics":
+            return self._send(200, service.metrics.to_prometheus(), "text/plain; version=0.0.4")
+        if path.startswith("/jobs/"):
+            job = service.get_job(path[len("/jobs/"):])
+            if job is None:
+                return self._send(404, {"error": "unknown job"})
+            return self._send(200, _job_view(job))
+        self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        service = self.server.service
+        path = urlparse(self.path).path
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            return self._send(413, {"error": "payload too large"})
+        body = self.rfile.read(length)
+
+        try:
+            if path == "/webhook":
+                if not service.verify_signature(body, self.headers.get("X-Hub-Signature-256")):
+                    return self._send(401, {"error": "bad signature"})
+                job = service.handle_event(self.headers.get("X-GitHub-Event", ""), json.loads(body or b"{}"))
+                if job is None:
+                    return self._send(200, {"status": "ignored"})
+            elif path == "/analyze":
+                request = json.loads(body or b"{}")
+                issue = None
+                number = int(request["issue"]) if request.get("issue") is not None else None
+                if "title" in request:
+                    issue = {"number": number, "title": request["title"], "body": request.get("body") or "",
+                             "comments": None if number is not None else [], "url": request.get("url", ""),
+                             "labels": [], "updated_at": None}
+                elif number is None:
+                    raise ValueError("'issue' (a number) or 'title' is required")
+                job = service.submit("analyze", _repo_url(request["repo"]), number=number, issue=issue)
+                if request.get("wait"):
+                    job["_done"].wait(min(float(request.get("timeout", MAX_WAIT_SECONDS)), MAX_WAIT_SECONDS))
+                    return self._send(200, _job_view(job))
+            elif path == "/refresh":
+                request = json.loads(body or b"{}")
+                job = service.submit("refresh", _repo_url(request["repo"]))
+            else:
+                return self._send(404, {"error": "not found"})
+        except queue.Full:
+            return self._send(503, {"error": "queue full"}, headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+        except (ValueError, KeyError, TypeError) as e:
+            return self._send(400, {"error": f"bad request: {e}"})
+        self._send(202, {"job": job["id"], "status": job["status"]})
+
+
+def serve(service: AnalyzerService, host: str = SERVICE_HOST, port: int = SERVICE_PORT) -> ThreadingHTTPServer:
+    """
+    Starts the service's workers and returns its HTTP server, not yet serving.
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.service = service
+    service.start()
+    return server
+
+
+def main():
+    load_dotenv()  # Load .env file
+
+    parser = argparse.ArgumentParser(description="GitHub Bug Analyzer AI (Service Edition)")
+    parser.add_argument("--host", type=str, default=SERVICE_HOST, help="Address to listen on.")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help="Port to listen on.")
+    parser.add_argument("--repo", action="append", default=[],
+                        help="Repository to index at startup so its first issue is fast (repeatable).")
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS,
+                        help="Jobs (issue analyses, index refreshes) run in parallel.")
+    parser.add_argument("--queue-size", type=int, default=SERVICE_QUEUE_SIZE,
+                        help="Jobs queued before new requests are refused with HTTP 503.")
+    parser.add_argument("--cache-dir", type=str, default=CACHE_DIR,
+                        help="Directory for cached vector indexes, reused across runs.")
+    parser.add_argument("--cache-max-gb", type=float, default=INDEX_CACHE_MAX_BYTES / 1024 ** 3,
+                        help="Maximum size of the index cache.")
+    parser.add_argument("--index-type", choices=["auto", "flat", "hnsw", "ivfpq"], default=FAISS_INDEX_TYPE,
+                        help="FAISS index type. 'auto' picks Flat, HNSW or IVF-PQ by chunk count.")
+    parser.add_argument("--no-file-filter", action="store_true",
+                        help="Index every supported file up to the size caps, including vendored, generated and minified files.")
+    parser.add_argument("--context-tokens", type=int, default=CONTEXT_TOKEN_BUDGET,
+                        help="Token budget for the code context in each analysis prompt.")
+    parser.add_argument("--duplicate-threshold", type=float, default=DUPLICATE_SIMILARITY_THRESHOLD,
+                        help="Issues at least this similar (cosine) to an analyzed issue reuse its result.")
+    parser.add_argument("--no-duplicate-detection", action="store_true",
+                        help="Analyze every issue, even near-duplicates of analyzed ones.")
+    parser.add_argument("--classifier", choices=["tiered", "llm"], default=CLASSIFIER,
+                        help="'tiered': rules, then issue embeddings, then the LLM; 'llm': the LLM for every issue.")
+    parser.add_argument("--classify-model", type=str, default=CLASSIFY_MODEL,
+                        help="Ollama model for LLM classification (default: the analysis model).")
+    parser.add_argument("--analysis-max-tokens", type=int, default=LLM_OPTIONS["analyze"]["num_predict"],
+                        help="Maximum tokens generated per analysis (-1: no limit).")
+    parser.add_argument("--classify-max-tokens", type=int, default=LLM_OPTIONS["classify"]["num_predict"],
+                        help="Maximum tokens generated per classification (-1: no limit).")
+    parser.add_argument("--no-llm-cache", action="store_true",
+                        help="Always call the LLM instead of reusing cached responses.")
+    parser.add_argument("--llm-cache-ttl-days", type=float, default=LLM_CACHE_TTL_SECONDS / 86400,
+                        help="Cached LLM responses older than this are discarded.")
+    args = parser.parse_args()
+
+    from src.llm_handler import check_ollama_model, configure_llm_cache, configure_llm_options
+    from src.file_filter import configure_file_filter
+
+    if not check_ollama_model() or (args.classify_model and not check_ollama_model(args.classify_model)):
+        print("Please ensure Ollama is running and the required model is pulled.")
+        sys.exit(1)
+    configure_llm_cache(args.cache_dir, enabled=not args.no_llm_cache, ttl_seconds=args.llm_cache_ttl_days * 86400)
+    configure_file_filter(enabled=not args.no_file_filter)
+    configure_llm_options({"analyze": {"num_predict": args.analysis_max_tokens},
+                           "classify": {"num_predict": args.classify_max_tokens}})
+
+    secret = os.environ.get("GITHUB_WEBHOOK_SECRET")
+    if not secret:
+        print("Warning: GITHUB_WEBHOOK_SECRET is not set; webhook signatures are not checked.")
+
+    service = AnalyzerService(
+        cache_dir=args.cache_dir,
+        cache_max_bytes=int(args.cache_max_gb * 1024 ** 3),
+        workers=args.workers,
+        queue_size=args.queue_size,
+        context_tokens=args.context_tokens,
+        index_type=args.index_type,
+        webhook_secret=secret,
+        duplicate_threshold=None if args.no_duplicate_detection else args.duplicate_threshold,
+        classification=args.classifier,
+        classify_model=args.classify_model,
+    )
+    server = serve(service, args.host, args.port)
+    for repo in args.repo:
+        service.submit("refresh", _repo_url(repo))
+
+    print(f"Listening on http://{args.host}:{server.server_address[1]} "
+          "(POST /webhook, /analyze, /refresh; GET /jobs/<id>, /health, /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        server.server_close()
+        service.stop()
+        clean_workspace()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import os
+import json
+import mmap
+from collections.abc import Mapping
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+
+# Chunk text (each chunk's UTF-8 text followed by its symbols, "\n"-joined), back to back
+CHUNK_TEXT_FILE = "chunks.bin"
+# One row per vector, in index order: where its text is and its metadata
+CHUNK_TABLE_FILE = "chunks.npy"
+# Chunk IDs in index order, and the row order that sorts them (for lookups by ID)
+CHUNK_IDS_FILE = "chunk_ids.npy"
+CHUNK_ID_ORDER_FILE = "chunk_id_order.npy"
+# Source paths; table rows refer to them by position
+CHUNK_SOURCES_FILE = "chunk_sources.json"
+FAISS_INDEX_FILE = "index.faiss"
+
+# Integer metadata a chunk doesn't have is stored as -1
+_MISSING = -1
+_ROW_DTYPE = np.dtype([
+    ("offset", "<i8"), ("text_bytes", "<i4"), ("symbol_bytes", "<i4"), ("source", "<i4"),
+    ("start_index", "<i8"), ("start_line", "<i4"), ("end_line", "<i4"),
+])
+_INT_FIELDS = ("start_index", "start_line", "end_line")
+
+
+def write_chunk_store(index_dir: str, chunk_ids: list, documents: list):
+    """
+    Writes the chunks (in vector index order) to index_dir in the compact
+    format ChunkStore reads.
+    """
+    table = np.empty(len(documents), dtype=_ROW_DTYPE)
+    sources = {}
+    offset = 0
+    with open(os.path.join(index_dir, CHUNK_TEXT_FILE), "wb") as f:
+        for row, doc in enumerate(documents):
+            text = doc.page_content.encode("utf-8")
+            symbols = "\n".join(doc.metadata.get("symbols", [])).encode("utf-8")
+            f.write(text)
+            f.write(symbols)
+            source = doc.metadata.get("source", "unknown_file")
+            table[row] = (
+                offset, len(text), len(symbols), sources.setdefault(source, len(sources)),
+                *(doc.metadata.get(field, _MISSING) for field in _INT_FIELDS),
+            )
+            offset += len(text) + len(symbols)
+
+    ids = np.array(chunk_ids, dtype="S")
+    np.save(os.path.join(index_dir, CHUNK_TABLE_FILE), table)
+    np.save(os.path.join(index_dir, CHUNK_IDS_FILE), ids)
+    np.save(os.path.join(index_dir, CHUNK_ID_ORDER_FILE), np.argsort(ids, kind="stable").astype(np.int64))
+    with open(os.path.join(index_dir, CHUNK_SOURCES_FILE), "w", encoding="utf-8") as f:
+        json.dump(list(sources), f)
+
+
+class ChunkStore:
+    """
+    Read-only view of the chunks saved by write_chunk_store. The text file and
+    the arrays are memory-mapped, so opening a store reads almost nothing and
+    only the pages of chunks actually looked up become resident.
+    """
+
+    def __init__(self, index_dir: str):
+        self.table = np.load(os.path.join(index_dir, CHUNK_TABLE_FILE), mmap_mode="r")
+        self.ids = np.load(os.path.join(index_dir, CHUNK_IDS_FILE), mmap_mode="r")
+        self._id_order = np.load(os.path.join(index_dir, CHUNK_ID_ORDER_FILE), mmap_mode="r")
+        with open(os.path.join(index_dir, CHUNK_SOURCES_FILE), "r", encoding="utf-8") as f:
+            self.sources = json.load(f)
+        self._mmap = None
+        self._text = memoryview(b"")
+        with open(os.path.join(index_dir, CHUNK_TEXT_FILE), "rb") as f:
+            # An empty file can't be mapped
+            if os.fstat(f.fileno()).st_size:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._text = memoryview(self._mmap)
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def chunk_id(self, row: int) -> str:
+        return self.ids[row].decode("ascii")
+
+    def row_of(self, chunk_id: str):
+        """
+        The row of a chunk ID (a binary search over the sorted IDs), or None.
+        """
+        key = chunk_id.encode("ascii")
+        pos = int(np.searchsorted(self.ids, key, sorter=self._id_order))
+        if pos < len(self._id_order):
+            row = int(self._id_order[pos])
+            if self.ids[row] == key:
+                return row
+        return None
+
+    def document(self, row: int) -> Document:
+        entry = self.table[row]
+        offset, text_bytes, symbol_bytes = int(entry["offset"]), int(entry["text_bytes"]), int(entry["symbol_bytes"])
+        text = str(self._text[offset:offset + text_bytes], "utf-8")
+        metadata = {"source": self.sources[entry["source"]]}
+        for field in _INT_FIELDS:
+            if entry[field] != _MISSING:
+                metadata[field] = int(entry[field])
+        if symbol_bytes:
+            symbols = str(self._text[offset + text_bytes:offset + text_bytes + symbol_bytes], "utf-8")
+            metadata["symbols"] = symbols.split("\n")
+        elif "start_line" in metadata:
+            metadata["symbols"] = []
+        return Document(id=self.chunk_id(row), page_content=text, metadata=metadata)
+
+    def close(self):
+        self._text.release()
+        self._text = memoryview(b"")
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+
+class ChunkDocstore(Docstore):
+    """
+    LangChain docstore over a ChunkStore: documents are decoded when searched for.
+    """
+
+    def __init__(self, store: ChunkStore):
+        self.store = store
+
+    def search(self, search: str):
+        row = self.store.row_of(search)
+        if row is None:
+            return f"ID {search} not found."
+        return self.store.document(row)
+
+
+class ChunkIds(Mapping):
+    """
+    The vector index's row -> chunk ID mapping (FAISS.index_to_docstore_id), read from a ChunkStore.
+    """
+
+    def __init__(self, store: ChunkStore):
+        self.store = store
+
+    def __getitem__(self, row: int) -> str:
+        if not 0 <= row < len(self.store):
+            raise KeyError(row)
+        return self.store.chunk_id(row)
+
+    def __iter__(self):
+        return iter(range(len(self.store)))
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+
+def save_vector_store(vector_store, index_dir: str):
+    """
+    Saves a LangChain FAISS store as its FAISS index plus a chunk store,
+    instead of FAISS.save_local's pickled docstore.
+    """
+    import faiss
+
+    faiss.write_index(vector_store.index, os.path.join(index_dir, FAISS_INDEX_FILE))
+    chunk_ids = [vector_store.index_to_docstore_id[row] for row in range(vector_store.index.ntotal)]
+    write_chunk_store(index_dir, chunk_ids, [vector_store.docstore.search(chunk_id) for chunk_id in chunk_ids])
+
+
+def load_vector_store(index_dir: str, embeddings, writable: bool = False):
+    """
+    Loads a store saved by save_vector_store. Chunks are read from the
+    memory-mapped chunk store on demand; with 'writable', they are all read
+    into an in-memory docstore instead, so chunks can be added and deleted.
+    """
+    import faiss
+    from langchain_community.vectorstores import FAISS
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+
+    index = faiss.read_index(os.path.join(index_dir, FAISS_INDEX_FILE))
+    store = ChunkStore(index_dir)
+    if not writable:
+        return FAISS(embeddings, index, ChunkDocstore(store), ChunkIds(store))
+    try:
+        documents = [store.document(row) for row in range(len(store))]
+    finally:
+        store.close()
+    return FAISS(
+        embeddings, index, InMemoryDocstore({doc.id: doc for doc in documents}),
+        {row: doc.id for row, doc in enumerate(documents)}
+    )
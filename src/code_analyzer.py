@@ -1,109 +1,562 @@
 import os
-from langchain_community.document_loaders import GitLoader, TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from tqdm import tqdm
-from .utils import EMBEDDING_MODEL, VECTOR_STORE_DIR
+import json
+import time
+import shutil
+import hashlib
+import threading
+import multiprocessing
+from collections import deque
+from typing import TYPE_CHECKING
+from concurrent.futures import ProcessPoolExecutor
+from .utils import (
+    EMBEDDING_MODEL, CACHE_DIR, INDEX_CACHE_MAX_BYTES, CHUNK_SIZE, CHUNK_OVERLAP, SYNTAX_AWARE_CHUNKING,
+    LOADER_WORKERS, LOADER_BATCH_SIZE, EMBED_BATCH_SIZE, EMBED_THREADS,
+    RETRIEVAL_K, RETRIEVAL_FETCH_K, MMR_LAMBDA, CONTEXT_TOKEN_BUDGET, FAISS_INDEX_TYPE,
+    FAISS_NPROBE, FAISS_HNSW_EF_SEARCH
+)
+from .code_splitter import split_code
+from .context_builder import assemble_context, estimate_tokens
+from .metrics import span, timed_iter, get_metrics
+from .index_cache import (
+    index_cache_key, lookup_index, find_latest_index, begin_index_build, commit_index_build,
+    abort_index_build, evict_lru, sweep_staging_dirs
+)
+
+if TYPE_CHECKING:
+    from .lexical_index import LexicalIndex, MappedLexicalIndex
+
+# langchain, FAISS, numpy (and lexical_index, which needs it) and torch are
+# imported where first used, not at module load: the CLI starts (and fails)
+# fast, and loader worker processes, which only read and split files, never
+# import them.
+
+CHUNK_MAP_FILE = "chunk_map.json"
 
 SUPPORTED_EXTENSIONS = [
     ".js", ".jsx", ".ts", ".tsx", ".py", ".java", ".go", ".cs", ".rs", ".rb",
     ".php", ".c", ".cpp", ".h", ".hpp", ".md",
 ]
 
-def load_and_split_repo(repo_path: str) -> list:
+# Directories never descended into while scanning a repo
+EXCLUDED_DIRS = {".git", ".hg", ".svn"}
+
+# Number of files handed to a loader worker per task
+FILES_PER_TASK = 32
+
+def chunking_params(syntax_aware: bool = SYNTAX_AWARE_CHUNKING) -> dict:
     """
-    Loads all supported source files from the cloned repo and splits them.
+    Returns the parameters that determine how a repo is chunked, including
+    which files are indexed (see file_filter). Indexes built with different
+    parameters are cached separately.
     """
-    print(f"Loading and splitting documents from {repo_path}...")
-    all_docs = []
-    
-    for root, _, files in tqdm(os.walk(repo_path), desc="Scanning repo"):
-        if ".git" in root:
-            continue
-            
+    from .file_filter import filter_params  # Local import to avoid circularity
+
+    return {
+        "splitter": "syntax" if syntax_aware else "recursive_character",
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "extensions": SUPPORTED_EXTENSIONS,
+        "files": filter_params(),
+        "start_index": True,
+    }
+
+def _is_supported(file_name: str) -> bool:
+    return any(file_name.endswith(ext) for ext in SUPPORTED_EXTENSIONS)
+
+def is_indexed_path(rel_path: str) -> bool:
+    """
+    Whether a repo-relative path ('/' separators) is one the index reads:
+    a supported file outside the excluded directories.
+    """
+    *dirs, file_name = rel_path.split("/")
+    return _is_supported(file_name) and not EXCLUDED_DIRS.intersection(dirs)
+
+def iter_repo_files(repo_path: str):
+    """
+    Yields the repo-relative paths (with '/' separators) of all supported files.
+    Excluded directories are pruned during the walk and never descended into.
+    """
+    for root, dirs, files in os.walk(repo_path):
+        dirs[:] = [d for d in dirs if d not in EXCLUDED_DIRS]
         for file in files:
-            if any(file.endswith(ext) for ext in SUPPORTED_EXTENSIONS):
-                file_path = os.path.join(root, file)
-                try:
-                    loader = TextLoader(file_path, encoding="utf-8")
-                    docs = loader.load()
-                    for doc in docs:
-                        doc.metadata["source"] = os.path.relpath(file_path, repo_path)
-                    all_docs.extend(docs)
-                except Exception as e:
-                    print(f"Warning: Could not read {file_path}. Error: {e}")
-
-    if not all_docs:
+            if _is_supported(file):
+                rel_path = os.path.relpath(os.path.join(root, file), repo_path)
+                yield rel_path.replace(os.sep, "/")
+
+
+_splitter = None
+
+def _get_splitter():
+    global _splitter
+    if _splitter is None:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        _splitter = RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            add_start_index=True
+        )
+    return _splitter
+
+def _split_files(repo_path: str, rel_paths: list, syntax_aware: bool = SYNTAX_AWARE_CHUNKING) -> tuple[list, list]:
+    """
+    Worker task: reads and splits a group of files.
+    Returns ([(source, [(chunk_text, start_index, metadata), ...]), ...], warnings).
+    Only plain values cross the process boundary, which keeps pickling cheap.
+    With 'syntax_aware', files are split at definitions (see split_code) and
+    the metadata holds the chunk's symbols and line range; otherwise it's empty.
+    """
+    splitter = _get_splitter()
+    results, warnings = [], []
+    for rel_path in rel_paths:
+        file_path = os.path.join(repo_path, rel_path)
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except Exception as e:
+            warnings.append(f"Could not read {file_path}. Error: {e}")
+            continue
+        if syntax_aware:
+            results.append((rel_path, split_code(text, os.path.splitext(rel_path)[1])))
+            continue
+        chunks = splitter.create_documents([text])
+        results.append((rel_path, [(c.page_content, c.metadata["start_index"], {}) for c in chunks]))
+    return results, warnings
+
+def _group(items, size: int):
+    group = []
+    for item in items:
+        group.append(item)
+        if len(group) >= size:
+            yield group
+            group = []
+    if group:
+        yield group
+
+def _map_file_groups(repo_path: str, groups, workers: int, syntax_aware: bool):
+    """
+    Runs _split_files over the groups, in order, keeping at most 2 tasks per
+    worker in flight so memory stays bounded regardless of repo size.
+    """
+    if workers <= 1:
+        for group in groups:
+            yield _split_files(repo_path, group, syntax_aware)
+        return
+
+    # 'spawn' avoids forking a process that may already be running other threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending = deque()
+        for group in groups:
+            pending.append(pool.submit(_split_files, repo_path, group, syntax_aware))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def iter_split_batches(repo_path: str, only_files=None, batch_size: int = LOADER_BATCH_SIZE,
+                       workers: int = LOADER_WORKERS, syntax_aware: bool = SYNTAX_AWARE_CHUNKING):
+    """
+    Streams the repo's chunks as lists of at most 'batch_size' Documents.
+    Files are read and split in a process pool; only a bounded number of
+    files and chunks are held in memory at any time.
+    If 'only_files' (repo-relative paths) is given, only those files are loaded.
+    """
+    from langchain_core.documents import Document
+    from tqdm import tqdm
+
+    print(f"Loading and splitting documents from {repo_path}...")
+    if only_files is not None:
+        paths = [
+            p for p in sorted(only_files)
+            if _is_supported(p) and os.path.isfile(os.path.join(repo_path, p))
+        ]
+        # Not worth starting a pool for a handful of changed files
+        if len(paths) < FILES_PER_TASK * 2:
+            workers = 1
+    else:
+        paths = iter_repo_files(repo_path)
+
+    file_count = 0
+    chunk_count = 0
+    batch = []
+    progress = tqdm(desc="Loading and splitting", unit="files")
+    try:
+        groups = _group(paths, FILES_PER_TASK)
+        for results, warnings in _map_file_groups(repo_path, groups, workers, syntax_aware):
+            for warning in warnings:
+                print(f"Warning: {warning}")
+            for source, chunks in results:
+                file_count += 1
+                chunk_count += len(chunks)
+                batch.extend(
+                    Document(page_content=text, metadata={"source": source, "start_index": start, **extra})
+                    for text, start, extra in chunks
+                )
+            progress.update(len(results))
+
+            while len(batch) >= batch_size:
+                yield batch[:batch_size]
+                batch = batch[batch_size:]
+        if batch:
+            yield batch
+    finally:
+        progress.close()
+
+    if file_count == 0 and only_files is None:
         raise ValueError("No processable source code files found in the repository.")
+    print(f"Split {file_count} documents into {chunk_count} chunks.")
 
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=2000,
-        chunk_overlap=200
-    )
-    splits = text_splitter.split_documents(all_docs)
-    print(f"Split {len(all_docs)} documents into {len(splits)} chunks.")
+def load_and_split_repo(repo_path: str, only_files=None) -> list:
+    """
+    Loads all supported source files from the cloned repo and splits them.
+    If 'only_files' (repo-relative paths) is given, only those files are loaded.
+    """
+    splits = []
+    for batch in iter_split_batches(repo_path, only_files=only_files):
+        splits.extend(batch)
     return splits
 
 
-def create_vector_store(repo_path: str):
+def assign_chunk_ids(documents: list, chunk_map: dict) -> list:
     """
-    Creates and saves a FAISS vector store from the repository.
+    Gives every chunk a stable ID derived from its source file and position,
+    recording it in chunk_map (source file -> chunk IDs). Returns the IDs.
     """
-    if os.path.exists(VECTOR_STORE_DIR):
-        print(f"Vector store already exists at {VECTOR_STORE_DIR}. Skipping creation.")
-        return
-        
-    documents = load_and_split_repo(repo_path)
-    
-    print(f"Initializing embedding model: {EMBEDDING_MODEL}")
-    embeddings = HuggingFaceEmbeddings(
-        model_name=EMBEDDING_MODEL
-    )
-    
+    ids = []
+    for doc in documents:
+        source = doc.metadata.get("source", "unknown_file")
+        file_ids = chunk_map.setdefault(source, [])
+        file_hash = hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+        chunk_id = f"{file_hash}:{len(file_ids)}"
+        file_ids.append(chunk_id)
+        ids.append(chunk_id)
+    return ids
+
+def _read_chunk_map(index_dir: str) -> dict:
+    with open(os.path.join(index_dir, CHUNK_MAP_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_chunk_map(index_dir: str, chunk_map: dict):
+    with open(os.path.join(index_dir, CHUNK_MAP_FILE), "w", encoding="utf-8") as f:
+        json.dump(chunk_map, f)
+
+
+def _save_index(vector_store, lexical_index: "LexicalIndex", chunk_map: dict, staging_dir: str,
+                index_type: str) -> str:
+    """
+    Converts the flat vector index to the index type chosen for its size
+    (see choose_index_type) and saves all parts of the index to staging_dir.
+    Returns the index type used.
+    """
+    from .faiss_index import choose_index_type, convert_index
+    from .chunk_store import save_vector_store
+
+    chunk_count = vector_store.index.ntotal
+    resolved = choose_index_type(chunk_count, index_type)
+    if resolved != "flat":
+        print(f"Converting {chunk_count} vectors to a {resolved} index...")
+        with span("index.convert"):
+            vector_store.index = convert_index(vector_store.index, resolved)
+    with span("index.save"):
+        save_vector_store(vector_store, staging_dir)
+        lexical_index.save(staging_dir)
+        _write_chunk_map(staging_dir, chunk_map)
+    return resolved
+
+
+def _build_full_index(repo_path: str, staging_dir: str, embeddings, index_type: str = FAISS_INDEX_TYPE) -> tuple:
+    """
+    Embeds the whole repository into a new index in staging_dir, one batch
+    of chunks at a time. Returns (chunks indexed, index type used).
+    """
+    from langchain_community.vectorstores import FAISS
+    from .lexical_index import LexicalIndex
+
+    vector_store = None
+    lexical_index = LexicalIndex()
+    chunk_map = {}
+    chunk_count = 0
+    start_time = time.perf_counter()
+    lexical_seconds = 0.0
+
     print("Creating FAISS vector store... (This may take a while)")
-    vector_store = FAISS.from_documents(documents, embeddings)
-    
-    vector_store.save_local(VECTOR_STORE_DIR)
-    print(f"Vector store saved to {VECTOR_STORE_DIR}")
+    for batch in timed_iter("index.split", iter_split_batches(repo_path)):
+        ids = assign_chunk_ids(batch, chunk_map)
+        with span("index.embed"):
+            if vector_store is None:
+                vector_store = FAISS.from_documents(batch, embeddings, ids=ids)
+            else:
+                vector_store.add_documents(batch, ids=ids)
+
+        lexical_start = time.perf_counter()
+        lexical_index.add(ids, batch)
+        lexical_elapsed = time.perf_counter() - lexical_start
+        get_metrics().observe("index.lexical", lexical_elapsed)
+        lexical_seconds += lexical_elapsed
+        chunk_count += len(batch)
+
+    if vector_store is None:
+        raise ValueError("No processable source code found in the repository.")
+    resolved = _save_index(vector_store, lexical_index, chunk_map, staging_dir, index_type)
+    get_metrics().add("index.chunks", chunk_count)
+
+    total_seconds = time.perf_counter() - start_time
+    print(f"Lexical index built in {lexical_seconds:.2f}s ({lexical_seconds / total_seconds:.1%} of indexing time).")
+    return chunk_count, resolved
+
 
-def get_retriever():
+def _update_index(repo, base_dir: str, base_commit: str, staging_dir: str, embeddings,
+                  index_type: str = FAISS_INDEX_TYPE) -> tuple:
     """
-    Loads the saved FAISS vector store as a retriever.
+    Copies the base index into staging_dir and applies the changes between
+    base_commit and HEAD: vectors of removed or modified files are deleted and
+    only new or changed files are re-embedded. The base must be a flat index.
+    Returns (chunks in the updated index, index type used).
     """
-    if not os.path.exists(VECTOR_STORE_DIR):
-        raise FileNotFoundError("Vector store not found. Please run the analysis first.")
-        
+    from .chunk_store import load_vector_store
+    from .github_client import changed_files_between
+    from .lexical_index import LexicalIndex
+
+    with span("index.diff"):
+        removed, changed = changed_files_between(repo, base_commit, repo.head.commit.hexsha)
+    print(f"Incremental update: {len(removed)} files removed/modified, {len(changed)} files added/modified.")
+
+    with span("index.load"):
+        shutil.copytree(base_dir, staging_dir, dirs_exist_ok=True)
+        vector_store = load_vector_store(staging_dir, embeddings, writable=True)
+    chunk_map = _read_chunk_map(staging_dir)
+
+    stale_ids = []
+    for path in removed | changed:
+        stale_ids.extend(chunk_map.pop(path, []))
+    if stale_ids:
+        vector_store.delete(stale_ids)
+
+    # The saved lexical index is read-only; rebuild it from the chunks that remain
+    with span("index.lexical"):
+        lexical_index = LexicalIndex()
+        kept_ids = list(vector_store.index_to_docstore_id.values())
+        lexical_index.add(kept_ids, [vector_store.docstore.search(chunk_id) for chunk_id in kept_ids])
+
+    new_chunks = 0
+    if changed:
+        for batch in timed_iter("index.split", iter_split_batches(repo.working_tree_dir, only_files=changed)):
+            ids = assign_chunk_ids(batch, chunk_map)
+            with span("index.embed"):
+                vector_store.add_documents(batch, ids=ids)
+            with span("index.lexical"):
+                lexical_index.add(ids, batch)
+            new_chunks += len(batch)
+
+    print(f"Deleted {len(stale_ids)} stale chunks, embedded {new_chunks} new chunks.")
+    resolved = _save_index(vector_store, lexical_index, chunk_map, staging_dir, index_type)
+    get_metrics().add("index.chunks", new_chunks)
+    return sum(len(file_ids) for file_ids in chunk_map.values()), resolved
+
+
+def find_cached_index(repo_id: str, commit_sha: str, cache_dir: str = CACHE_DIR,
+                      index_type: str = FAISS_INDEX_TYPE):
+    """
+    The directory of the cached index for the repo at commit_sha with the
+    current model and chunking, or None.
+    """
+    key = index_cache_key(repo_id, commit_sha, EMBEDDING_MODEL, chunking_params(), index_type)
+    index_dir = lookup_index(cache_dir, key)
+    if index_dir:
+        print(f"Using cached vector store for {repo_id}@{commit_sha[:12]} at {index_dir}.")
+    return index_dir
+
+
+def create_vector_store(repo, repo_id: str, embeddings, cache_dir: str = CACHE_DIR,
+                        cache_max_bytes: int = INDEX_CACHE_MAX_BYTES, incremental: bool = True,
+                        index_type: str = FAISS_INDEX_TYPE) -> str:
+    """
+    Creates and saves a FAISS vector store for the repository at its HEAD commit.
+    Reuses the cached index if one exists for the same repo, commit, model and chunking.
+    Otherwise, if 'incremental' is set and an older flat index of the same repo is
+    cached, only the files changed since that index's commit are re-embedded.
+    'index_type' is 'flat', 'hnsw', 'ivfpq' or 'auto' (chosen by chunk count).
+    Returns the directory of the index.
+    """
+    commit_sha = repo.head.commit.hexsha
+    index_dir = find_cached_index(repo_id, commit_sha, cache_dir, index_type)
+    if index_dir:
+        return index_dir
+    key = index_cache_key(repo_id, commit_sha, EMBEDDING_MODEL, chunking_params(), index_type)
+
+    base = None
+    if incremental:
+        base = find_latest_index(
+            cache_dir, repo=repo_id, embedding_model=EMBEDDING_MODEL, chunking=chunking_params()
+        )
+        # Approximate indexes can't delete vectors in place; rebuild them instead
+        # (unchanged chunks still come from the embedding cache)
+        if base and base[1].get("index_type", "flat") != "flat":
+            print(f"Cached index is {base[1]['index_type']}; rebuilding instead of updating it.")
+            base = None
+
+    sweep_staging_dirs(cache_dir)
+    staging_dir = begin_index_build(cache_dir, key)
+    try:
+        chunk_count = None
+        base_commit = None
+        if base:
+            base_dir, base_meta = base
+            base_commit = base_meta["commit"]
+            print(f"Updating cached index from {base_commit[:12]} to {commit_sha[:12]}...")
+            try:
+                chunk_count, resolved_type = _update_index(
+                    repo, base_dir, base_commit, staging_dir, embeddings, index_type
+                )
+            except Exception as e:
+                print(f"Warning: Incremental update failed ({e}). Falling back to a full rebuild.")
+                abort_index_build(staging_dir)
+                staging_dir = begin_index_build(cache_dir, key)
+                base_commit = None
+
+        if chunk_count is None:
+            chunk_count, resolved_type = _build_full_index(
+                repo.working_tree_dir, staging_dir, embeddings, index_type
+            )
+
+        index_dir = commit_index_build(cache_dir, key, staging_dir, {
+            "repo": repo_id,
+            "commit": commit_sha,
+            "base_commit": base_commit,
+            "embedding_model": EMBEDDING_MODEL,
+            "chunking": chunking_params(),
+            "chunk_count": chunk_count,
+            "index_type": resolved_type,
+        })
+    except Exception:
+        abort_index_build(staging_dir)
+        raise
+
+    print(f"Vector store saved to {index_dir}")
+    if hasattr(embeddings, "hits"):
+        print(f"Embedding cache: {embeddings.hits} hits, {embeddings.misses} chunks embedded.")
+    evict_lru(cache_dir, cache_max_bytes, keep=key)
+    return index_dir
+
+_embeddings = {}
+_embeddings_lock = threading.Lock()
+
+def _load_model(batch_size: int, num_threads: int):
+    if num_threads:
+        import torch
+        torch.set_num_threads(num_threads)
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
     print(f"Loading embedding model: {EMBEDDING_MODEL}")
-    embeddings = HuggingFaceEmbeddings(
-        model_name=EMBEDDING_MODEL
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL,
+        encode_kwargs={"batch_size": batch_size}
     )
-    
-    print(f"Loading vector store from {VECTOR_STORE_DIR}")
-    vector_store = FAISS.load_local(VECTOR_STORE_DIR, embeddings, allow_dangerous_deserialization=True)
-    
-    return vector_store.as_retriever(search_kwargs={"k": 5})
 
-def find_relevant_code(issue_text: str, retriever) -> dict:
+def get_embeddings(cache_dir: str = CACHE_DIR, batch_size: int = EMBED_BATCH_SIZE,
+                   num_threads: int = EMBED_THREADS, use_cache: bool = True):
+    """
+    Returns the embedding model. Chunk embeddings are looked up in the persistent
+    embedding cache under cache_dir (shared across repos and runs) and only
+    misses are embedded, in batches of batch_size.
+    'num_threads' caps the CPU threads torch uses for inference.
+    One instance per process and settings is shared by every caller, and the
+    model itself is only loaded by the first embedding it has to compute, so
+    runs served entirely from cached indexes and embeddings never load it.
+    """
+    from .embedding_cache import CachedEmbeddings, LazyEmbeddings, open_embedding_store
+
+    with _embeddings_lock:
+        model_key = (batch_size, num_threads)
+        if model_key not in _embeddings:
+            _embeddings[model_key] = LazyEmbeddings(lambda: _load_model(batch_size, num_threads))
+        model = _embeddings[model_key]
+        if not use_cache:
+            return model
+
+        key = (os.path.abspath(cache_dir), batch_size, num_threads)
+        if key not in _embeddings:
+            store = open_embedding_store(cache_dir, EMBEDDING_MODEL)
+            print(f"Embedding cache has {len(store.rows)} chunk embeddings.")
+            _embeddings[key] = CachedEmbeddings(model, store, batch_size)
+        return _embeddings[key]
+
+class HybridRetriever:
+    """
+    Fuses MMR vector search with BM25 and symbol-table lookups using
+    reciprocal rank fusion. Exposes invoke() like a LangChain retriever.
+    """
+
+    def __init__(self, vector_store, lexical_index: "MappedLexicalIndex", k: int = RETRIEVAL_K):
+        self.vector_store = vector_store
+        self.vector_retriever = _mmr_retriever(vector_store)
+        self.lexical_index = lexical_index
+        self.k = k
+
+    def invoke(self, query: str) -> list:
+        from langchain_core.documents import Document
+        from .lexical_index import reciprocal_rank_fusion
+
+        vector_docs = self.vector_retriever.invoke(query)
+        rankings = [
+            self.lexical_index.search_symbols(query, self.k),
+            self.lexical_index.search_bm25(query, self.k),
+            [doc.id for doc in vector_docs],
+        ]
+        docs_by_id = {doc.id: doc for doc in vector_docs}
+
+        results = []
+        for chunk_id in reciprocal_rank_fusion(rankings)[:self.k * 2]:
+            doc = docs_by_id.get(chunk_id) or self.vector_store.docstore.search(chunk_id)
+            if isinstance(doc, Document):
+                results.append(doc)
+        return results
+
+
+def _mmr_retriever(vector_store):
+    # MMR ranks by relevance while penalizing near-duplicate chunks
+    return vector_store.as_retriever(
+        search_type="mmr",
+        search_kwargs={"k": RETRIEVAL_K, "fetch_k": RETRIEVAL_FETCH_K, "lambda_mult": MMR_LAMBDA}
+    )
+
+def get_retriever(index_dir: str, embeddings, hybrid: bool = True, nprobe: int = FAISS_NPROBE,
+                  ef_search: int = FAISS_HNSW_EF_SEARCH):
+    """
+    Loads a saved FAISS vector store as a retriever. Chunk text and metadata
+    stay memory-mapped and are read only for the chunks a query returns
+    (see chunk_store). If the index has a lexical index and 'hybrid' is set,
+    vector results are fused with BM25 and symbol hits.
+    'nprobe' (IVF) and 'ef_search' (HNSW) tune approximate indexes.
+    """
+    from .chunk_store import load_vector_store
+    from .faiss_index import tune_index
+    from .lexical_index import LexicalIndex
+
+    if not os.path.exists(index_dir):
+        raise FileNotFoundError("Vector store not found. Please run the analysis first.")
+        
+    print(f"Loading vector store from {index_dir}")
+    with span("index.load"):
+        vector_store = load_vector_store(index_dir, embeddings)
+        tune_index(vector_store.index, nprobe, ef_search)
+        lexical_index = LexicalIndex.load(index_dir) if hybrid else None
+    if lexical_index is None:
+        return _mmr_retriever(vector_store)
+    return HybridRetriever(vector_store, lexical_index)
+
+def find_relevant_code(issue_text: str, retriever, token_budget: int = CONTEXT_TOKEN_BUDGET) -> dict:
     """
     Searches the vector store for code chunks relevant to the issue.
     Accepts a retriever object to avoid reloading.
+    The chunks are merged per file and trimmed to fit 'token_budget'.
     """
     print("Finding relevant code context...")
     
-    relevant_docs = retriever.invoke(issue_text)
-    
-    context_by_file = {}
-    for doc in relevant_docs:
-        file_path = doc.metadata.get("source", "unknown_file")
-        if file_path not in context_by_file:
-            context_by_file[file_path] = []
-        context_by_file[file_path].append(doc.page_content)
-        
-    final_context = {
-        file: "\n...\n".join(chunks) 
-        for file, chunks in context_by_file.items()
-    }
+    with span("retrieve.search"):
+        relevant_docs = retriever.invoke(issue_text)
+    with span("retrieve.assemble"):
+        final_context = assemble_context(relevant_docs, token_budget)
     
-    print(f"Found {len(relevant_docs)} relevant chunks across {len(final_context)} files.")
+    used_tokens = sum(estimate_tokens(text) for text in final_context.values())
+    print(f"Found {len(relevant_docs)} relevant chunks; using ~{used_tokens} tokens across {len(final_context)} files.")
     return final_context
\ No newline at end of file
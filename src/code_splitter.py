@@ -0,0 +1,276 @@
+import re
+from bisect import bisect_right
+from .utils import CHUNK_SIZE, CHUNK_OVERLAP
+
+# Definitions that start a chunk boundary, per language. Each pattern is matched
+# against a line with its indentation removed and captures the symbol as 'name'.
+_NOT_NAMES = r"(?!(?:if|for|while|switch|catch|return|else|new|throw|await|yield|sizeof|do)\b)"
+
+_PYTHON = [
+    r"(?:async\s+)?def\s+(?P<name>[A-Za-z_]\w*)",
+    r"class\s+(?P<name>[A-Za-z_]\w*)",
+]
+_JS = [
+    r"(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*(?P<name>[A-Za-z_$][\w$]*)",
+    r"(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+(?P<name>[A-Za-z_$][\w$]*)",
+    r"(?:export\s+)?(?:const|let|var)\s+(?P<name>[A-Za-z_$][\w$]*)\s*(?::[^=]+)?=\s*(?:async\s+)?"
+    r"(?:function\b|\([^)]*\)\s*(?::[^=]+)?=>|[A-Za-z_$][\w$]*\s*=>)",
+    r"(?:export\s+)?(?:declare\s+)?(?:interface|type|enum|namespace)\s+(?P<name>[A-Za-z_$][\w$]*)",
+    # Class members: 'name(args) {', with optional modifiers and return type
+    r"(?:(?:public|private|protected|static|async|readonly|override|get|set)\s+)*\*?"
+    + _NOT_NAMES + r"(?P<name>[A-Za-z_$][\w$]*)\s*\([^;]*\)\s*(?::\s*[^{;]+)?\{\s*$",
+]
+_GO = [
+    r"func\s+(?:\([^)]*\)\s*)?(?P<name>[A-Za-z_]\w*)",
+    r"type\s+(?P<name>[A-Za-z_]\w*)",
+]
+_RUST = [
+    r"(?:pub(?:\([^)]*\))?\s+)?(?:const\s+)?(?:async\s+)?(?:unsafe\s+)?(?:extern\s+\"[^\"]*\"\s+)?"
+    r"fn\s+(?P<name>[A-Za-z_]\w*)",
+    r"(?:pub(?:\([^)]*\))?\s+)?(?:struct|enum|trait|mod|union)\s+(?P<name>[A-Za-z_]\w*)",
+    r"impl(?:<[^>]*>)?\s+(?:[\w:<>]+\s+for\s+)?(?P<name>[A-Za-z_][\w:]*)",
+]
+_JAVA = [
+    r"(?:(?:public|private|protected|internal|static|final|abstract|sealed|partial|readonly)\s+)*"
+    r"(?:class|interface|enum|record|struct)\s+(?P<name>[A-Za-z_]\w*)",
+    # Methods and constructors: modifiers and/or a return type, then 'name('
+    r"(?:@\w+\s+)*(?:(?:public|private|protected|internal|static|final|abstract|synchronized|native|"
+    r"virtual|override|async|sealed|extern|unsafe|default)\s+)+(?:<[^>]+>\s+)?(?:[\w<>\[\],.?]+\s+)?"
+    + _NOT_NAMES + r"(?P<name>[A-Za-z_]\w*)\s*\([^;]*$",
+    r"(?:<[^>]+>\s+)?" + _NOT_NAMES + r"[\w<>\[\],.?]+\s+" + _NOT_NAMES + r"(?P<name>[A-Za-z_]\w*)\s*\([^;]*$",
+]
+_RUBY = [
+    r"def\s+(?:self\.)?(?P<name>[A-Za-z_]\w*[?!=]?)",
+    r"(?:class|module)\s+(?P<name>[A-Z][\w:]*)",
+]
+_PHP = [
+    r"(?:(?:public|private|protected|static|abstract|final)\s+)*function\s+&?(?P<name>[A-Za-z_]\w*)",
+    r"(?:(?:abstract|final|readonly)\s+)*(?:class|interface|trait|enum)\s+(?P<name>[A-Za-z_]\w*)",
+]
+_C = [
+    r"(?:typedef\s+)?(?:struct|union|enum|class|namespace)\s+(?P<name>[A-Za-z_]\w*)[^;]*$",
+    # Function definitions: a return type, then 'name(' on a line that doesn't end the statement
+    r"(?:template\s*<[^>]*>\s*)?(?:(?:static|inline|extern|virtual|const|unsigned|signed|explicit|constexpr)\s+)*"
+    + _NOT_NAMES + r"[\w:<>,]+[\s*&]+" + _NOT_NAMES + r"(?P<name>[A-Za-z_~][\w:~]*)\s*\([^;]*$",
+]
+_MARKDOWN = [
+    r"#{1,3}\s+(?P<name>\S.*?)\s*#*\s*$",
+]
+
+# Extension -> (definition patterns, deepest indentation (in columns) of a boundary, comment prefixes)
+# A boundary deeper than the top level is a member of the enclosing definition, e.g. a method.
+LANGUAGES = {
+    ".py": (_PYTHON, 4, ("#", "@")),
+    ".js": (_JS, 4, ("//", "/*", "*", "@")),
+    ".jsx": (_JS, 4, ("//", "/*", "*", "@")),
+    ".ts": (_JS, 4, ("//", "/*", "*", "@")),
+    ".tsx": (_JS, 4, ("//", "/*", "*", "@")),
+    ".go": (_GO, 0, ("//", "/*", "*")),
+    ".rs": (_RUST, 4, ("//", "/*", "*", "#[")),
+    ".java": (_JAVA, 4, ("//", "/*", "*", "@")),
+    ".cs": (_JAVA, 8, ("//", "/*", "*", "[")),
+    ".rb": (_RUBY, 4, ("#",)),
+    ".php": (_PHP, 4, ("//", "/*", "*", "#")),
+    ".c": (_C, 0, ("//", "/*", "*")),
+    ".h": (_C, 4, ("//", "/*", "*")),
+    ".cpp": (_C, 4, ("//", "/*", "*", "template")),
+    ".hpp": (_C, 4, ("//", "/*", "*", "template")),
+    ".md": (_MARKDOWN, 0, ()),
+}
+
+# Languages whose definitions end where the indentation does
+INDENT_SCOPED = {".py"}
+
+_COMPILED = {
+    ext: re.compile("|".join(f"(?:{p})" for p in patterns).replace("(?P<name>", "(?:"))
+    for ext, (patterns, _, _) in LANGUAGES.items()
+}
+_NAME_RES = {
+    ext: [re.compile(p) for p in patterns] for ext, (patterns, _, _) in LANGUAGES.items()
+}
+
+_fallback_splitter = None
+
+
+def _get_fallback_splitter():
+    global _fallback_splitter
+    if _fallback_splitter is None:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        _fallback_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            add_start_index=True
+        )
+    return _fallback_splitter
+
+
+def _indent_width(line: str) -> int:
+    width = 0
+    for char in line:
+        if char == " ":
+            width += 1
+        elif char == "\t":
+            width += 4
+        else:
+            break
+    return width
+
+
+def _match_name(ext: str, stripped: str):
+    if not _COMPILED[ext].match(stripped):
+        return None
+    for pattern in _NAME_RES[ext]:
+        match = pattern.match(stripped)
+        if match:
+            return match.group("name")
+    return None
+
+
+def _regex_boundaries(lines: list, ext: str) -> list:
+    """
+    Finds definitions line by line. Returns [(line_index, qualified_name)];
+    members are qualified with the enclosing definition ('Class.method').
+    In indentation-scoped languages, top-level code following a definition
+    starts a boundary of its own (name None) so it isn't attributed to it.
+    """
+    _, max_indent, comment_prefixes = LANGUAGES[ext]
+    boundaries = []
+    enclosing = []  # (indent, name) of the definitions the current line may be nested in
+    for i, line in enumerate(lines):
+        stripped = line.lstrip()
+        if not stripped:
+            continue
+        indent = _indent_width(line)
+        if indent > max_indent:
+            continue
+        name = _match_name(ext, stripped)
+        if name is None:
+            if (ext in INDENT_SCOPED and indent == 0 and enclosing
+                    and not stripped.startswith(comment_prefixes + (")", "]", "}"))):
+                boundaries.append((i, None))
+                enclosing = []
+            continue
+        while enclosing and enclosing[-1][0] >= indent:
+            enclosing.pop()
+        qualified = ".".join([n for _, n in enclosing] + [name])
+        enclosing.append((indent, name))
+        boundaries.append((i, qualified))
+    return boundaries
+
+
+def _attach_comments(lines: list, boundaries: list, comment_prefixes: tuple) -> list:
+    """
+    Moves each boundary up over the comments, decorators and annotations
+    directly above it, so they stay with the definition they describe.
+    """
+    attached = []
+    floor = 0
+    for line_index, name in boundaries:
+        start = line_index
+        while start > floor and comment_prefixes and lines[start - 1].lstrip().startswith(comment_prefixes):
+            start -= 1
+        attached.append((start, name))
+        floor = line_index + 1
+    return attached
+
+
+def find_boundaries(text: str, ext: str) -> list:
+    """
+    Returns the definition boundaries of a source file as sorted, distinct
+    [(line_index, symbol)], symbol None for code outside any definition.
+    Definitions are recognized by line patterns rather than a full parse:
+    an order of magnitude cheaper, and tolerant of code that doesn't parse.
+    """
+    lines = text.split("\n")
+    boundaries = _attach_comments(lines, _regex_boundaries(lines, ext), LANGUAGES[ext][2])
+    distinct = []
+    for line_index, name in boundaries:
+        if distinct and distinct[-1][0] == line_index:
+            continue
+        distinct.append((line_index, name))
+    return distinct
+
+
+def _line_offsets(text: str) -> list:
+    offsets = [0]
+    position = text.find("\n")
+    while position != -1:
+        offsets.append(position + 1)
+        position = text.find("\n", position + 1)
+    return offsets
+
+
+def split_code(text: str, ext: str) -> list:
+    """
+    Splits a source file at function, class and method boundaries.
+    Consecutive definitions are packed into chunks of up to CHUNK_SIZE
+    characters without overlap; a definition larger than that is split
+    further with the recursive character splitter. Files of unknown types,
+    and files without any definitions, go to that splitter as a whole.
+    Returns [(chunk_text, start_index, metadata)], metadata holding the
+    chunk's 'symbols' and its 1-based 'start_line' / 'end_line'.
+    """
+    offsets = _line_offsets(text)
+
+    def line_of(position: int) -> int:
+        return bisect_right(offsets, position)
+
+    chunks = []
+
+    def emit(chunk_text: str, start: int, symbols: list):
+        if not chunk_text.strip():
+            return
+        chunks.append((chunk_text, start, {
+            "symbols": symbols,
+            "start_line": line_of(start),
+            "end_line": line_of(start + len(chunk_text) - 1),
+        }))
+
+    def fallback(start: int, end: int) -> list:
+        docs = _get_fallback_splitter().create_documents([text[start:end]])
+        return [(doc.page_content, start + doc.metadata["start_index"]) for doc in docs]
+
+    boundaries = find_boundaries(text, ext) if ext in LANGUAGES else []
+    if not boundaries:
+        for piece, start in fallback(0, len(text)):
+            emit(piece, start, [])
+        return chunks
+
+    # Contiguous units: [boundary, next boundary), plus any code before the first one
+    if boundaries[0][0] > 0:
+        boundaries.insert(0, (0, None))
+    units = []
+    for i, (line_index, symbol) in enumerate(boundaries):
+        start = offsets[line_index] if line_index < len(offsets) else len(text)
+        end = offsets[boundaries[i + 1][0]] if i + 1 < len(boundaries) else len(text)
+        if end > start:
+            units.append((start, end, symbol))
+
+    chunk_start, chunk_end, symbols = None, None, []
+
+    def flush():
+        if chunk_start is not None:
+            emit(text[chunk_start:chunk_end].rstrip(), chunk_start, symbols)
+
+    for start, end, symbol in units:
+        if end - start > CHUNK_SIZE:
+            flush()
+            chunk_start, symbols = None, []
+            pieces = fallback(start, end)
+            for piece, piece_start in pieces[:-1]:
+                emit(piece, piece_start, [symbol] if symbol else [])
+            if pieces:
+                # The definition's last piece may share a chunk with the definitions after it
+                chunk_start, chunk_end = pieces[-1][1], end
+                symbols = [symbol] if symbol else []
+            continue
+        if chunk_start is not None and end - chunk_start > CHUNK_SIZE:
+            flush()
+            chunk_start, symbols = None, []
+        if chunk_start is None:
+            chunk_start = start
+        chunk_end = end
+        if symbol and symbol not in symbols:
+            symbols.append(symbol)
+    flush()
+    return chunks
@@ -0,0 +1,119 @@
+from .utils import CHARS_PER_TOKEN
+
+# Spans of the same file closer than this (in characters) are merged into one
+MERGE_GAP_CHARS = 64
+# Separator between non-contiguous spans of the same file
+SPAN_SEPARATOR = "\n...\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate for budgeting; code averages ~4 characters per token.
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _uncovered(start: int, end: int, covered: list) -> list:
+    """
+    Returns the parts of [start, end) not covered by the sorted, disjoint intervals.
+    """
+    parts = []
+    cursor = start
+    for c_start, c_end in covered:
+        if c_end <= cursor:
+            continue
+        if c_start >= end:
+            break
+        if c_start > cursor:
+            parts.append((cursor, c_start))
+        cursor = max(cursor, c_end)
+    if cursor < end:
+        parts.append((cursor, end))
+    return parts
+
+
+def _add_interval(covered: list, start: int, end: int) -> list:
+    merged = []
+    for c_start, c_end in sorted(covered + [(start, end)]):
+        if merged and c_start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], c_end))
+        else:
+            merged.append((c_start, c_end))
+    return merged
+
+
+def _render_file(chunks: list) -> str:
+    """
+    Stitches the selected chunks of one file (sorted by offset) into text,
+    dropping overlapping characters and joining spans that are far apart
+    with SPAN_SEPARATOR.
+    """
+    pieces = []
+    end = None
+    for start, text in sorted(chunks):
+        if end is not None and start <= end:
+            # Overlapping or touching: only append the part not already emitted
+            pieces.append(text[end - start:])
+        elif end is not None and start - end <= MERGE_GAP_CHARS:
+            pieces.append("\n" + text)
+        else:
+            if end is not None:
+                pieces.append(SPAN_SEPARATOR)
+            pieces.append(text)
+        end = max(end if end is not None else start, start + len(text))
+    return "".join(pieces)
+
+
+def assemble_context(ranked_docs: list, token_budget: int) -> dict:
+    """
+    Builds the code context for the analysis prompt from retrieved chunks,
+    ordered by relevance. Chunks are taken greedily until the token budget
+    is spent; text a chunk shares with chunks already taken from the same
+    file (splitter overlap, duplicate hits) is neither counted nor repeated,
+    and overlapping or adjacent chunks are merged into one span.
+    Chunks without a 'start_index' are treated as standalone spans.
+    Returns {file_path: text}, files in order of their best-ranked chunk.
+    """
+    covered = {}
+    spans = {}
+    loose = {}
+    order = {}
+    seen_texts = set()
+    remaining = token_budget
+
+    for doc in ranked_docs:
+        source = doc.metadata.get("source", "unknown_file")
+        text = doc.page_content
+        start = doc.metadata.get("start_index")
+
+        if start is None:
+            if (source, text) in seen_texts:
+                continue
+            cost = estimate_tokens(text)
+            if cost > remaining:
+                continue
+            seen_texts.add((source, text))
+            loose.setdefault(source, []).append(text)
+        else:
+            new_parts = _uncovered(start, start + len(text), covered.get(source, []))
+            if not new_parts:
+                continue
+            cost = sum(estimate_tokens(text[a - start:b - start]) for a, b in new_parts)
+            if cost > remaining:
+                continue
+            covered[source] = _add_interval(covered.get(source, []), start, start + len(text))
+            spans.setdefault(source, []).append((start, text))
+
+        remaining -= cost
+        order.setdefault(source, None)
+        if remaining <= 0:
+            break
+
+    context = {}
+    for source in order:
+        parts = []
+        if source in spans:
+            parts.append(_render_file(spans[source]))
+        parts.extend(loose.get(source, []))
+        context[source] = SPAN_SEPARATOR.join(parts)
+    return context
@@ -0,0 +1,242 @@
+import os
+import json
+import hashlib
+import threading
+from contextlib import contextmanager
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from .metrics import span, get_metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within one process
+    fcntl = None
+
+EMBEDDING_SUBDIR = "embeddings"
+VECTORS_FILE = "vectors.f32"
+HASHES_FILE = "hashes.bin"
+META_FILE = "meta.json"
+LOCK_FILE = "store.lock"
+DIGEST_SIZE = 16
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+class EmbeddingStore:
+    """
+    Append-only on-disk store of embeddings, addressed by a hash of the chunk text.
+    Vectors live in a memory-mapped float32 matrix; row i belongs to the i-th
+    digest in the hash file. Several processes can share a store: appends and
+    repairs hold an exclusive lock on LOCK_FILE, and rows other processes
+    appended are read in before each append.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        self.vectors_path = os.path.join(store_dir, VECTORS_FILE)
+        self.hashes_path = os.path.join(store_dir, HASHES_FILE)
+        self.dim = None
+        self.rows = {}
+        self.count = 0  # rows in the files that have been read in
+        self._matrix = None
+        self._lock = threading.Lock()
+        os.makedirs(store_dir, exist_ok=True)
+        self._load()
+
+    @contextmanager
+    def _file_lock(self):
+        with open(os.path.join(self.store_dir, LOCK_FILE), "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _read_meta(self):
+        meta_path = os.path.join(self.store_dir, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+
+    def _load(self):
+        with self._lock, self._file_lock():
+            self._read_meta()
+            if self.dim is not None:
+                self._sync()
+
+    def _sync(self):
+        """
+        Reads in the rows appended since the last call, by this or another
+        process. Call with both locks held.
+        """
+        if not os.path.exists(self.hashes_path) or not os.path.exists(self.vectors_path):
+            open(self.hashes_path, "ab").close()
+            open(self.vectors_path, "ab").close()
+        hash_rows = os.path.getsize(self.hashes_path) // DIGEST_SIZE
+        vector_rows = os.path.getsize(self.vectors_path) // (self.dim * 4)
+        count = min(hash_rows, vector_rows)
+        # Appends hold the file lock, so uneven files here mean an append crashed halfway
+        if os.path.getsize(self.vectors_path) != count * self.dim * 4:
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(count * self.dim * 4)
+        if os.path.getsize(self.hashes_path) != count * DIGEST_SIZE:
+            with open(self.hashes_path, "r+b") as f:
+                f.truncate(count * DIGEST_SIZE)
+        if count <= self.count:
+            return
+
+        with open(self.hashes_path, "rb") as f:
+            f.seek(self.count * DIGEST_SIZE)
+            hashes = f.read((count - self.count) * DIGEST_SIZE)
+        for i in range(count - self.count):
+            # Two processes may both have appended a digest; the first row wins
+            self.rows.setdefault(hashes[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE], self.count + i)
+        self.count = count
+
+    def _get_matrix(self):
+        if self._matrix is None or self._matrix.shape[0] != self.count:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        return self._matrix
+
+    def get(self, digests: list):
+        """
+        Returns a (len(digests), dim) array with the cached rows, and the list of
+        positions that were not in the store.
+        """
+        with self._lock:
+            missing = [i for i, d in enumerate(digests) if d not in self.rows]
+            if self.dim is None or len(missing) == len(digests):
+                return None, missing
+            found = [(i, self.rows[d]) for i, d in enumerate(digests) if d in self.rows]
+            out = np.zeros((len(digests), self.dim), dtype=np.float32)
+            positions, rows = zip(*found)
+            out[list(positions)] = self._get_matrix()[list(rows)]
+            return out, missing
+
+    def put(self, digests: list, vectors: np.ndarray):
+        """
+        Appends new embeddings to the store. Digests already present are ignored.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock, self._file_lock():
+            if self.dim is None:
+                self._read_meta()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(os.path.join(self.store_dir, META_FILE), "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+            self._sync()
+
+            new = {}
+            for digest, vector in zip(digests, vectors):
+                if digest not in self.rows and digest not in new:
+                    new[digest] = vector
+            if not new:
+                return
+
+            # Vectors first: a digest is only trusted once its row is on disk
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.stack(list(new.values())).astype(np.float32).tobytes())
+            with open(self.hashes_path, "ab") as f:
+                f.write(b"".join(new.keys()))
+            for offset, digest in enumerate(new):
+                self.rows[digest] = self.count + offset
+            self.count += len(new)
+
+
+class LazyEmbeddings(Embeddings):
+    """
+    Embeddings that load their model from 'factory' on the first embedding
+    call instead of up front. The model is loaded once, even under concurrent calls.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def model(self) -> Embeddings:
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    with span("embed.load"):
+                        self._model = self._factory()
+        return self._model
+
+    def embed_documents(self, texts: list) -> list:
+        return self.model.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list:
+        return self.model.embed_query(text)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that only embeds chunks whose text is not yet in the
+    persistent store, in batches of 'batch_size'. Query embeddings are not cached.
+    Model calls are serialized, so one instance can serve an index build and
+    retrieval running in different threads.
+    """
+
+    def __init__(self, model: Embeddings, store: EmbeddingStore, batch_size: int):
+        self.model = model
+        self.store = store
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self._model_lock = threading.Lock()
+
+    def embed_documents(self, texts: list) -> list:
+        if not texts:
+            return []
+        digests = [_digest(text) for text in texts]
+        out, missing = self.store.get(digests)
+
+        # Embed each distinct missing text once
+        unique = {}
+        for i in missing:
+            unique.setdefault(digests[i], texts[i])
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        get_metrics().add("embed.cache_hits", len(texts) - len(missing))
+
+        miss_digests = list(unique)
+        miss_texts = list(unique.values())
+        for start in range(0, len(miss_texts), self.batch_size):
+            batch_texts = miss_texts[start:start + self.batch_size]
+            with self._model_lock, span("embed.model"):
+                batch_vectors = self.model.embed_documents(batch_texts)
+            get_metrics().add("embed.chunks", len(batch_texts))
+            self.store.put(miss_digests[start:start + self.batch_size], batch_vectors)
+
+        if missing:
+            out, _ = self.store.get(digests)
+        return out.tolist()
+
+    def embed_uncached(self, texts: list) -> list:
+        """
+        Embeds texts with the model without looking them up in or adding
+        them to the store, for texts unlikely to be embedded again.
+        """
+        if not texts:
+            return []
+        with self._model_lock, span("embed.model"):
+            return self.model.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list:
+        with self._model_lock, span("embed.query"):
+            return self.model.embed_query(text)
+
+
+def open_embedding_store(cache_dir: str, model_name: str) -> EmbeddingStore:
+    """
+    Opens the embedding store for a model. Stores are shared by every repo and
+    run that uses the same cache directory and model.
+    """
+    model_slug = hashlib.sha256(model_name.encode("utf-8")).hexdigest()[:16]
+    return EmbeddingStore(os.path.join(cache_dir, EMBEDDING_SUBDIR, model_slug))
@@ -0,0 +1,117 @@
+import math
+import faiss
+import numpy as np
+from .utils import (
+    FAISS_HNSW_MIN_CHUNKS, FAISS_IVFPQ_MIN_CHUNKS, FAISS_HNSW_M, FAISS_HNSW_EF_CONSTRUCTION,
+    FAISS_HNSW_EF_SEARCH, FAISS_NPROBE, FAISS_PQ_DIMS_PER_SUBQUANTIZER, FAISS_PQ_REFINE,
+    FAISS_REFINE_K_FACTOR
+)
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+
+# IVF training: points per inverted list, and the minimum PQ needs for 256 centroids
+IVF_TRAIN_POINTS_PER_LIST = 40
+PQ_MIN_TRAIN_POINTS = 256 * 39
+# Vectors copied from the flat index per add() call when converting
+CONVERT_BLOCK_SIZE = 65536
+
+
+def choose_index_type(chunk_count: int, requested: str = "auto") -> str:
+    """
+    Resolves 'auto' to an index type by corpus size: exact Flat search for
+    small repos, HNSW (fast, full vectors) for medium ones and IVF-PQ
+    (compressed, approximate) for very large ones.
+    """
+    if requested != "auto":
+        if requested not in INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type: {requested}")
+        # PQ codebooks can't be trained on fewer vectors than centroids
+        if requested == "ivfpq" and chunk_count < 256:
+            return "flat"
+        return requested
+    if chunk_count >= FAISS_IVFPQ_MIN_CHUNKS:
+        return "ivfpq"
+    if chunk_count >= FAISS_HNSW_MIN_CHUNKS:
+        return "hnsw"
+    return "flat"
+
+
+def _ivf_nlist(n: int) -> int:
+    # ~4 * sqrt(n) inverted lists, as a power of two
+    return int(min(65536, max(64, 2 ** round(math.log2(4 * math.sqrt(max(n, 1)))))))
+
+
+def _pq_subquantizers(d: int) -> int:
+    m = max(1, d // FAISS_PQ_DIMS_PER_SUBQUANTIZER)
+    while d % m:
+        m -= 1
+    return m
+
+
+def _training_sample(flat_index, n: int, nlist: int, seed: int = 0) -> np.ndarray:
+    """
+    A uniform random sample of the indexed vectors, large enough to train
+    both the coarse quantizer (nlist centroids) and the PQ codebooks.
+    """
+    size = min(n, max(IVF_TRAIN_POINTS_PER_LIST * nlist, PQ_MIN_TRAIN_POINTS))
+    ids = np.sort(np.random.default_rng(seed).choice(n, size=size, replace=False))
+    return flat_index.reconstruct_batch(ids.astype(np.int64))
+
+
+def convert_index(flat_index, index_type: str, refine: str = FAISS_PQ_REFINE):
+    """
+    Builds an index of 'index_type' holding the same vectors, in the same
+    order, as a flat index. Returns the flat index itself for 'flat'.
+    With 'refine' = 'sq8', IVF-PQ results are re-ranked with 8-bit
+    scalar-quantized copies of the vectors.
+    """
+    if index_type == "flat":
+        return flat_index
+
+    n, d = flat_index.ntotal, flat_index.d
+    metric = flat_index.metric_type
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(d, FAISS_HNSW_M, metric)
+        index.hnsw.efConstruction = FAISS_HNSW_EF_CONSTRUCTION
+    else:
+        nlist = min(_ivf_nlist(n), max(1, n // IVF_TRAIN_POINTS_PER_LIST))
+        quantizer = faiss.IndexFlatIP(d) if metric == faiss.METRIC_INNER_PRODUCT else faiss.IndexFlatL2(d)
+        index = faiss.IndexIVFPQ(quantizer, d, nlist, _pq_subquantizers(d), 8, metric)
+        if refine == "sq8":
+            index = faiss.IndexRefine(index, faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_8bit, metric))
+        elif refine:
+            raise ValueError(f"Unknown refine index: {refine}")
+        print(f"Training IVF-PQ index ({nlist} lists, {_pq_subquantizers(d)} subquantizers, refine: {refine})...")
+        index.train(_training_sample(flat_index, n, nlist))
+
+    for start in range(0, n, CONVERT_BLOCK_SIZE):
+        index.add(flat_index.reconstruct_n(start, min(CONVERT_BLOCK_SIZE, n - start)))
+
+    tune_index(index)
+    return index
+
+
+def tune_index(index, nprobe: int = FAISS_NPROBE, ef_search: int = FAISS_HNSW_EF_SEARCH):
+    """
+    Sets the query-time accuracy / speed knobs of approximate indexes:
+    inverted lists probed per query (IVF) and the search beam width (HNSW).
+    These are not all saved with the index, so call it after loading one.
+    """
+    if isinstance(index, faiss.IndexRefine):
+        index.k_factor = FAISS_REFINE_K_FACTOR
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = nprobe
+        # MMR re-reads candidate vectors by position; a refine index serves those itself
+        if not isinstance(index, faiss.IndexRefine) and ivf.direct_map.type == faiss.DirectMap.NoMap:
+            ivf.make_direct_map()
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+
+
+def index_type_of(index) -> str:
+    if faiss.try_extract_index_ivf(index) is not None:
+        return "ivfpq"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
@@ -0,0 +1,172 @@
+import re
+import math
+from collections import Counter
+from .utils import (
+    INDEX_MAX_FILE_BYTES, INDEX_MAX_REPO_BYTES, MINIFIED_MAX_AVG_LINE_CHARS, MINIFIED_MAX_LINE_CHARS,
+    ENCODED_MIN_ENTROPY
+)
+from .code_analyzer import is_indexed_path
+from .metrics import get_metrics
+
+# Third-party code checked into a repo (after GitHub linguist's vendor list)
+VENDORED_PATTERNS = [
+    r"(^|/)node_modules/", r"(^|/)bower_components/", r"(^|/)jspm_packages/", r"(^|/)vendor/",
+    r"(^|/)third[_-]?party/", r"(^|/)Pods/", r"(^|/)\.yarn/", r"(^|/)site-packages/",
+    r"(^|/)dist/",
+]
+# Build output and code generator output, by name
+GENERATED_PATTERNS = [
+    r"[.-]min\.(js|css)$", r"[.-]bundle\.js$", r"\.chunk\.js$",
+    r"\.pb(\.gw)?\.go$", r"\.pb\.(cc|h)$", r"_pb2(_grpc)?\.py$", r"_pb\.(js|ts)$", r"_grpc_pb\.(js|ts)$",
+    r"(_|\.)generated\.\w+$", r"\.g\.(cs|dart)$", r"\.designer\.cs$", r"(^|/)__generated__/",
+]
+# Markers code generators put near the top of their output
+GENERATED_MARKERS = [
+    r"code generated .* do not edit", r"@generated\b", r"generated by the protocol buffer compiler",
+    r"<auto-generated", r"this file (is|was) (automatically|auto-) ?generated", r"do not edit.{0,20}generated",
+]
+# .gitattributes attributes that mark files as not written in the repo
+LINGUIST_ATTRIBUTES = ("linguist-generated", "linguist-vendored")
+# Leading lines searched for GENERATED_MARKERS (further down they are usually
+# strings in a generator's own code), and bytes sampled for binary content and entropy
+HEADER_LINES = 10
+SAMPLE_BYTES = 64 * 1024
+# Entropy is meaningless for short files
+ENTROPY_MIN_BYTES = 1024
+
+_VENDORED_RE = re.compile("|".join(VENDORED_PATTERNS))
+_GENERATED_RE = re.compile("|".join(GENERATED_PATTERNS), re.I)
+_MARKERS_RE = re.compile("|".join(GENERATED_MARKERS), re.I)
+
+# Whether the filter's heuristics apply; set up by configure_file_filter()
+_enabled = True
+
+
+def configure_file_filter(enabled: bool = True):
+    """
+    Turns the vendored / generated / minified / encoded file heuristics and
+    the .gitattributes and .gitignore checks on or off. Supported extensions
+    and the size caps always apply.
+    """
+    global _enabled
+    _enabled = enabled
+
+
+def filter_params() -> dict:
+    """
+    The settings that decide which files are indexed (part of the index cache key).
+    JSON-compatible, since cached indexes are matched on it after a round trip.
+    """
+    params = {"max_file_bytes": INDEX_MAX_FILE_BYTES, "max_repo_bytes": INDEX_MAX_REPO_BYTES}
+    if _enabled:
+        params.update({
+            "vendored": VENDORED_PATTERNS,
+            "generated": GENERATED_PATTERNS,
+            "markers": GENERATED_MARKERS,
+            "attributes": list(LINGUIST_ATTRIBUTES),
+            "gitignore": True,
+            "minified": [MINIFIED_MAX_AVG_LINE_CHARS, MINIFIED_MAX_LINE_CHARS],
+            "encoded_entropy": ENCODED_MIN_ENTROPY,
+        })
+    return params
+
+
+def byte_entropy(data: bytes) -> float:
+    """
+    Shannon entropy of the bytes in 'data', in bits per byte (0 to 8).
+    """
+    if not data:
+        return 0.0
+    total = len(data)
+    return -sum(count / total * math.log2(count / total) for count in Counter(data).values())
+
+
+def _is_minified(data: bytes) -> bool:
+    lines = data.count(b"\n") + 1
+    if len(data) / lines > MINIFIED_MAX_AVG_LINE_CHARS:
+        return True
+    return any(len(line) > MINIFIED_MAX_LINE_CHARS for line in data.split(b"\n"))
+
+
+class FileFilter:
+    """
+    Decides which files of a checkout are indexed and counts the rest by
+    reason: "unsupported" (extension or excluded directory), "vendored",
+    "generated" (by path or by a generator's marker), "gitattributes"
+    (linguist-generated / linguist-vendored), "gitignore" (committed files the
+    repo's .gitignore excludes), "too_large" (over max_file_bytes), "binary",
+    "minified", "encoded" (high entropy) and "repo_cap" (past max_repo_bytes).
+    An explicitly unset linguist attribute ("-linguist-generated") keeps a
+    file that the vendored / generated rules would skip.
+    One instance serves one checkout.
+    """
+
+    def __init__(self, max_file_bytes: int = INDEX_MAX_FILE_BYTES, max_repo_bytes: int = INDEX_MAX_REPO_BYTES):
+        self.max_file_bytes = max_file_bytes
+        self.max_repo_bytes = max_repo_bytes
+        self.heuristics = _enabled
+        self.skipped = {}  # reason -> [files, bytes]
+        self.files = 0
+        self.bytes = 0
+
+    def skip(self, reason: str, size: int = 0):
+        entry = self.skipped.setdefault(reason, [0, 0])
+        entry[0] += 1
+        entry[1] += size
+
+    def path_reason(self, path: str, attributes: dict = None):
+        """
+        Why the file at 'path' is not indexed, judged by its path and its
+        linguist attributes (attribute -> True / False, if set or unset), or None.
+        """
+        if not is_indexed_path(path):
+            return "unsupported"
+        if not self.heuristics:
+            return None
+        attributes = attributes or {}
+        if any(attributes.values()):
+            return "gitattributes"
+        if attributes.get("linguist-vendored") is None and _VENDORED_RE.search(path):
+            return "vendored"
+        if attributes.get("linguist-generated") is None and _GENERATED_RE.search(path):
+            return "generated"
+        return None
+
+    def content_reason(self, data: bytes, attributes: dict = None):
+        """
+        Why a file with this content is not indexed, or None. A file that is
+        indexed counts towards max_repo_bytes.
+        """
+        if len(data) > self.max_file_bytes:
+            return "too_large"
+        sample = data[:SAMPLE_BYTES]
+        if self.heuristics:
+            if b"\0" in sample:
+                return "binary"
+            header = b"\n".join(sample.split(b"\n", HEADER_LINES)[:HEADER_LINES]).decode("utf-8", "replace")
+            if (attributes or {}).get("linguist-generated") is None and _MARKERS_RE.search(header):
+                return "generated"
+            if _is_minified(data):
+                return "minified"
+            if len(sample) >= ENTROPY_MIN_BYTES and byte_entropy(sample) >= ENCODED_MIN_ENTROPY:
+                return "encoded"
+        if self.bytes + len(data) > self.max_repo_bytes:
+            return "repo_cap"
+        self.files += 1
+        self.bytes += len(data)
+        return None
+
+    def report(self):
+        """
+        Prints what was skipped and records it in the scan metrics, as
+        index.skipped_files.<reason> and index.skipped_bytes.<reason>.
+        """
+        metrics = get_metrics()
+        for reason, (files, size) in sorted(self.skipped.items()):
+            metrics.add(f"index.skipped_files.{reason}", files)
+            metrics.add(f"index.skipped_bytes.{reason}", size)
+        metrics.add("index.files", self.files)
+        metrics.add("index.bytes", self.bytes)
+        skipped = ", ".join(f"{reason} {files} ({size / 1024:.0f} KB)"
+                            for reason, (files, size) in sorted(self.skipped.items()))
+        print(f"Indexing {self.files} files ({self.bytes / 1024 ** 2:.1f} MB). Skipped: {skipped or 'none'}.")
@@ -1,47 +1,299 @@
 import os
-from github import Github, Auth
-from git import Repo
-from .utils import WORKSPACE_DIR
+import json
+import time
+import hashlib
+import datetime
+import threading
+from typing import TYPE_CHECKING
+from urllib.parse import urlencode
+from .utils import GITHUB_API_URL, HTTP_CACHE_TTL_SECONDS, HTTP_CACHE_MAX_BYTES, parse_github_url, write_file_atomic
+from .metrics import span, get_metrics
 
-def get_github_api():
+if TYPE_CHECKING:
+    from git import Repo  # requests and GitPython are imported on first use, keeping CLI startup fast
+
+HTTP_CACHE_SUBDIR = "http_cache"
+PAGE_SIZE = 100
+REQUEST_TIMEOUT = 30
+# Upper bound on repo-wide comment pages read before falling back to per-issue fetches
+BULK_COMMENT_MAX_PAGES = 20
+# The HTTP cache is trimmed on the first page stored and then once every this many
+TRIM_EVERY = 200
+
+def _normalize_time(value):
     """
-    Initializes the PyGithub client using an environment variable.
+    Normalizes an ISO 8601 timestamp ('...Z' or '...+00:00') to isoformat().
     """
-    token = os.environ.get("GITHUB_TOKEN")
-    if not token:
-        print("Warning: GITHUB_TOKEN environment variable not set. API rate limits will be very low.")
-        return Github()
-        
-    auth = Auth.Token(token)
-    return Github(auth=auth)
+    if not value:
+        return None
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).isoformat()
+
 
-def fetch_all_open_issues(owner: str, repo_name: str):
+def issue_from_json(item: dict) -> dict:
     """
-    Fetches all open issues for a repository.
-    Returns a PaginatedList of Issue objects.
+    Converts a GitHub issue object (REST API or webhook payload) to an issue dict.
     """
-    print(f"Fetching all open issues for {owner}/{repo_name}...")
-    g = get_github_api()
-    try:
-        repo = g.get_repo(f"{owner}/{repo_name}")
-        # Returns a PaginatedList. Iteration in main.py will handle paging.
-        return repo.get_issues(state='open')
-    except Exception as e:
-        print(f"Error fetching issues: {e}")
-        raise
+    return {
+        "title": item["title"],
+        "body": item.get("body") or "", # Ensure body is not None
+        "comments": None, # Attached by fetch_comments_bulk()
+        "url": item["html_url"],
+        "number": item["number"],
+        "state": item.get("state", "open"),
+        "labels": [label["name"] for label in item.get("labels", [])],
+        "comment_count": item.get("comments", 0),
+        "created_at": _normalize_time(item.get("created_at")),
+        "updated_at": _normalize_time(item.get("updated_at")),
+    }
+
 
-def clone_repo(repo_url: str, clone_path: str) -> Repo:
+def _comment_from_json(item: dict) -> dict:
+    return {"user": (item.get("user") or {}).get("login", "ghost"), "body": item.get("body") or ""}
+
+
+class GitHubClient:
     """
-    Clones a public GitHub repository and returns the Repo object.
+    Minimal GitHub REST client for bulk issue and comment fetching.
+    Pages are requested at the maximum page size and revalidated with ETags
+    (If-None-Match); a 304 reply reuses the stored page and does not count
+    against the rate limit. Stored pages expire after 'cache_ttl_seconds',
+    and the least recently used go first beyond 'cache_max_bytes'. Keeps
+    counts of requests and rate limit usage.
+    """
+
+    def __init__(self, token: str = None, api_url: str = None, cache_dir: str = None,
+                 cache_ttl_seconds: float = HTTP_CACHE_TTL_SECONDS, cache_max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        import requests
+
+        self.api_url = (api_url or os.environ.get("GITHUB_API_URL") or GITHUB_API_URL).rstrip("/")
+        self.session = requests.Session()
+        self.session.headers["Accept"] = "application/vnd.github+json"
+        token = token if token is not None else os.environ.get("GITHUB_TOKEN")
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+        else:
+            print("Warning: GITHUB_TOKEN environment variable not set. API rate limits will be very low.")
+        self.etag_dir = os.path.join(cache_dir, HTTP_CACHE_SUBDIR) if cache_dir else None
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.cache_max_bytes = cache_max_bytes
+        self._writes = 0
+        self.requests = 0
+        self.not_modified = 0
+        self.rate_limit_start = None
+        self.rate_limit_remaining = None
+        self._lock = threading.Lock()
+
+    def _cache_path(self, url: str) -> str:
+        return os.path.join(self.etag_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _get(self, url: str, params: dict = None):
+        """
+        GETs one page. Returns (json_body, next_page_url).
+        """
+        if params:
+            url = f"{url}?{urlencode(params)}"
+
+        cached = None
+        headers = {}
+        if self.etag_dir:
+            try:
+                with open(self._cache_path(url), "r", encoding="utf-8") as f:
+                    cached = json.load(f)
+                headers["If-None-Match"] = cached["etag"]
+            except (OSError, ValueError, KeyError):
+                cached = None
+
+        with span("github.request"):
+            response = self.session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        self._record(response)
+
+        if response.status_code == 304 and cached is not None:
+            try:
+                os.utime(self._cache_path(url))  # Last used, for trimming
+            except OSError:
+                pass
+            return cached["body"], cached.get("next")
+        response.raise_for_status()
+
+        body = response.json()
+        next_url = response.links.get("next", {}).get("url")
+        etag = response.headers.get("ETag")
+        if self.etag_dir and etag:
+            os.makedirs(self.etag_dir, exist_ok=True)
+            write_file_atomic(self._cache_path(url), json.dumps({"etag": etag, "body": body, "next": next_url}))
+            with self._lock:
+                trim = self._writes % TRIM_EVERY == 0
+                self._writes += 1
+            if trim:
+                self._trim_cache()
+        return body, next_url
+
+    def _trim_cache(self):
+        """
+        Deletes stored pages not used within cache_ttl_seconds (the URLs of
+        'since' queries change every run), then the least recently used ones
+        until the cache fits in cache_max_bytes.
+        """
+        now = time.time()
+        entries = []
+        with os.scandir(self.etag_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in sorted(entries):
+            if now - mtime <= self.cache_ttl_seconds and total <= self.cache_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def _record(self, response):
+        get_metrics().add("github.not_modified" if response.status_code == 304 else "github.requests")
+        with self._lock:
+            self.requests += 1
+            if response.status_code == 304:
+                self.not_modified += 1
+            remaining = response.headers.get("X-RateLimit-Remaining")
+            if remaining is not None:
+                remaining = int(remaining)
+                if self.rate_limit_start is None:
+                    # The first request itself was charged unless it was a 304
+                    self.rate_limit_start = remaining + (0 if response.status_code == 304 else 1)
+                self.rate_limit_remaining = remaining
+
+    def _iter_pages(self, path: str, params: dict):
+        url = f"{self.api_url}{path}"
+        params = dict(params, per_page=PAGE_SIZE)
+        while url:
+            body, url = self._get(url, params)
+            params = None # The 'next' link already carries the query
+            yield body
+
+    def iter_issues(self, owner: str, repo_name: str, since=None):
+        """
+        Yields issue dicts (pull requests excluded), newest first.
+        If 'since' (a datetime) is given, only issues updated after it are returned,
+        including ones closed since then so callers can drop them.
+        """
+        params = {"state": "open"}
+        if since is not None:
+            print(f"Fetching issues of {owner}/{repo_name} updated since {since.isoformat()}...")
+            params = {"state": "all", "since": since.strftime("%Y-%m-%dT%H:%M:%SZ")}
+        else:
+            print(f"Fetching all open issues for {owner}/{repo_name}...")
+
+        for page in self._iter_pages(f"/repos/{owner}/{repo_name}/issues", params):
+            for item in page:
+                # Skip pull requests, as they are listed as issues
+                if "pull_request" not in item:
+                    yield issue_from_json(item)
+
+    def fetch_issue(self, owner: str, repo_name: str, number: int) -> dict:
+        body, _ = self._get(f"{self.api_url}/repos/{owner}/{repo_name}/issues/{number}")
+        return issue_from_json(body)
+
+    def fetch_issue_comments(self, owner: str, repo_name: str, number: int) -> list:
+        comments = []
+        for page in self._iter_pages(f"/repos/{owner}/{repo_name}/issues/{number}/comments", {}):
+            comments.extend(_comment_from_json(item) for item in page)
+        return comments
+
+    def fetch_comments_bulk(self, owner: str, repo_name: str, issues: list):
+        """
+        Attaches comments to the given issue dicts using the repo-wide comments
+        listing instead of one request per issue. The listing is walked newest
+        first, back to the oldest issue's creation time, and stops as soon as
+        every issue has all its comments. It reads at most BULK_COMMENT_MAX_PAGES
+        pages and fewer pages than there are issues to cover, so it never costs
+        more requests than the per-issue fetches it replaces. Issues whose
+        comments were not all seen are left with 'comments' = None for a
+        per-issue fetch.
+        """
+        by_number = {}
+        for issue in issues:
+            if issue["comment_count"] == 0:
+                issue["comments"] = []
+            else:
+                by_number[issue["number"]] = issue
+        max_pages = min(BULK_COMMENT_MAX_PAGES, len(by_number) - 1)
+        if max_pages < 1:
+            return
+
+        oldest = min(by_number.values(), key=lambda i: i["created_at"])["created_at"]
+        since = datetime.datetime.fromisoformat(oldest).strftime("%Y-%m-%dT%H:%M:%SZ")
+        collected = {number: [] for number in by_number}
+        params = {"since": since, "sort": "created", "direction": "desc"}
+        pages = self._iter_pages(f"/repos/{owner}/{repo_name}/issues/comments", params)
+        uncovered = set(by_number)
+        for page_number, page in enumerate(pages, start=1):
+            for item in page:
+                number = int(item["issue_url"].rsplit("/", 1)[-1])
+                if number in collected:
+                    collected[number].append(_comment_from_json(item))
+                    if len(collected[number]) >= by_number[number]["comment_count"]:
+                        uncovered.discard(number)
+            if not uncovered or page_number >= max_pages:
+                break
+
+        for number, issue in by_number.items():
+            if number not in uncovered:
+                issue["comments"] = collected[number][::-1]
+
+    def usage_summary(self) -> str:
+        used = "unknown"
+        if self.rate_limit_start is not None:
+            used = self.rate_limit_start - self.rate_limit_remaining
+        return (f"GitHub API: {self.requests} requests ({self.not_modified} not modified), "
+                f"rate limit used: {used}, remaining: {self.rate_limit_remaining}")
+
+
+def clone_source(repo_url: str) -> str:
+    """
+    The URL to clone repo_url from. The GITHUB_CLONE_URL environment variable,
+    a template such as 'file:///srv/mirrors/{owner}/{repo}', redirects clones
+    (e.g. to local fixtures).
+    """
+    template = os.environ.get("GITHUB_CLONE_URL")
+    if not template:
+        return repo_url
+    owner, repo_name = parse_github_url(repo_url)
+    return template.format(owner=owner, repo=repo_name)
+
+
+def changed_files_between(repo: "Repo", old_sha: str, new_sha: str) -> tuple[set, set]:
+    """
+    Diffs two commits and returns (removed_paths, changed_paths).
+    'changed_paths' holds files that were added or modified in new_sha; renamed
+    files appear as a removal of the old path plus a change of the new one.
+    The old commit is fetched first if the (shallow) clone does not have it.
     """
-    if os.path.exists(clone_path):
-        print(f"Repository already exists at {clone_path}. Using existing.")
-        return Repo(clone_path)
-        
     try:
-        repo = Repo.clone_from(repo_url, clone_path, progress=None, depth=1)
-        print(f"Successfully cloned {repo_url} to {clone_path}")
-        return repo
-    except Exception as e:
-        print(f"Error cloning repository: {e}")
-        raise
\ No newline at end of file
+        old_commit = repo.commit(old_sha)
+        old_commit.tree  # Force the object lookup
+    except Exception:
+        print(f"Fetching base commit {old_sha[:12]} for incremental diff...")
+        repo.git.fetch("origin", old_sha, depth=1)
+        old_commit = repo.commit(old_sha)
+
+    removed, changed = set(), set()
+    for diff in old_commit.diff(repo.commit(new_sha)):
+        if diff.change_type == "A":
+            changed.add(diff.b_path)
+        elif diff.change_type == "D":
+            removed.add(diff.a_path)
+        elif diff.change_type == "R":
+            removed.add(diff.a_path)
+            changed.add(diff.b_path)
+        else:
+            # Modified, type-changed, copied
+            removed.add(diff.a_path)
+            changed.add(diff.b_path)
+    return removed, changed
@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import shutil
+import socket
+import hashlib
+from .utils import INDEX_STAGING_MAX_AGE_SECONDS, on_rmtree_error, pid_alive, write_file_atomic
+
+INDEX_SUBDIR = "indexes"
+META_FILE = "cache_meta.json"
+# Version of the on-disk index layout; indexes saved in another layout are never used
+INDEX_FORMAT = 3
+# Staging directories are named <key>.tmp-<host>-<pid> while their index is built
+STAGING_MARKER = ".tmp-"
+
+
+def index_cache_key(repo_id: str, commit_sha: str, embedding_model: str, chunking: dict,
+                    index_type: str = "auto") -> str:
+    """
+    Builds the content-addressed key for a vector index.
+    Any change to the repo, commit, embedding model, chunking parameters,
+    requested index type or INDEX_FORMAT yields a new key.
+    """
+    payload = json.dumps(
+        {
+            "repo": repo_id.lower(),
+            "commit": commit_sha,
+            "embedding_model": embedding_model,
+            "chunking": chunking,
+            "index_type": index_type,
+            "format": INDEX_FORMAT,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def get_index_root(cache_dir: str) -> str:
+    return os.path.join(cache_dir, INDEX_SUBDIR)
+
+
+def get_index_dir(cache_dir: str, key: str) -> str:
+    return os.path.join(get_index_root(cache_dir), key)
+
+
+def _read_meta(index_dir: str):
+    meta_path = os.path.join(index_dir, META_FILE)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(index_dir: str, meta: dict):
+    write_file_atomic(os.path.join(index_dir, META_FILE), json.dumps(meta, indent=2))
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                pass
+    return total
+
+
+def lookup_index(cache_dir: str, key: str):
+    """
+    Returns the directory of a completed cached index, or None on a miss.
+    A hit refreshes the entry's last-used time for LRU eviction.
+    """
+    index_dir = get_index_dir(cache_dir, key)
+    meta = _read_meta(index_dir)
+    if meta is None or meta.get("key") != key:
+        return None
+
+    meta["last_used_at"] = time.time()
+    try:
+        _write_meta(index_dir, meta)
+    except OSError as e:
+        # Only LRU eviction order depends on it; the index itself is usable
+        print(f"Warning: could not update the last-used time of index {key}: {e}")
+    return index_dir
+
+
+def begin_index_build(cache_dir: str, key: str) -> str:
+    """
+    Returns a fresh staging directory to build an index into.
+    The index only becomes visible to lookups after commit_index_build().
+    """
+    staging_dir = get_index_dir(cache_dir, f"{key}{STAGING_MARKER}{socket.gethostname()}-{os.getpid()}")
+    if os.path.exists(staging_dir):
+        shutil.rmtree(staging_dir, onerror=on_rmtree_error)
+    os.makedirs(staging_dir)
+    return staging_dir
+
+
+def commit_index_build(cache_dir: str, key: str, staging_dir: str, meta: dict) -> str:
+    """
+    Atomically publishes a staged index under its cache key.
+    """
+    now = time.time()
+    meta = dict(meta, key=key, format=INDEX_FORMAT, created_at=now, last_used_at=now, size_bytes=_dir_size(staging_dir))
+    _write_meta(staging_dir, meta)
+
+    index_dir = get_index_dir(cache_dir, key)
+    if os.path.exists(index_dir):
+        shutil.rmtree(index_dir, onerror=on_rmtree_error)
+    os.replace(staging_dir, index_dir)
+    return index_dir
+
+
+def abort_index_build(staging_dir: str):
+    if os.path.exists(staging_dir):
+        shutil.rmtree(staging_dir, onerror=on_rmtree_error)
+
+
+def _is_stale_build(staging_dir: str, max_age: float) -> bool:
+    """
+    Whether a staging directory was left behind by a crashed build: its
+    process (on this host) is gone, or it is older than 'max_age'.
+    """
+    try:
+        age = time.time() - os.path.getmtime(staging_dir)
+    except OSError:
+        return False
+    if age > max_age:
+        return True
+    host, _, pid = os.path.basename(staging_dir).split(STAGING_MARKER, 1)[1].rpartition("-")
+    # Processes of other hosts sharing the cache can't be checked
+    return host == socket.gethostname() and pid.isdigit() and not pid_alive(int(pid))
+
+
+def sweep_staging_dirs(cache_dir: str, max_age: float = INDEX_STAGING_MAX_AGE_SECONDS) -> int:
+    """
+    Deletes the staging directories of crashed index builds (see _is_stale_build).
+    Returns the total size of those still in use.
+    """
+    index_root = get_index_root(cache_dir)
+    if not os.path.isdir(index_root):
+        return 0
+
+    in_use = 0
+    for name in os.listdir(index_root):
+        if STAGING_MARKER not in name:
+            continue
+        staging_dir = os.path.join(index_root, name)
+        if not _is_stale_build(staging_dir, max_age):
+            in_use += _dir_size(staging_dir)
+            continue
+        print(f"Removing unfinished index build {name}...")
+        try:
+            shutil.rmtree(staging_dir, onerror=on_rmtree_error)
+        except Exception as e:
+            print(f"Warning: Could not remove {staging_dir}. Error: {e}")
+            in_use += _dir_size(staging_dir)
+    return in_use
+
+
+def list_cached_indexes(cache_dir: str) -> list:
+    """
+    Returns (index_dir, meta) pairs for every completed index in the cache.
+    """
+    index_root = get_index_root(cache_dir)
+    if not os.path.isdir(index_root):
+        return []
+
+    entries = []
+    for name in os.listdir(index_root):
+        index_dir = os.path.join(index_root, name)
+        meta = _read_meta(index_dir)
+        if meta is not None and meta.get("key") == name:
+            entries.append((index_dir, meta))
+    return entries
+
+
+def find_latest_index(cache_dir: str, **match):
+    """
+    Returns (index_dir, meta) for the most recently built index whose metadata
+    matches every given field, or None. Used as the base for incremental re-indexing.
+    """
+    candidates = [
+        (index_dir, meta) for index_dir, meta in list_cached_indexes(cache_dir)
+        if meta.get("format") == INDEX_FORMAT
+        and all(meta.get(field) == value for field, value in match.items())
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda e: e[1].get("created_at", 0))
+
+
+def evict_lru(cache_dir: str, max_bytes: int, keep: str = None):
+    """
+    Deletes least-recently-used indexes until the cache fits within max_bytes,
+    counting the builds in progress. The entry named by 'keep' is never evicted.
+    Staging directories of crashed builds are deleted first.
+    """
+    entries = list_cached_indexes(cache_dir)
+    total = sum(meta.get("size_bytes", 0) for _, meta in entries) + sweep_staging_dirs(cache_dir)
+    if total <= max_bytes:
+        return
+
+    for index_dir, meta in sorted(entries, key=lambda e: e[1].get("last_used_at", 0)):
+        if total <= max_bytes:
+            break
+        if meta.get("key") == keep:
+            continue
+        print(f"Evicting cached index for {meta.get('repo')}@{str(meta.get('commit'))[:12]}...")
+        try:
+            shutil.rmtree(index_dir, onerror=on_rmtree_error)
+            total -= meta.get("size_bytes", 0)
+        except Exception as e:
+            print(f"Warning: Could not evict {index_dir}. Error: {e}")
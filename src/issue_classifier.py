@@ -0,0 +1,210 @@
+import os
+import re
+import json
+import time
+import threading
+from contextlib import nullcontext
+from .utils import (
+    EMBEDDING_MODEL, CLASSIFIER_MIN_EXAMPLES, CLASSIFIER_MARGIN, CLASSIFIER_MIN_ACCURACY,
+    CLASSIFIER_MIN_CHECKS, CLASSIFIER_AUDIT_EVERY, write_file_atomic
+)
+from .llm_handler import classify_issue_type
+from .issue_dedup import embed_issues
+from .metrics import get_metrics
+
+CLASSIFIER_FILE = "issue_classifier.json"
+ISSUE_TYPES = ("BUG", "FEATURE", "QUESTION", "ANNOUNCEMENT")
+# Agreement counts are halved past this many checks, so old checks fade out
+MAX_CHECKS = 200
+
+# Words in label names (split at anything but letters / digits) that give away the type
+_LABEL_WORDS = {
+    "bug": "BUG", "defect": "BUG", "regression": "BUG", "crash": "BUG",
+    "enhancement": "FEATURE", "feature": "FEATURE", "proposal": "FEATURE", "rfc": "FEATURE",
+    "question": "QUESTION",
+    "announcement": "ANNOUNCEMENT",
+}
+# Labels that deny a type ("not a bug", "wontfix: not-bug") say nothing about it
+_NEGATED_LABEL_RE = re.compile(r"\bnot\b|\bno\b|\binvalid\b")
+
+_TITLE_PATTERNS = [
+    (r"^\W*(bug|bug report|defect|regression)\s*[:\]|-]", "BUG"),
+    (r"^\W*(feature|feature request|enhancement|rfc|proposal)\s*[:\]|-]", "FEATURE"),
+    (r"^\W*(question|help|support)\W*[:\]]", "QUESTION"),
+    (r"^(how (do|can|should|to)|is (it|there) (a way|possible)|what is the)\b.*\?\s*$", "QUESTION"),
+    (r"^\W*(announcement|ann)\W*[:\]]", "ANNOUNCEMENT"),
+]
+# Headings and phrases of GitHub's default issue templates, and crash output
+_BODY_PATTERNS = [
+    (r"describe the bug|steps to reproduce|expected behaviou?r|actual behaviou?r", "BUG"),
+    (r"traceback \(most recent call last\)|^panic: |segmentation fault|exception in thread", "BUG"),
+    (r"is your feature request related to a problem|describe the solution you'?d like|"
+     r"describe alternatives you'?ve considered", "FEATURE"),
+]
+_TITLE_RES = [(re.compile(p, re.I), t) for p, t in _TITLE_PATTERNS]
+_BODY_RES = [(re.compile(p, re.I | re.M), t) for p, t in _BODY_PATTERNS]
+
+
+def _label_types(labels: list) -> set:
+    types = set()
+    for label in labels or []:
+        label = label.lower()
+        if _NEGATED_LABEL_RE.search(label):
+            continue
+        types.update(_LABEL_WORDS[w] for w in re.split(r"[^a-z0-9]+", label) if w in _LABEL_WORDS)
+    return types
+
+
+def rule_type(issue_data: dict):
+    """
+    Tier 1: the issue's type from its labels, a title prefix ("[Bug]",
+    "Feature request:", "How do I ...?") or its issue template, in that order.
+    A source naming two different types is skipped. Returns the type or None.
+    """
+    for types in (
+        _label_types(issue_data.get("labels")),
+        {t for regex, t in _TITLE_RES if regex.search(issue_data["title"])},
+        {t for regex, t in _BODY_RES if regex.search(issue_data.get("body") or "")},
+    ):
+        if len(types) == 1:
+            return types.pop()
+    return None
+
+
+class IssueClassifier:
+    """
+    Tiered issue classifier: rules (rule_type), then nearest-centroid over the
+    issue embeddings, then the LLM. classify() returns the type and the tier
+    that decided it ("rules", "centroid" or "llm").
+
+    Centroids are trained on the decisions of the rules and the LLM. An
+    issue is only embedded when the centroid tier can answer (two classes
+    are trained) or its class still needs examples, so issues the rules
+    classify stop costing an embedding once their class is trained. The
+    centroid tier only answers once its confident guesses have agreed with the
+    LLM often enough (CLASSIFIER_MIN_ACCURACY over CLASSIFIER_MIN_CHECKS), and
+    every CLASSIFIER_AUDIT_EVERY-th confident guess is still checked by the LLM.
+    State is kept in <cache_dir>/issue_classifier.json across scans and repos;
+    call save() to write it. Without 'tiered', every issue goes to the LLM.
+    """
+
+    def __init__(self, embeddings, cache_dir: str = None, llm_model: str = None, tiered: bool = True):
+        self.embeddings = embeddings if tiered else None
+        self.llm_model = llm_model
+        self.tiered = tiered
+        self.path = os.path.join(cache_dir, CLASSIFIER_FILE) if cache_dir else None
+        self.state = self._load()
+        self._centroids = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("embedding_model") == EMBEDDING_MODEL:
+                return state
+        except (OSError, TypeError, ValueError):
+            pass
+        return {"embedding_model": EMBEDDING_MODEL, "classes": {}, "checks": 0, "agreed": 0, "guesses": 0}
+
+    def save(self):
+        if not self.path or not self.tiered:
+            return
+        with self._lock:
+            data = json.dumps(self.state)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        write_file_atomic(self.path, data)
+
+    def classify(self, issue_data: dict, llm_limit=None) -> tuple:
+        """
+        Returns (type, tier). 'llm_limit' (a semaphore) is held only while
+        the LLM classifies.
+        """
+        start = time.perf_counter()
+        issue_type = rule_type(issue_data) if self.tiered else None
+        tier = "rules"
+        vector = None
+        if issue_type is None:
+            # The centroid tier can only answer once two classes are trained
+            if self.embeddings is not None and self._trained_classes() >= 2:
+                vector = embed_issues(self.embeddings, [issue_data])[0]
+            guess = self._guess(vector) if vector is not None else None
+            if guess is not None and self._trust_guess():
+                issue_type, tier = guess, "centroid"
+            else:
+                with llm_limit or nullcontext():
+                    issue_type, tier = classify_issue_type(issue_data, self.llm_model), "llm"
+                if guess is not None and issue_type in ISSUE_TYPES:
+                    self._check(guess == issue_type)
+
+        if tier != "centroid" and self.embeddings is not None and issue_type in ISSUE_TYPES:
+            # Issues are only embedded to learn from while their class is short of
+            # examples, unless the centroid tier already needed the embedding
+            if vector is None and self._examples(issue_type) < CLASSIFIER_MIN_EXAMPLES:
+                vector = embed_issues(self.embeddings, [issue_data])[0]
+            if vector is not None:
+                self._learn(issue_type, vector)
+        get_metrics().observe(f"classify.{tier}", time.perf_counter() - start)
+        print(f"Issue #{issue_data['number']} classified as {issue_type} by {tier}.")
+        return issue_type, tier
+
+    def _guess(self, vector):
+        """
+        Tier 2: the class with the nearest centroid, if it is trained well
+        enough and clearly nearer than the runner-up. Otherwise None.
+        """
+        import numpy as np
+
+        with self._lock:
+            if self._centroids is None:
+                classes = sorted(c for c, entry in self.state["classes"].items() if len(entry["sum"]) == len(vector))
+                sums = np.array([self.state["classes"][c]["sum"] for c in classes], dtype=np.float32)
+                counts = np.array([self.state["classes"][c]["count"] for c in classes])
+                self._centroids = (classes, sums, counts)
+            classes, sums, counts = self._centroids
+        if (counts >= CLASSIFIER_MIN_EXAMPLES).sum() < 2:
+            return None
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+        scores = centroids @ vector
+        order = np.argsort(scores)[::-1]
+        best, runner_up = order[0], order[1]
+        if counts[best] < CLASSIFIER_MIN_EXAMPLES or scores[best] - scores[runner_up] < CLASSIFIER_MARGIN:
+            return None
+        return classes[best]
+
+    def _examples(self, issue_type: str) -> int:
+        with self._lock:
+            entry = self.state["classes"].get(issue_type)
+            return entry["count"] if entry else 0
+
+    def _trained_classes(self) -> int:
+        with self._lock:
+            return sum(entry["count"] >= CLASSIFIER_MIN_EXAMPLES for entry in self.state["classes"].values())
+
+    def _trust_guess(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state["checks"] < CLASSIFIER_MIN_CHECKS or state["agreed"] < CLASSIFIER_MIN_ACCURACY * state["checks"]:
+                return False
+            state["guesses"] += 1
+            return state["guesses"] % CLASSIFIER_AUDIT_EVERY != 0
+
+    def _check(self, agreed: bool):
+        with self._lock:
+            state = self.state
+            state["checks"] += 1
+            state["agreed"] += agreed
+            if state["checks"] > MAX_CHECKS:
+                state["checks"] //= 2
+                state["agreed"] //= 2
+
+    def _learn(self, issue_type: str, vector):
+        with self._lock:
+            entry = self.state["classes"].get(issue_type)
+            if entry is None:
+                entry = self.state["classes"][issue_type] = {"count": 0, "sum": [0.0] * len(vector)}
+            if len(entry["sum"]) != len(vector):
+                return
+            entry["count"] += 1
+            entry["sum"] = [a + float(b) for a, b in zip(entry["sum"], vector)]
+            self._centroids = None
@@ -0,0 +1,107 @@
+import threading
+from collections import OrderedDict
+from .metrics import span, get_metrics
+
+# Title and body beyond this add nothing: the embedding model truncates long inputs
+ISSUE_TEXT_MAX_CHARS = 2000
+# Issue vectors kept in memory, so duplicate detection and classification embed an issue once
+ISSUE_VECTOR_CACHE_SIZE = 1024
+
+_vectors = OrderedDict()  # issue text -> normalized vector, least recently used first
+_vectors_lock = threading.Lock()
+
+
+def issue_text(issue_data: dict) -> str:
+    return f"{issue_data['title']}\n\n{issue_data.get('body') or ''}"[:ISSUE_TEXT_MAX_CHARS]
+
+
+def embed_issues(embeddings, issues: list):
+    """
+    Normalized (len(issues), dim) float32 embeddings of the issues' title and body.
+    Issue texts are rarely embedded again in later runs, so they bypass the
+    chunk embedding cache (see CachedEmbeddings.embed_uncached); the latest
+    ISSUE_VECTOR_CACHE_SIZE are kept in memory instead.
+    """
+    import numpy as np
+
+    texts = [issue_text(i) for i in issues]
+    with _vectors_lock:
+        found = {text: _vectors[text] for text in texts if text in _vectors}
+        for text in found:
+            _vectors.move_to_end(text)
+    missing = list(dict.fromkeys(text for text in texts if text not in found))
+    if missing:
+        embed = getattr(embeddings, "embed_uncached", embeddings.embed_documents)
+        with span("issue.embed"):
+            vectors = np.asarray(embed(missing), dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        with _vectors_lock:
+            for text, vector in zip(missing, vectors):
+                found[text] = _vectors[text] = vector
+            while len(_vectors) > ISSUE_VECTOR_CACHE_SIZE:
+                _vectors.popitem(last=False)
+    return np.stack([found[text] for text in texts])
+
+
+class IssueIndex:
+    """
+    Inner-product FAISS index over normalized issue embeddings (cosine
+    similarity), separate from the code index. It holds one vector per group
+    of duplicates, the first issue's; an issue whose similarity to one of
+    them reaches 'threshold' is a duplicate of that issue.
+    """
+
+    def __init__(self, embeddings, threshold: float):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.index = None
+        self.numbers = []  # issue number of each row
+
+    def embed(self, issues: list):
+        return embed_issues(self.embeddings, issues)
+
+    def match(self, vector, exclude: int = None):
+        """
+        Number of the indexed issue most similar to 'vector' if it reaches the
+        threshold, else None. 'exclude' skips that issue (an edited issue is
+        not a duplicate of its earlier self).
+        """
+        if self.index is None or not self.numbers:
+            return None
+        scores, rows = self.index.search(vector.reshape(1, -1), min(2, len(self.numbers)))
+        for score, row in zip(scores[0], rows[0]):
+            if row >= 0 and self.numbers[row] != exclude and score >= self.threshold:
+                return self.numbers[row]
+        return None
+
+    def add(self, number: int, vector):
+        import faiss
+
+        if number in self.numbers:
+            return
+        if self.index is None:
+            self.index = faiss.IndexFlatIP(vector.shape[0])
+        self.index.add(vector.reshape(1, -1))
+        self.numbers.append(number)
+
+
+def find_duplicates(issues: list, embeddings, threshold: float) -> dict:
+    """
+    Groups near-duplicate issues. Returns {issue number: number of the issue
+    it duplicates} for every issue similar enough to an earlier one in
+    'issues'; the first issue of each group is not a key, and duplicates
+    always point at an issue that comes before them.
+    """
+    if len(issues) < 2:
+        return {}
+    with span("issue.dedup"):
+        index = IssueIndex(embeddings, threshold)
+        duplicates = {}
+        for issue_data, vector in zip(issues, index.embed(issues)):
+            original = index.match(vector)
+            if original is None:
+                index.add(issue_data["number"], vector)
+            else:
+                duplicates[issue_data["number"]] = original
+    get_metrics().add("issue.duplicates", len(duplicates))
+    return duplicates
@@ -0,0 +1,172 @@
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .code_analyzer import find_relevant_code
+from .llm_handler import classify_issue_type, generate_analysis
+from .utils import ISSUE_STAGE_CONCURRENCY, CONTEXT_TOKEN_BUDGET
+from .metrics import span
+
+STAGES = ("comments", "classify", "retrieve", "analyze")
+
+
+def _ensure_comments(issue_data: dict, fetch_comments):
+    """
+    Stage 1: Fetches the issue's comments if the bulk fetch did not attach them.
+    """
+    if issue_data["comments"] is not None:
+        return
+    try:
+        issue_data["comments"] = fetch_comments(issue_data)
+    except Exception as e:
+        print(f"Warning: Could not fetch comments for issue #{issue_data['number']}. Error: {e}")
+        issue_data["comments"] = []
+
+
+def stage_limits(concurrency: dict = None) -> dict:
+    """
+    One semaphore per stage, admitting concurrency[stage] issues at a time
+    (ISSUE_STAGE_CONCURRENCY for stages not given).
+    """
+    concurrency = dict(ISSUE_STAGE_CONCURRENCY, **(concurrency or {}))
+    return {stage: threading.BoundedSemaphore(max(1, concurrency[stage])) for stage in STAGES}
+
+
+def process_issue(issue_data: dict, retriever, fetch_comments, limits: dict, token_budget: int,
+                  classifier=None, on_partial=None) -> dict:
+    """
+    Runs one issue through all stages. Each stage holds its own semaphore from
+    'limits' (see stage_limits), so at most that many issues sharing the
+    limits are in the stage at any moment.
+    Stage timings exclude the time spent waiting for the stage's semaphore.
+    Issues are classified by 'classifier' (an IssueClassifier), or by the LLM
+    without one; the result records the type and the tier that decided it.
+    The classify semaphore only limits LLM classifications, so issues the
+    cheaper tiers decide never wait behind them.
+    While the analysis streams, on_partial(partial_result(...)) is called
+    with the text generated so far every RESULTS_PARTIAL_SECONDS.
+    """
+    with span("issue"):
+        return _run_stages(issue_data, retriever, fetch_comments, limits, token_budget, classifier, on_partial)
+
+
+def _classify(issue_data: dict, classifier, llm_limit) -> tuple:
+    if classifier is None:
+        with llm_limit:
+            return classify_issue_type(issue_data), "llm"
+    return classifier.classify(issue_data, llm_limit)
+
+
+def _run_stages(issue_data: dict, retriever, fetch_comments, limits: dict, token_budget: int,
+                classifier, on_partial) -> dict:
+    with limits["comments"], span("issue.comments"):
+        _ensure_comments(issue_data, fetch_comments)
+
+    print(f"Processing Issue #{issue_data['number']}: {issue_data['title']}")
+    try:
+        with span("issue.classify"):
+            issue_type, tier = _classify(issue_data, classifier, limits["classify"])
+        classification = {"type": issue_type, "classified_by": tier}
+
+        if issue_type != "BUG":
+            print(f"Issue #{issue_data['number']} type: {issue_type}. Skipping analysis.")
+            return {"issue": issue_data, "report": f"Skipped: Issue classified as {issue_type}.", **classification}
+
+        print(f"Issue #{issue_data['number']} type: BUG. Proceeding with analysis.")
+        with limits["retrieve"], span("issue.retrieve"):
+            issue_full_text = f"Title: {issue_data['title']}\n\nBody: {issue_data['body']}"
+            code_context = find_relevant_code(issue_full_text, retriever, token_budget)
+
+        on_text = None
+        if on_partial is not None:
+            def on_text(text):
+                on_partial(partial_result(issue_data, text, classification))
+        with limits["analyze"], span("issue.analyze"):
+            report = generate_analysis(issue_data, code_context, on_text)
+        return {"issue": issue_data, "report": report, **classification}
+
+    except Exception as e:
+        print(f"Error processing issue #{issue_data['number']}: {e}")
+        return {"issue": issue_data, "report": f"Failed to analyze: {e}"}
+
+
+def partial_result(issue_data: dict, text: str, classification: dict) -> dict:
+    """
+    A record of an analysis still being generated, with the text so far under
+    'partial_report'. Until the final result supersedes it, it reads as a
+    failed analysis, so an interrupted scan reports it and resuming retries it.
+    """
+    return {"issue": issue_data, "report": "Failed to analyze: interrupted while generating the analysis.",
+            "partial_report": text, **classification}
+
+
+def shared_result(issue_data: dict, original: dict) -> dict:
+    """
+    The result of a duplicate issue: the report of the issue it duplicates.
+    """
+    result = {"issue": issue_data, "report": original["report"], "duplicate_of": original["issue"]["number"]}
+    for key in ("type", "classified_by"):
+        if key in original:
+            result[key] = original[key]
+    return result
+
+
+def iter_issue_reports(issues: list, retriever, fetch_comments, concurrency: dict = None,
+                       token_budget: int = CONTEXT_TOKEN_BUDGET, duplicates: dict = None, classifier=None,
+                       on_partial=None):
+    """
+    Processes the given issue dicts concurrently and yields their report dicts
+    in the original issue order. 'fetch_comments' is called for issues that
+    arrive without comments; 'token_budget' caps the code context per prompt.
+
+    Comment fetching, classification, retrieval and analysis are separate stages,
+    each limited by 'concurrency' (stage name -> max parallel issues), so GitHub
+    I/O for later issues overlaps with LLM work on earlier ones.
+
+    'duplicates' (issue number -> number of an earlier issue, see
+    issue_dedup.find_duplicates) issues are not processed; they share the
+    earlier issue's report, whose result lists them under 'duplicates'.
+    'classifier' and 'on_partial' are passed on to process_issue; on_partial
+    is called from the worker threads.
+    """
+    concurrency = dict(ISSUE_STAGE_CONCURRENCY, **(concurrency or {}))
+    limits = stage_limits(concurrency)
+    workers = sum(max(1, concurrency[stage]) for stage in STAGES)
+    duplicates = duplicates or {}
+    groups = {}
+    for number, original in duplicates.items():
+        groups.setdefault(original, []).append(number)
+
+    def finish(issue_data, future):
+        result = future.result()
+        if result["issue"] is not issue_data:
+            return shared_result(issue_data, result)
+        if issue_data["number"] in groups:
+            result["duplicates"] = groups[issue_data["number"]]
+        return result
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="issue")
+    futures = {}
+    pending = deque()
+    try:
+        for issue_data in issues:
+            future = futures.get(duplicates.get(issue_data["number"]))
+            if future is None:
+                # Each task runs in a copy of the caller's context, so it records into the scan's metrics
+                future = pool.submit(
+                    contextvars.copy_context().run,
+                    process_issue, issue_data, retriever, fetch_comments, limits, token_budget, classifier,
+                    on_partial
+                )
+                if issue_data["number"] in groups:
+                    futures[issue_data["number"]] = future
+            pending.append((issue_data, future))
+
+            # Emit finished reports in order, and don't run too far ahead of them
+            while pending and (pending[0][1].done() or len(pending) >= workers * 2):
+                yield finish(*pending.popleft())
+
+        while pending:
+            yield finish(*pending.popleft())
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
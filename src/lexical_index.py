@@ -0,0 +1,268 @@
+import os
+import re
+import json
+import math
+import hashlib
+from collections import Counter
+from functools import lru_cache
+import numpy as np
+
+# Chunk count and average length; the index itself is in memory-mapped arrays
+LEXICAL_INDEX_FILE = "lexical_meta.json"
+LEXICAL_IDS_FILE = "lexical_ids.npy"
+LEXICAL_LENS_FILE = "lexical_lens.npy"
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Terms found in more than this share of chunks carry almost no signal and are skipped at query time
+MAX_DOC_FREQ_RATIO = 0.3
+# Reciprocal rank fusion constant
+RRF_K = 60
+
+_IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+_PATH_RE = re.compile(r"[\w.-]+(?:/[\w.-]+)*\.\w+")
+
+# Definitions worth indexing as symbols, across the supported languages
+_SYMBOL_PATTERNS = [
+    r"^[ \t]*(?:async\s+)?def\s+(?:self\.)?([A-Za-z_]\w*[?!]?)",                   # Python, Ruby
+    r"^[ \t]*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+([A-Za-z_$][\w$]*)",
+    r"^[ \t]*(?:export\s+)?(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)",         # JS/TS/PHP
+    r"^[ \t]*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s*)?(?:\(|function)",
+    r"^[ \t]*func\s+(?:\([^)]*\)\s*)?([A-Za-z_]\w*)",                               # Go
+    r"^[ \t]*(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?fn\s+([A-Za-z_]\w*)",             # Rust
+    r"^[ \t]*(?:pub\s+)?(?:struct|enum|trait|interface|type|module)\s+([A-Za-z_]\w*)",
+    # Java/C#/C/C++ style: return type followed by name and an opening parenthesis
+    r"^[ \t]*(?:(?:public|private|protected|internal|static|final|virtual|override|async|inline)\s+)*"
+    r"(?!(?:return|else|new|throw|await|yield)\b)[\w<>\[\],:*&]+\s+[*&]?([A-Za-z_]\w*)\s*\([^;\n]*$",
+]
+
+# One alternation scans each chunk once instead of once per language
+_SYMBOL_RE = re.compile("|".join(f"(?:{pattern})" for pattern in _SYMBOL_PATTERNS), re.M)
+
+_NOT_SYMBOLS = {"if", "for", "while", "switch", "return", "catch", "else", "new", "sizeof"}
+
+
+@lru_cache(maxsize=65536)
+def _identifier_terms(ident: str) -> tuple:
+    """
+    The lowercase identifier plus, for compound names, its camelCase / snake_case parts.
+    """
+    lower = ident.lower()
+    if "_" in ident or not (ident.islower() or ident.isupper()):
+        parts = [p.lower() for piece in ident.split("_") for p in _CAMEL_RE.findall(piece)]
+        if len(parts) > 1:
+            return (lower, *parts)
+    return (lower,)
+
+
+def term_counts(text: str) -> Counter:
+    """
+    Counts the lowercase identifier terms in text.
+    """
+    counts = Counter()
+    for ident, count in Counter(_IDENTIFIER_RE.findall(text)).items():
+        for term in _identifier_terms(ident):
+            counts[term] += count
+    return counts
+
+
+def tokenize(text: str) -> list:
+    """
+    Splits text into lowercase identifier tokens. Compound identifiers are kept
+    whole and also split into their camelCase / snake_case parts.
+    """
+    return [term for ident in _IDENTIFIER_RE.findall(text) for term in _identifier_terms(ident)]
+
+
+def extract_symbols(text: str) -> set:
+    """
+    Returns the names of functions, classes and similar definitions in a chunk.
+    """
+    symbols = set()
+    for groups in _SYMBOL_RE.findall(text):
+        name = next(group for group in groups if group)
+        if name not in _NOT_SYMBOLS:
+            symbols.add(name.lower())
+    return symbols
+
+
+class LexicalIndex:
+    """
+    Builds a BM25 index over chunk tokens plus a symbol table mapping
+    function, class and file names to the chunks that define them. It is
+    searched once saved, through MappedLexicalIndex (see load).
+    """
+
+    def __init__(self):
+        self.docs = {}      # chunk_id -> {"len": token count, "tf": {term: count}}
+        self.symbols = {}   # lowercase symbol or file name -> [chunk_id]
+
+    def add(self, chunk_ids: list, documents: list):
+        for chunk_id, doc in zip(chunk_ids, documents):
+            counts = term_counts(doc.page_content)
+            self.docs[chunk_id] = {"len": sum(counts.values()), "tf": dict(counts)}
+            source = doc.metadata.get("source", "unknown_file")
+
+            names = extract_symbols(doc.page_content)
+            names.add(source.lower())
+            names.add(os.path.basename(source).lower())
+            for name in names:
+                self.symbols.setdefault(name, []).append(chunk_id)
+
+    def save(self, index_dir: str):
+        """
+        Saves the index in the memory-mapped format MappedLexicalIndex reads.
+        """
+        chunk_ids = list(self.docs)
+        rows = {chunk_id: row for row, chunk_id in enumerate(chunk_ids)}
+        postings, tfs = {}, {}
+        for row, chunk_id in enumerate(chunk_ids):
+            for term, tf in self.docs[chunk_id]["tf"].items():
+                postings.setdefault(term, []).append(row)
+                tfs.setdefault(term, []).append(tf)
+        symbols = {name: [rows[c] for c in ids if c in rows] for name, ids in self.symbols.items()}
+        lens = np.array([self.docs[chunk_id]["len"] for chunk_id in chunk_ids], dtype=np.int32)
+
+        np.save(os.path.join(index_dir, LEXICAL_IDS_FILE), np.array(chunk_ids, dtype="S"))
+        np.save(os.path.join(index_dir, LEXICAL_LENS_FILE), lens)
+        _save_table(index_dir, "terms", postings, tfs)
+        _save_table(index_dir, "symbols", symbols)
+        with open(os.path.join(index_dir, LEXICAL_INDEX_FILE), "w", encoding="utf-8") as f:
+            json.dump({"chunks": len(chunk_ids), "avg_len": float(lens.mean()) if len(lens) else 0.0}, f)
+
+    @classmethod
+    def load(cls, index_dir: str):
+        """
+        Opens the lexical index saved next to a vector index as a read-only
+        MappedLexicalIndex, or returns None for indexes built without one.
+        """
+        if not os.path.exists(os.path.join(index_dir, LEXICAL_INDEX_FILE)):
+            return None
+        return MappedLexicalIndex(index_dir)
+
+
+def _key_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _table_path(index_dir: str, table: str, part: str) -> str:
+    return os.path.join(index_dir, f"lexical_{table}_{part}.npy")
+
+
+def _save_table(index_dir: str, table: str, rows: dict, values: dict = None):
+    """
+    Saves {key: [row]} (and the matching {key: [value]}, if given) as arrays:
+    the keys' 64-bit hashes (sorted), offsets into the row array, the rows
+    of all keys back to back and their values.
+    """
+    keys = sorted(rows, key=_key_hash)
+    offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(rows[key]) for key in keys])
+    np.save(_table_path(index_dir, table, "hashes"), np.array([_key_hash(key) for key in keys], dtype=np.uint64))
+    np.save(_table_path(index_dir, table, "offsets"), offsets)
+    np.save(_table_path(index_dir, table, "rows"), np.array([r for key in keys for r in rows[key]], dtype=np.int32))
+    if values is not None:
+        np.save(_table_path(index_dir, table, "values"),
+                np.array([v for key in keys for v in values[key]], dtype=np.int32))
+
+
+class _MappedTable:
+    """
+    A table saved by _save_table, memory-mapped; lookups are binary searches.
+    """
+
+    def __init__(self, index_dir: str, table: str):
+        self.hashes, self.offsets, self.rows = (
+            np.load(_table_path(index_dir, table, part), mmap_mode="r") for part in ("hashes", "offsets", "rows")
+        )
+        values_path = _table_path(index_dir, table, "values")
+        self.values = np.load(values_path, mmap_mode="r") if os.path.exists(values_path) else None
+
+    def get(self, key: str):
+        """
+        (rows, values or None) of the key, or None. Keys are matched by their 64-bit
+        hash; a false match is about as likely as a random 64-bit collision.
+        """
+        key_hash = np.uint64(_key_hash(key))
+        pos = int(np.searchsorted(self.hashes, key_hash))
+        if pos == len(self.hashes) or self.hashes[pos] != key_hash:
+            return None
+        start, end = int(self.offsets[pos]), int(self.offsets[pos + 1])
+        return self.rows[start:end], None if self.values is None else self.values[start:end]
+
+
+class MappedLexicalIndex:
+    """
+    Read-only index saved by LexicalIndex.save. The postings, symbol
+    table and chunk lengths are memory-mapped arrays, so opening it reads
+    almost nothing and a query touches only the postings of its own terms.
+    Safe to query from several threads.
+    """
+
+    def __init__(self, index_dir: str):
+        with open(os.path.join(index_dir, LEXICAL_INDEX_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.count = meta["chunks"]
+        self.avg_len = meta["avg_len"] or 1.0
+        self.ids = np.load(os.path.join(index_dir, LEXICAL_IDS_FILE), mmap_mode="r")
+        self.lens = np.load(os.path.join(index_dir, LEXICAL_LENS_FILE), mmap_mode="r")
+        self.terms = _MappedTable(index_dir, "terms")
+        self.symbols = _MappedTable(index_dir, "symbols")
+
+    def search_bm25(self, query: str, k: int) -> list:
+        """
+        Returns up to k chunk IDs ranked by BM25 score.
+        """
+        n = self.count
+        all_rows, all_scores = [], []
+        for term in set(tokenize(query)):
+            found = self.terms.get(term)
+            if found is None or len(found[0]) > MAX_DOC_FREQ_RATIO * n:
+                continue
+            rows, tfs = np.asarray(found[0]), np.asarray(found[1], dtype=np.float64)
+            idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = tfs + BM25_K1 * (1 - BM25_B + BM25_B * self.lens[rows] / self.avg_len)
+            all_rows.append(rows)
+            all_scores.append(idf * tfs * (BM25_K1 + 1) / norm)
+        if not all_rows:
+            return []
+        rows, inverse = np.unique(np.concatenate(all_rows), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [self.ids[rows[i]].decode("ascii") for i in top]
+
+    def search_symbols(self, query: str, k: int) -> list:
+        """
+        Returns up to k chunk IDs defining identifiers or files named in the query.
+        Longer (more specific) names rank first, ties alphabetically.
+        """
+        names = {ident.lower() for ident in _IDENTIFIER_RE.findall(query)}
+        names |= {path.lower() for path in _PATH_RE.findall(query)}
+        names |= {os.path.basename(path) for path in list(names)}
+
+        hits = []
+        seen = set()
+        for name in sorted(names, key=lambda name: (-len(name), name)):
+            found = self.symbols.get(name)
+            if found is None:
+                continue
+            for row in found[0]:
+                if row not in seen:
+                    seen.add(row)
+                    hits.append(row)
+            if len(hits) >= k:
+                break
+        return [self.ids[row].decode("ascii") for row in hits[:k]]
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = RRF_K) -> list:
+    """
+    Fuses several ranked lists of IDs into one: score(id) = sum of 1 / (k + rank).
+    """
+    scores = Counter()
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] += 1.0 / (k + rank + 1)
+    return [item for item, _ in scores.most_common()]
@@ -0,0 +1,97 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+LLM_CACHE_FILE = "llm_cache.sqlite"
+
+# Evictions run once every this many writes
+EVICT_EVERY = 50
+
+
+def llm_cache_key(model: str, messages: list, format=None, options: dict = None) -> str:
+    """
+    Hashes everything that determines an LLM response: the model, the full message
+    list (including the system prompt), the output format and the model options.
+    """
+    payload = json.dumps(
+        {"model": model, "messages": messages, "format": format, "options": options or {}},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite-backed cache of chat responses with TTL and size-based LRU eviction.
+    Safe to share between the issue pipeline's threads.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, max_bytes: int):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, response TEXT NOT NULL,"
+            " created_at REAL NOT NULL, last_used_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str):
+        """
+        Returns the cached response dict, or None if missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, response: dict):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, last_used_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(response), now, now),
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 1:
+                self._evict(now)
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(response)), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            # Drop least recently used entries until we are back under the limit
+            rows = self._conn.execute(
+                "SELECT key, LENGTH(response) FROM responses ORDER BY last_used_at"
+            ).fetchall()
+            stale = []
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                stale.append((key,))
+                total -= size
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,6 +1,137 @@
-import ollama
+import os
 import json
-from .utils import OLLAMA_MODEL
+import time
+from .utils import (
+    OLLAMA_MODEL, CLASSIFY_MODEL, OLLAMA_KEEP_ALIVE, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_BYTES, LLM_OPTIONS,
+    RESULTS_PARTIAL_SECONDS
+)
+from .llm_cache import LLMCache, llm_cache_key, LLM_CACHE_FILE
+from .metrics import span, get_metrics
+
+# Response cache shared by every LLM call; set up by configure_llm_cache()
+_llm_cache = None
+# Ollama options per step; set up by configure_llm_options()
+_llm_options = {step: dict(options) for step, options in LLM_OPTIONS.items()}
+
+
+def configure_llm_cache(cache_dir: str, enabled: bool = True, ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+                        max_bytes: int = LLM_CACHE_MAX_BYTES):
+    """
+    Enables (or disables) the persistent LLM response cache under cache_dir.
+    """
+    global _llm_cache
+    if _llm_cache is not None:
+        _llm_cache.close()
+        _llm_cache = None
+    if enabled:
+        _llm_cache = LLMCache(os.path.join(cache_dir, LLM_CACHE_FILE), ttl_seconds, max_bytes)
+
+
+def get_llm_cache():
+    return _llm_cache
+
+
+def configure_llm_options(overrides: dict = None):
+    """
+    Sets the Ollama options of each LLM step to LLM_OPTIONS updated with
+    'overrides' (step -> options). An option set to None is left out.
+    """
+    global _llm_options
+    options = {step: dict(step_options) for step, step_options in LLM_OPTIONS.items()}
+    for step, step_options in (overrides or {}).items():
+        options.setdefault(step, {}).update(step_options)
+    _llm_options = {step: {k: v for k, v in step_options.items() if v is not None}
+                    for step, step_options in options.items()}
+
+
+def _stream_chat(model: str, messages: list, kwargs: dict, on_text=None) -> dict:
+    """
+    Streams a chat response and returns it as one response dict. Stops
+    reading (which makes Ollama stop generating) as soon as the text contains
+    one of the "stop" options, in case the server did not stop there itself.
+    on_text(text so far) is called every RESULTS_PARTIAL_SECONDS.
+    """
+    import ollama
+
+    stops = kwargs.get("options", {}).get("stop") or []
+    start = time.perf_counter()
+    first_token_at = last_report = None
+    text, tokens, final = "", 0, None
+    stream = ollama.chat(model=model, messages=messages, keep_alive=OLLAMA_KEEP_ALIVE, stream=True, **kwargs)
+    try:
+        for chunk in stream:
+            if chunk["done"]:
+                # Not a break: reading to the end of the response lets the connection be reused
+                final = chunk
+                continue
+            content = chunk["message"]["content"]
+            if first_token_at is None:
+                first_token_at = last_report = time.perf_counter()
+            tokens += 1
+            text += content
+            cut = min((text.find(stop) for stop in stops if stop in text[-len(stop) - len(content):]), default=-1)
+            if cut != -1:
+                text = text[:cut]
+                break
+            if on_text is not None and time.perf_counter() - last_report >= RESULTS_PARTIAL_SECONDS:
+                on_text(text)
+                last_report = time.perf_counter()
+    finally:
+        stream.close()
+
+    if final is not None:
+        response = final.model_dump(mode="json", exclude_none=True) if hasattr(final, "model_dump") else dict(final)
+    else:
+        # Stopped early: no final chunk with Ollama's counts, so count chunks (one token each) and time them
+        now = time.perf_counter()
+        response = {"model": model, "done": True, "done_reason": "stop", "eval_count": tokens,
+                    "total_duration": int((now - start) * 1e9),
+                    "eval_duration": int((now - (first_token_at or now)) * 1e9)}
+        get_metrics().add("llm.client_stops")
+    response["message"] = {"role": "assistant", "content": text}
+    return response
+
+
+def _chat(step: str, messages: list, format=None, options: dict = None, model: str = OLLAMA_MODEL,
+          stream: bool = False, on_text=None):
+    """
+    Calls ollama.chat, answering from the response cache when the exact same
+    request (model, messages, format, options) has been made before.
+    'step' names the call in the scan metrics, which record Ollama's token
+    counts and durations, and selects its options (configure_llm_options),
+    which 'options' extends. With 'stream', the response is streamed (see
+    _stream_chat) and on_text receives the text so far as it grows.
+    """
+    options = dict(_llm_options.get(step, {}), **(options or {}))
+    key = None
+    if _llm_cache is not None:
+        key = llm_cache_key(model, messages, format, options)
+        cached = _llm_cache.get(key)
+        if cached is not None:
+            get_metrics().record_llm(step, cached, cached=True)
+            return cached
+
+    import ollama  # Imported on first use; it takes longer to import than the CLI needs to start
+
+    kwargs = {}
+    if format:
+        kwargs["format"] = format
+    if options:
+        kwargs["options"] = options
+    with span(f"llm.{step}"):
+        if stream:
+            response = _stream_chat(model, messages, kwargs, on_text)
+        else:
+            response = ollama.chat(model=model, messages=messages, keep_alive=OLLAMA_KEEP_ALIVE, **kwargs)
+    get_metrics().record_llm(step, response, cached=False)
+
+    if _llm_cache is not None:
+        if hasattr(response, "model_dump"):
+            response_dict = response.model_dump(mode="json", exclude_none=True)
+        else:
+            response_dict = dict(response)
+        _llm_cache.put(key, response_dict)
+    return response
 
 
 # --- Main System Prompt (for Analysis) ---
@@ -16,9 +147,10 @@ CLASSIFICATION_SYSTEM_PROMPT = """You are an issue classifier. Your job is to re
 Respond *only* with the single category name in JSON format.
 Example: {"type": "BUG"}"""
 
-def classify_issue_type(issue_data: dict) -> str:
+def classify_issue_type(issue_data: dict, model: str = None) -> str:
     """
-    Step 1: Classifies the issue into a specific type.
+    Step 1: Classifies the issue into a specific type, with 'model'
+    (CLASSIFY_MODEL, or OLLAMA_MODEL if that is not set, by default).
     """
     print("Step 1: Classifying issue type...")
     
@@ -30,10 +162,11 @@ def classify_issue_type(issue_data: dict) -> str:
     ]
     
     try:
-        response = ollama.chat(
-            model=OLLAMA_MODEL,
+        response = _chat(
+            "classify",
             messages=messages,
-            format="json"  # Request JSON output
+            format="json",  # Request JSON output
+            model=model or CLASSIFY_MODEL or OLLAMA_MODEL
         )
         
         response_text = response['message']['content']
@@ -109,10 +242,12 @@ Use the provided code context to find the root cause and generate a fix.
     return prompt.strip()
 
 
-def generate_analysis(issue_data: dict, code_context: dict) -> str:
+def generate_analysis(issue_data: dict, code_context: dict, on_text=None) -> str:
     """
     Step 2: Generates the bug analysis using the Ollama client.
     (This function is now only called if the issue is a bug)
+    The response is streamed and generation stops at </ANALYSIS>;
+    on_text(text so far) is called periodically while it streams.
     """
     print("Step 2: Generating full bug analysis...")
     
@@ -129,9 +264,11 @@ def generate_analysis(issue_data: dict, code_context: dict) -> str:
     ]
     
     try:
-        response = ollama.chat(
-            model=OLLAMA_MODEL,
-            messages=messages
+        response = _chat(
+            "analyze",
+            messages=messages,
+            stream=True,
+            on_text=on_text
         )
         
         response_text = response['message']['content']
@@ -140,8 +277,11 @@ def generate_analysis(issue_data: dict, code_context: dict) -> str:
         end_tag = "</ANALYSIS>"
         start_index = response_text.find(start_tag)
         end_index = response_text.rfind(end_tag)
+        if end_index == -1:
+            # Generation stopped at the closing tag, which is not part of the output
+            end_index = len(response_text)
         
-        if start_index != -1 and end_index != -1:
+        if start_index != -1:
             start_index += len(start_tag)
             analysis = response_text[start_index:end_index].strip()
             print("Analysis generation complete.")
@@ -154,11 +294,13 @@ def generate_analysis(issue_data: dict, code_context: dict) -> str:
         print(f"Error during Ollama analysis generation: {e}")
         raise
 
-def check_ollama_model():
+def check_ollama_model(model: str = OLLAMA_MODEL):
     """
     Checks if the required Ollama model is available locally.
     """
-    print(f"Checking for Ollama model: {OLLAMA_MODEL}...")
+    import ollama
+
+    print(f"Checking for Ollama model: {model}...")
     try:
         model_data = ollama.list()
         if 'models' not in model_data:
@@ -169,12 +311,12 @@ def check_ollama_model():
         for model_object in models_list:
             if hasattr(model_object, 'model'):
                 print(f"Checking model: {model_object.model}")
-                if model_object.model.startswith(OLLAMA_MODEL):
+                if model_object.model.startswith(model):
                     print(f"Success: Found matching model '{model_object.model}'.")
                     return True
             else:
                 print(f"Warning: Found a model entry with no '.model' attribute: {model_object}")
-        print(f"Error: Model '{OLLAMA_MODEL}' not found in the list.")
+        print(f"Error: Model '{model}' not found in the list.")
         return False
     except Exception as e:
         print(f"Error connecting to Ollama: {e}")
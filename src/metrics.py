@@ -0,0 +1,249 @@
+import json
+import math
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from .utils import write_file_atomic
+
+METRICS_PREFIX = "bug_analyzer"
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+# Ollama reports durations in nanoseconds
+_NS = 1e9
+
+# Metrics of the scan running in the current context; threads that should
+# record into it are started with contextvars.copy_context().run
+_current = contextvars.ContextVar("metrics", default=None)
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Series:
+    """
+    Count, sum and max of every value observed, and the latest 'window'
+    values (all of them if None) for the quantiles.
+    """
+
+    def __init__(self, window: int = None):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.values = deque(maxlen=window)
+
+    def add(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        self.values.append(value)
+
+    def summary(self) -> dict:
+        values = sorted(self.values)
+        summary = {"count": self.count, "sum": self.sum, "max": self.max}
+        for q in QUANTILES:
+            summary[f"p{int(q * 100)}"] = percentile(values, q)
+        return summary
+
+
+class Metrics:
+    """
+    Timing spans, counters and Ollama token statistics of one scan.
+    Thread-safe; every stage of a scan records into the same instance.
+    Counts and sums cover everything recorded; quantiles cover the latest
+    'window' values of each span and LLM step (all of them if None), so a
+    long-running process can keep one instance without it growing.
+    """
+
+    def __init__(self, window: int = None):
+        self.started_at = time.time()
+        self.window = window
+        self.spans = {}     # span name -> Series of seconds
+        self.counters = {}  # counter name -> value
+        self.llm = {}       # step -> {"calls": n, <Ollama stat>: total, "eval_rates" / "prompt_rates": Series}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            series = self.spans.get(name)
+            if series is None:
+                series = self.spans[name] = Series(self.window)
+            series.add(seconds)
+
+    def add(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_llm(self, step: str, response, cached: bool):
+        """
+        Records the token counts and durations Ollama returns with every response.
+        Cached responses are counted but carry no model time.
+        """
+        self.add(f"llm.{step}.{'cache_hits' if cached else 'calls'}")
+        if cached:
+            return
+        fields = ("prompt_eval_count", "eval_count", "total_duration", "load_duration",
+                  "prompt_eval_duration", "eval_duration")
+        stats = {field: (response.get(field) if isinstance(response, dict) else getattr(response, field, None)) or 0
+                 for field in fields}
+        with self._lock:
+            totals = self.llm.get(step)
+            if totals is None:
+                totals = self.llm[step] = dict.fromkeys(("calls",) + fields, 0)
+                totals["eval_rates"] = Series(self.window)
+                totals["prompt_rates"] = Series(self.window)
+            totals["calls"] += 1
+            for field in fields:
+                totals[field] += stats[field]
+            if stats["eval_duration"]:
+                totals["eval_rates"].add(stats["eval_count"] / (stats["eval_duration"] / _NS))
+            if stats["prompt_eval_duration"]:
+                totals["prompt_rates"].add(stats["prompt_eval_count"] / (stats["prompt_eval_duration"] / _NS))
+
+    def _llm_summary(self) -> dict:
+        summary = {}
+        for step, totals in self.llm.items():
+            eval_rates = sorted(totals["eval_rates"].values)
+            prompt_rates = sorted(totals["prompt_rates"].values)
+            summary[step] = {
+                "calls": totals["calls"],
+                "prompt_tokens": totals["prompt_eval_count"],
+                "eval_tokens": totals["eval_count"],
+                "total_seconds": totals["total_duration"] / _NS,
+                "load_seconds": totals["load_duration"] / _NS,
+                "eval_tokens_per_second": {f"p{int(q * 100)}": percentile(eval_rates, q) for q in QUANTILES},
+                "prompt_tokens_per_second": {f"p{int(q * 100)}": percentile(prompt_rates, q) for q in QUANTILES},
+            }
+        return summary
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = {name: series.summary() for name, series in self.spans.items()}
+            counters = dict(self.counters)
+            llm = self._llm_summary()
+
+        derived = {}
+        if "issue" in spans:
+            derived["seconds_per_issue"] = {k: v for k, v in spans["issue"].items() if k.startswith("p")}
+        embed_seconds = spans.get("embed.model", {}).get("sum")
+        if embed_seconds:
+            derived["chunks_embedded_per_second"] = counters.get("embed.chunks", 0) / embed_seconds
+        return {
+            "started_at": self.started_at,
+            "elapsed_seconds": time.time() - self.started_at,
+            "spans": spans,
+            "counters": counters,
+            "llm": llm,
+            "derived": derived,
+        }
+
+    def write_json(self, path: str, **extra):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(dict(extra, **self.to_dict()), f, indent=2)
+
+    def write_prometheus(self, path: str, labels: dict = None):
+        """
+        Writes the metrics in the Prometheus text format, e.g. for
+        node_exporter's textfile collector. The file is replaced atomically.
+        """
+        write_file_atomic(path, self.to_prometheus(labels))
+
+    def to_prometheus(self, labels: dict = None) -> str:
+        """
+        The metrics in the Prometheus text exposition format.
+        """
+        data = self.to_dict()
+        base = ",".join(f'{k}="{v}"' for k, v in (labels or {}).items())
+
+        def fmt(name, value, **extra):
+            label_str = ",".join(filter(None, [base] + [f'{k}="{v}"' for k, v in extra.items()]))
+            return f"{METRICS_PREFIX}_{name}{{{label_str}}} {value}\n" if label_str else f"{METRICS_PREFIX}_{name} {value}\n"
+
+        lines = [f"# TYPE {METRICS_PREFIX}_span_seconds summary\n"]
+        for name, s in sorted(data["spans"].items()):
+            for q in QUANTILES:
+                lines.append(fmt("span_seconds", s[f"p{int(q * 100)}"], span=name, quantile=q))
+            lines.append(fmt("span_seconds_sum", s["sum"], span=name))
+            lines.append(fmt("span_seconds_count", s["count"], span=name))
+
+        lines.append(f"# TYPE {METRICS_PREFIX}_events_total counter\n")
+        for name, value in sorted(data["counters"].items()):
+            lines.append(fmt("events_total", value, event=name))
+
+        lines.append(f"# TYPE {METRICS_PREFIX}_llm_tokens_total counter\n")
+        for step, s in sorted(data["llm"].items()):
+            lines.append(fmt("llm_tokens_total", s["prompt_tokens"], step=step, kind="prompt"))
+            lines.append(fmt("llm_tokens_total", s["eval_tokens"], step=step, kind="eval"))
+        lines.append(f"# TYPE {METRICS_PREFIX}_llm_eval_tokens_per_second gauge\n")
+        for step, s in sorted(data["llm"].items()):
+            for key, value in s["eval_tokens_per_second"].items():
+                lines.append(fmt("llm_eval_tokens_per_second", value, step=step, quantile=int(key[1:]) / 100))
+
+        derived = data["derived"]
+        if "seconds_per_issue" in derived:
+            lines.append(f"# TYPE {METRICS_PREFIX}_seconds_per_issue gauge\n")
+            for key, value in derived["seconds_per_issue"].items():
+                lines.append(fmt("seconds_per_issue", value, quantile=int(key[1:]) / 100))
+        if "chunks_embedded_per_second" in derived:
+            lines.append(f"# TYPE {METRICS_PREFIX}_chunks_embedded_per_second gauge\n")
+            lines.append(fmt("chunks_embedded_per_second", derived["chunks_embedded_per_second"]))
+        lines.append(f"# TYPE {METRICS_PREFIX}_scan_seconds gauge\n")
+        lines.append(fmt("scan_seconds", data["elapsed_seconds"]))
+        return "".join(lines)
+
+
+# Collects anything recorded outside a scan
+_default = Metrics()
+
+
+def get_metrics() -> Metrics:
+    metrics = _current.get()
+    return metrics if metrics is not None else _default
+
+
+def use_metrics(metrics: Metrics = None) -> Metrics:
+    """
+    Makes 'metrics' (or a fresh instance) the target of span()/add() in the
+    current context and returns it.
+    """
+    metrics = metrics or Metrics()
+    _current.set(metrics)
+    return metrics
+
+
+def span(name: str):
+    return get_metrics().span(name)
+
+
+def timed_iter(name: str, iterable):
+    """
+    Yields from iterable, recording the time spent producing each item
+    (not the time the consumer spends on it) under 'name'.
+    """
+    iterator = iter(iterable)
+    metrics = get_metrics()
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            metrics.observe(name, time.perf_counter() - start)
+        yield item
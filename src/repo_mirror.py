@@ -0,0 +1,271 @@
+import os
+import shutil
+import threading
+import subprocess
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+from .utils import INDEX_MAX_FILE_BYTES, parse_github_url, on_rmtree_error
+from .metrics import span
+from .code_analyzer import is_indexed_path
+from .file_filter import FileFilter, LINGUIST_ATTRIBUTES
+
+try:
+    import fcntl
+except ImportError:  # Windows: mirror updates are only serialized within one process
+    fcntl = None
+
+if TYPE_CHECKING:
+    from git import Repo  # GitPython is imported on first use
+
+MIRRORS_SUBDIR = "mirrors"
+# Where each fetch leaves the tip of the remote's default branch
+MIRROR_REF = "refs/mirror/head"
+# File modes of regular files in a git tree; symlinks and submodules are not indexed
+REGULAR_FILE_MODES = ("100644", "100755")
+# Files that tell git which paths are generated, vendored or ignored
+GIT_RULE_FILES = (".gitattributes", ".gitignore")
+
+_mirror_locks = {}
+_mirror_locks_lock = threading.Lock()
+
+
+def get_mirror_path(cache_dir: str, owner: str, repo_name: str) -> str:
+    return os.path.join(cache_dir, MIRRORS_SUBDIR, f"{owner}__{repo_name}.git".lower())
+
+
+@contextmanager
+def _mirror_lock(path: str):
+    """
+    Holds the mirror's lock: a thread lock plus an exclusive lock on the file
+    <mirror>.lock next to it, so processes sharing the cache (the service and
+    a CLI or batch run) don't fetch into the same mirror at once.
+    """
+    path = os.path.realpath(path)
+    with _mirror_locks_lock:
+        thread_lock = _mirror_locks.setdefault(path, threading.Lock())
+    with thread_lock:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.lock", "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _fetch(mirror: "Repo", max_file_bytes: int):
+    """
+    Fetches the remote's default branch (only its latest commit) into
+    MIRROR_REF. Blobs over max_file_bytes are left on the server if it
+    supports partial clones; otherwise they are fetched and skipped later.
+    """
+    mirror.git.fetch("origin", f"+HEAD:{MIRROR_REF}", depth=1, filter=f"blob:limit={max_file_bytes}")
+
+
+def _open_mirror(path: str):
+    """
+    The mirror at 'path', or None if it is missing or not a usable git repository.
+    """
+    from git import Repo
+    from git.exc import InvalidGitRepositoryError, NoSuchPathError, GitCommandError
+
+    try:
+        mirror = Repo(path)
+    except (InvalidGitRepositoryError, NoSuchPathError):
+        return None
+    try:
+        mirror.git.rev_parse("--git-dir")
+    except GitCommandError:
+        mirror.close()
+        return None
+    return mirror
+
+
+def sync_mirror(repo_url: str, cache_dir: str, max_file_bytes: int = INDEX_MAX_FILE_BYTES) -> tuple:
+    """
+    Brings the repo's bare mirror in <cache_dir>/mirrors up to date with its
+    default branch and returns (mirror Repo, commit SHA of the branch tip).
+    The first call clones; later calls fetch only the objects that changed.
+    A mirror that is no longer a usable repository is deleted and cloned
+    again. If a fetch fails (network, auth, rate limits), the mirror is kept
+    and its last fetched tip is used, with a warning; without one, the
+    error is raised.
+    """
+    from git import Repo
+    from .github_client import clone_source
+
+    owner, repo_name = parse_github_url(repo_url)
+    path = get_mirror_path(cache_dir, owner, repo_name)
+    with _mirror_lock(path):
+        mirror = _open_mirror(path) if os.path.exists(path) else None
+        if mirror is None and os.path.exists(path):
+            print(f"Warning: Mirror {path} is not a usable repository. Cloning it again.")
+            shutil.rmtree(path, onerror=on_rmtree_error)
+
+        if mirror is not None:
+            print(f"Fetching {repo_url} into mirror {path}...")
+            try:
+                mirror.git.remote("set-url", "origin", clone_source(repo_url))
+                with span("mirror.fetch"):
+                    _fetch(mirror, max_file_bytes)
+            except Exception as e:
+                try:
+                    sha = mirror.commit(MIRROR_REF).hexsha
+                except Exception:
+                    mirror.close()
+                    raise e
+                print(f"Warning: Could not update mirror {path} ({e}). Using its last fetched commit {sha[:12]}.")
+                return mirror, sha
+            return mirror, mirror.commit(MIRROR_REF).hexsha
+
+        print(f"Cloning repository {repo_url} into mirror {path}...")
+        try:
+            with span("clone"):
+                mirror = Repo.init(path, bare=True, mkdir=True)
+                mirror.git.remote("add", "origin", clone_source(repo_url))
+                _fetch(mirror, max_file_bytes)
+            print(f"Successfully cloned {repo_url}")
+            return mirror, mirror.commit(MIRROR_REF).hexsha
+        except Exception as e:
+            print(f"Error cloning repository: {e}")
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+
+
+def _tree_files(mirror: "Repo", commit_sha: str):
+    """
+    Yields (path, blob SHA) for the regular files in the commit's tree.
+    """
+    listing = mirror.git.ls_tree(commit_sha, r=True, z=True, full_tree=True)
+    for entry in listing.split("\0"):
+        if not entry:
+            continue
+        info, path = entry.split("\t", 1)
+        mode, kind, sha = info.split(" ")
+        if kind == "blob" and mode in REGULAR_FILE_MODES:
+            yield path, sha
+
+
+def _missing_blobs(mirror: "Repo", commit_sha: str) -> set:
+    """
+    SHAs of the commit's blobs that a partial clone left on the server. Listing
+    them does not download them, unlike asking for their size.
+    """
+    listing = mirror.git.rev_list(commit_sha, objects=True, missing="print")
+    return {line[1:] for line in listing.splitlines() if line.startswith("?")}
+
+
+def _git_stdin(cwd: str, args: list, paths: list) -> list:
+    """
+    Runs a git command that reads NUL-separated paths on stdin (--stdin -z)
+    and returns its NUL-separated output fields.
+    """
+    result = subprocess.run(["git", *args, "--stdin", "-z"], cwd=cwd, input="\0".join(paths).encode("utf-8"),
+                            capture_output=True)
+    # check-ignore exits with 1 when no path is ignored
+    if result.returncode not in (0, 1):
+        raise RuntimeError(f"git {args[0]} failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return [field.decode("utf-8") for field in result.stdout.split(b"\0")[:-1]]
+
+
+def _blob_sizes(mirror: "Repo", shas: list) -> dict:
+    """
+    {blob SHA: size} in one batch query. The blobs must be present.
+    """
+    result = subprocess.run(["git", "cat-file", "--batch-check=%(objectname) %(objectsize)"], cwd=mirror.git_dir,
+                            input="\n".join(shas).encode("ascii"), capture_output=True, check=True)
+    sizes = {}
+    for line in result.stdout.decode("ascii").splitlines():
+        sha, size = line.split(" ")
+        sizes[sha] = int(size)
+    return sizes
+
+
+def _linguist_attributes(worktree_path: str, paths: list) -> dict:
+    """
+    {path: {attribute: True if set, False if unset}} for the paths with
+    LINGUIST_ATTRIBUTES set or unset in the checkout's .gitattributes files.
+    """
+    fields = _git_stdin(worktree_path, ["check-attr", *LINGUIST_ATTRIBUTES], paths)
+    attributes = {}
+    for i in range(0, len(fields) - 2, 3):
+        path, attribute, value = fields[i:i + 3]
+        if value != "unspecified":
+            attributes.setdefault(path, {})[attribute] = value not in ("unset", "false")
+    return attributes
+
+
+def _write_blob(mirror: "Repo", sha: str, path: str, data: bytes = None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(mirror.odb.stream(bytes.fromhex(sha)).read() if data is None else data)
+
+
+def checkout_mirror(mirror: "Repo", commit_sha: str, path: str, file_filter: FileFilter = None) -> "Repo":
+    """
+    Adds a worktree of the mirror at 'path', detached at commit_sha, and
+    writes only the files worth indexing into it, read straight from the
+    object database. 'file_filter' (a new FileFilter by default) decides
+    which files those are, using the repo's .gitattributes and .gitignore
+    (which are checked out too), and reports what it skipped. Nothing else
+    is checked out, and blobs a partial clone left on the server are never
+    downloaded. Returns the worktree's Repo object.
+    """
+    from git import Repo
+
+    file_filter = file_filter or FileFilter()
+    remove_checkout(mirror, path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with span("checkout"):
+        with _mirror_lock(mirror.git_dir):
+            mirror.git.worktree("add", "--detach", "--no-checkout", os.path.abspath(path), commit_sha)
+        files = list(_tree_files(mirror, commit_sha))
+        missing = _missing_blobs(mirror, commit_sha)
+        sizes = _blob_sizes(mirror, sorted({sha for _, sha in files if sha not in missing}))
+
+        candidates = []
+        for rel_path, sha in files:
+            if file_filter.heuristics and rel_path.rsplit("/", 1)[-1] in GIT_RULE_FILES and sha in sizes:
+                _write_blob(mirror, sha, os.path.join(path, *rel_path.split("/")))
+            if is_indexed_path(rel_path):
+                candidates.append((rel_path, sha))
+            else:
+                file_filter.skip("unsupported", sizes.get(sha, 0))
+
+        attributes, ignored = {}, set()
+        if file_filter.heuristics and candidates:
+            candidate_paths = [rel_path for rel_path, _ in candidates]
+            attributes = _linguist_attributes(path, candidate_paths)
+            ignored = set(_git_stdin(path, ["check-ignore", "--no-index"], candidate_paths))
+
+        for rel_path, sha in candidates:
+            size = sizes.get(sha)
+            reason = file_filter.path_reason(rel_path, attributes.get(rel_path))
+            if reason is None and rel_path in ignored:
+                reason = "gitignore"
+            if reason is None and (size is None or size > file_filter.max_file_bytes):
+                reason = "too_large"
+            if reason is None:
+                data = mirror.odb.stream(bytes.fromhex(sha)).read()
+                reason = file_filter.content_reason(data, attributes.get(rel_path))
+            if reason is not None:
+                file_filter.skip(reason, size or 0)
+                continue
+            _write_blob(mirror, sha, os.path.join(path, *rel_path.split("/")), data)
+
+    print(f"Checked out {file_filter.files} of {len(files)} files at {commit_sha[:12]}.")
+    file_filter.report()
+    return Repo(path)
+
+
+def remove_checkout(mirror, path: str):
+    """
+    Deletes a checkout made by checkout_mirror and the mirror's record of it.
+    """
+    if os.path.exists(path):
+        shutil.rmtree(path, onerror=on_rmtree_error)
+    if mirror is not None:
+        with _mirror_lock(mirror.git_dir):
+            mirror.git.worktree("prune")
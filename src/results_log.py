@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from .utils import RESULTS_FSYNC_EVERY, RESULTS_FSYNC_SECONDS
+
+RESULTS_SUBDIR = "results"
+
+
+def get_results_log_path(cache_dir: str, owner: str, repo_name: str) -> str:
+    return os.path.join(cache_dir, RESULTS_SUBDIR, f"{owner}__{repo_name}.jsonl".lower())
+
+
+def _drop_partial_line(path: str):
+    """
+    Truncates a torn last record (a write cut short by a crash) so appends start on a fresh line.
+    """
+    with open(path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Walk back to the last complete line
+        pos = size
+        while pos > 0:
+            step = min(4096, pos)
+            pos -= step
+            f.seek(pos)
+            newline = f.read(step).rfind(b"\n")
+            if newline != -1:
+                f.truncate(pos + newline + 1)
+                return
+        f.truncate(0)
+
+
+class ResultsLog:
+    """
+    Append-only JSONL log of issue results, one line per finished issue.
+    Each record is flushed to the OS as it is written and fsynced every
+    'fsync_every' records or 'fsync_seconds', whichever comes first, so a
+    killed scan loses at most the last few results. Safe to append to
+    from several threads. Records are never rewritten in place, so a
+    record's byte offset (returned by append) refers to it until the next
+    compact().
+    """
+
+    def __init__(self, path: str, fsync_every: int = RESULTS_FSYNC_EVERY,
+                 fsync_seconds: float = RESULTS_FSYNC_SECONDS):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            _drop_partial_line(path)
+        self._file = open(path, "ab")
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_seconds = fsync_seconds
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self.appended = 0  # records appended since opening or the last compact()
+        self._lock = threading.Lock()
+
+    def append(self, result: dict):
+        """
+        Appends a record and returns its offset (None if the log is closed).
+        """
+        line = (json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            if self._file.closed:
+                return None
+            self._file.write(line)
+            self._file.flush()
+            offset = self._file.tell() - len(line)
+            self._unsynced += 1
+            self.appended += 1
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_seconds:
+                self._sync()
+            return offset
+
+    def end_offset(self) -> int:
+        """
+        The offset the next record will be written at.
+        """
+        with self._lock:
+            return os.fstat(self._file.fileno()).st_size
+
+    def sync(self):
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        if self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def compact(self) -> dict:
+        """
+        Rewrites the log keeping only each issue's latest record and its
+        latest successful one, for logs that are appended to indefinitely.
+        The file is replaced atomically. Returns the new offsets of the
+        latest successful records (issue number -> offset), for the scan
+        state that refers to them (see scan_state.remap_offsets).
+        """
+        with self._lock:
+            if self._file.closed:
+                return {}
+            self._sync()
+            latest, latest_ok = {}, {}
+            for offset, result in iter_results(self.path):
+                number = result["issue"]["number"]
+                latest[number] = offset
+                if not result["report"].startswith("Failed"):
+                    latest_ok[number] = offset
+            keep = set(latest.values()) | set(latest_ok.values())
+            moved = {}
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    for offset, line in _iter_lines(self.path):
+                        if offset in keep:
+                            moved[offset] = f.tell()
+                            f.write(line)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._file.close()
+            self._file = open(self.path, "ab")
+            self.appended = 0
+            return {number: moved[offset] for number, offset in latest_ok.items()}
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+
+def _iter_lines(path: str, start: int = 0):
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        offset = f.seek(start)
+        for line in f:
+            yield offset, line
+            offset += len(line)
+
+
+def iter_results(path: str, start: int = 0):
+    """
+    Streams (offset, result) pairs from a results log, from offset 'start'
+    on. Lines that fail to parse (a torn final write) are skipped.
+    """
+    for offset, line in _iter_lines(path, start):
+        try:
+            yield offset, json.loads(line)
+        except ValueError:
+            pass
+
+
+def read_result(path: str, offset: int):
+    """
+    The record at 'offset' in a results log, or None if it can't be read.
+    """
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+    except (OSError, ValueError):
+        return None
+
+
+def completed_issue_numbers(path: str, start: int = 0) -> set:
+    """
+    Issue numbers with a finished result in the log (from offset 'start'
+    on). Failed analyses don't count, so resuming retries them.
+    """
+    done = set()
+    for _, result in iter_results(path, start):
+        number = result["issue"]["number"]
+        if result["report"].startswith("Failed"):
+            done.discard(number)
+        else:
+            done.add(number)
+    return done
@@ -0,0 +1,84 @@
+import os
+import json
+import datetime
+from .utils import write_file_atomic
+
+SCAN_STATE_SUBDIR = "scan_state"
+
+
+def get_scan_state_path(cache_dir: str, owner: str, repo_name: str) -> str:
+    return os.path.join(cache_dir, SCAN_STATE_SUBDIR, f"{owner}__{repo_name}.json".lower())
+
+
+def load_scan_state(cache_dir: str, owner: str, repo_name: str) -> dict:
+    """
+    Loads the persisted scan state of a repo: the last successful scan time,
+    the results log offset the latest scan started at ('run_start') and, per
+    issue, the 'updated_at' it was last processed at plus the offset of its
+    result in the repo's results log.
+    """
+    path = get_scan_state_path(cache_dir, owner, repo_name)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {"repo": f"{owner}/{repo_name}", "last_scan_at": None, "run_start": 0, "issues": {}}
+    # Entries saved with the whole result instead of its offset are dropped,
+    # so those issues are analyzed again
+    state["issues"] = {key: entry for key, entry in state["issues"].items() if "offset" in entry}
+    return state
+
+
+def save_scan_state(cache_dir: str, owner: str, repo_name: str, state: dict):
+    path = get_scan_state_path(cache_dir, owner, repo_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_file_atomic(path, json.dumps(state))
+
+
+def get_last_scan_time(state: dict):
+    if not state.get("last_scan_at"):
+        return None
+    return datetime.datetime.fromisoformat(state["last_scan_at"])
+
+
+def iter_changed_issues(issues, state: dict):
+    """
+    Filters an issue listing down to open issues that are new or were updated
+    after they were last processed. Closed issues are dropped from the state.
+    """
+    for issue in issues:
+        key = str(issue["number"])
+        if issue["state"] == "closed":
+            state["issues"].pop(key, None)
+            continue
+
+        entry = state["issues"].get(key)
+        if entry and issue["updated_at"] and entry.get("updated_at") == issue["updated_at"]:
+            continue
+        yield issue
+
+
+def record_issue_result(state: dict, result: dict, offset: int):
+    """
+    Stores where an issue's result is in the results log. Failed analyses are
+    not recorded so they are retried.
+    """
+    if offset is None or result["report"].startswith("Failed"):
+        return
+    issue = result["issue"]
+    state["issues"][str(issue["number"])] = {
+        "updated_at": issue.get("updated_at"),
+        "offset": offset,
+    }
+
+
+def remap_offsets(state: dict, offsets: dict):
+    """
+    Points the stored results at their records in a compacted results log
+    ('offsets' as returned by ResultsLog.compact). Issues whose result is
+    gone from the log are dropped, so they are analyzed again.
+    """
+    state["issues"] = {
+        key: dict(entry, offset=offsets[int(key)])
+        for key, entry in state["issues"].items() if int(key) in offsets
+    }
@@ -2,16 +2,142 @@ import os
 import re
 import shutil
 import stat  
+import socket
+import tempfile
 from contextlib import contextmanager
 
 # --- Constants ---
+# Overridable with the GITHUB_API_URL environment variable (e.g. a local mock server).
+# Clones can likewise be redirected with GITHUB_CLONE_URL, e.g. 'file:///srv/mirrors/{owner}/{repo}'.
+GITHUB_API_URL = "https://api.github.com"
 WORKSPACE_DIR = "workspace"
-VECTOR_STORE_DIR = "vector_store"
+# Persistent cache for vector indexes, keyed by repo, commit, embedding model and chunking
+CACHE_DIR = "cache"
+INDEX_CACHE_MAX_BYTES = 5 * 1024 ** 3
+# Unfinished index builds older than this are taken to have crashed and are deleted
+INDEX_STAGING_MAX_AGE_SECONDS = 24 * 3600
 # Using a fast, reliable, and small embedding model
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
+# Chunking parameters (part of the index cache key). Syntax-aware chunking splits
+# source files at function / class / method boundaries; CHUNK_OVERLAP then only
+# applies to definitions longer than CHUNK_SIZE and to files of other types.
+CHUNK_SIZE = 2000
+CHUNK_OVERLAP = 200
+SYNTAX_AWARE_CHUNKING = True
+# Files larger than this are not indexed (also part of the cache key); repo mirrors
+# don't download them at all where the server supports partial clones
+INDEX_MAX_FILE_BYTES = 1024 ** 2
+# Files past this total size of a repo's indexed files are left out
+INDEX_MAX_REPO_BYTES = 256 * 1024 ** 2
+# Content heuristics of the index file filter (see file_filter): a file is minified
+# if its average line or any one line is longer than these, and encoded data (base64,
+# embedded binaries) if its bytes' Shannon entropy is at least ENCODED_MIN_ENTROPY bits
+MINIFIED_MAX_AVG_LINE_CHARS = 200
+MINIFIED_MAX_LINE_CHARS = 20000
+ENCODED_MIN_ENTROPY = 5.9
+
+# Repo loading: worker processes for reading/splitting files, and chunks per embedding batch
+LOADER_WORKERS = os.cpu_count() or 1
+LOADER_BATCH_SIZE = 512
+
+# Embedding: chunks per model batch, and CPU threads for inference (None = torch default)
+EMBED_BATCH_SIZE = 128
+EMBED_THREADS = None
+
+# Max issues in each stage of the issue pipeline at once. The LLM stages should
+# match the number of parallel requests Ollama serves (OLLAMA_NUM_PARALLEL).
+ISSUE_STAGE_CONCURRENCY = {
+    "comments": 8,
+    "classify": 2,
+    "retrieve": 2,
+    "analyze": 2,
+}
+# Issues whose title + body embeddings have at least this cosine similarity are
+# duplicates and share one classification and analysis (None: no detection)
+DUPLICATE_SIMILARITY_THRESHOLD = 0.9
+
 # Ollama model name, This MUST match the model you pulled with 'ollama pull'
 OLLAMA_MODEL = "llama3:instruct"
+# Model for the LLM tier of issue classification (None: OLLAMA_MODEL); a small one is enough
+CLASSIFY_MODEL = None
+
+# Issue classification: 'tiered' (label / template rules, then nearest-centroid on issue
+# embeddings, then the LLM) or 'llm' (every issue goes to the LLM)
+CLASSIFIER = "tiered"
+# The centroid tier answers only if the best class has this many training issues (as does
+# one other class) and beats the runner-up by this cosine margin...
+CLASSIFIER_MIN_EXAMPLES = 10
+CLASSIFIER_MARGIN = 0.05
+# ...and only once its guesses agreed with the LLM on this share of at least this many
+# issues. Every CLASSIFIER_AUDIT_EVERY-th confident guess still goes to the LLM as a check.
+CLASSIFIER_MIN_ACCURACY = 0.9
+CLASSIFIER_MIN_CHECKS = 20
+CLASSIFIER_AUDIT_EVERY = 10
+
+# How long Ollama keeps the model loaded after a request, so it stays warm between issues and repos
+OLLAMA_KEEP_ALIVE = "30m"
+
+# Context length of OLLAMA_MODEL, in tokens
+OLLAMA_NUM_CTX = 8192
+
+# Ollama options per LLM step. num_predict caps the tokens generated; analysis stops at
+# its closing tag. Keep num_ctx equal for steps that share a model: Ollama reloads the
+# model whenever num_ctx changes.
+LLM_OPTIONS = {
+    "classify": {"num_ctx": OLLAMA_NUM_CTX, "num_predict": 32},
+    "analyze": {"num_ctx": OLLAMA_NUM_CTX, "num_predict": 2048, "stop": ["</ANALYSIS>"]},
+}
+
+# FAISS index type by chunk count ('auto'): Flat below FAISS_HNSW_MIN_CHUNKS, HNSW below
+# FAISS_IVFPQ_MIN_CHUNKS, IVF-PQ above. Search knobs trade recall for query time.
+FAISS_INDEX_TYPE = "auto"
+FAISS_HNSW_MIN_CHUNKS = 50_000
+FAISS_IVFPQ_MIN_CHUNKS = 500_000
+FAISS_HNSW_M = 32
+FAISS_HNSW_EF_CONSTRUCTION = 80
+FAISS_HNSW_EF_SEARCH = 64
+FAISS_NPROBE = 16
+FAISS_PQ_DIMS_PER_SUBQUANTIZER = 8
+# IVF-PQ candidates are re-ranked with 8-bit scalar-quantized vectors (None: PQ codes only,
+# ~20x smaller than Flat but lower recall); FAISS_REFINE_K_FACTOR * k candidates are re-ranked
+FAISS_PQ_REFINE = "sq8"
+FAISS_REFINE_K_FACTOR = 4
+
+# Retrieval: chunks returned by MMR, candidates it picks from, and relevance vs. diversity weight
+RETRIEVAL_K = 12
+RETRIEVAL_FETCH_K = 40
+MMR_LAMBDA = 0.6
+# Share of the context window given to retrieved code (the rest is issue, comments, instructions and output)
+CONTEXT_TOKEN_BUDGET = OLLAMA_NUM_CTX * 3 // 8
+CHARS_PER_TOKEN = 4
+
+# LLM response cache (stored under CACHE_DIR)
+LLM_CACHE_TTL_SECONDS = 30 * 24 * 3600
+LLM_CACHE_MAX_BYTES = 512 * 1024 ** 2
+
+# GitHub HTTP (ETag) cache: pages unused for this long are dropped, and the least
+# recently used beyond the size cap
+HTTP_CACHE_TTL_SECONDS = 14 * 24 * 3600
+HTTP_CACHE_MAX_BYTES = 256 * 1024 ** 2
+
+# Results log: fsync after this many appended results or seconds, whichever comes first
+RESULTS_FSYNC_EVERY = 8
+RESULTS_FSYNC_SECONDS = 5.0
+# While an analysis streams in, its text so far is logged this often (seconds)
+RESULTS_PARTIAL_SECONDS = 10.0
+
+# Analyzer service: listen address, job worker threads, queued jobs before requests
+# are turned away (HTTP 503), and finished jobs kept for status queries
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SERVICE_WORKERS = 4
+SERVICE_QUEUE_SIZE = 100
+SERVICE_JOB_HISTORY = 1000
+# Latest samples per span / LLM step the service's /metrics quantiles cover
+SERVICE_METRICS_WINDOW = 1024
+# The service rewrites a repo's results log without superseded records after this many appends
+SERVICE_RESULTS_COMPACT_EVERY = 500
 
 
 # --- Functions ---
@@ -46,19 +172,41 @@ def on_rmtree_error(func, path, exc_info):
         raise
 
 
+def write_file_atomic(path: str, text: str):
+    """
+    Replaces the file at 'path' with 'text' in one step. The text is written
+    to a uniquely named temporary file next to it first, so concurrent writers
+    never share a temporary file; the last one to finish wins.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        # mkstemp creates files readable only by their owner
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
 @contextmanager
-def temp_repo_clone(repo_url: str, repo_path: str):
+def temp_repo_checkout(mirror, commit_sha: str, repo_path: str):
     """
-    Context manager to clone a repo, close its handle, and clean it up.
+    Context manager that checks out a repo mirror's commit at repo_path
+    (see repo_mirror.checkout_mirror), yields the checkout's Repo object, and
+    cleans the checkout up. The mirror itself is kept for the next run.
     """
-    from .github_client import clone_repo  # Local import to avoid circularity
-    
+    from .repo_mirror import checkout_mirror, remove_checkout  # Local import to avoid circularity
+
     repo = None
-    print(f"Cloning repository {repo_url} to {repo_path}...")
     try:
-        # 1. Clone the repo and get the Repo object
-        repo = clone_repo(repo_url, repo_path)
-        yield repo_path
+        # 1. Check out the files to index and get the Repo object
+        repo = checkout_mirror(mirror, commit_sha, repo_path)
+        yield repo
     finally:
         # 2. Explicitly close the Repo object handle
         if repo:
@@ -66,26 +214,62 @@ def temp_repo_clone(repo_url: str, repo_path: str):
             print("GitPython repo handle closed.")
             
         print(f"Cleaning up repository at {repo_path}...")
-        if os.path.exists(repo_path):
-            # 3. Use the robust on_rmtree_error handler
-            try:
-                shutil.rmtree(repo_path, onerror=on_rmtree_error)
-            except Exception as e:
-                print(f"Warning: Could not automatically clean up {repo_path}. Error: {e}")
-                print("You may need to manually delete this folder.")
+        try:
+            # 3. Removes the files with the robust on_rmtree_error handler
+            remove_checkout(mirror, repo_path)
+        except Exception as e:
+            print(f"Warning: Could not automatically clean up {repo_path}. Error: {e}")
+            print("You may need to manually delete this folder.")
+
+
+def pid_alive(pid: int) -> bool:
+    """
+    Whether a process with this ID runs on this host. Always True on Windows,
+    where os.kill can't probe processes.
+    """
+    if os.name == "nt":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # Exists, but belongs to another user
+    return True
+
+
+def get_workspace_dir() -> str:
+    """
+    This process's checkout directory under WORKSPACE_DIR, so processes
+    sharing a workspace (the service and a CLI or batch run) never check out
+    into, or clean up, each other's paths.
+    """
+    return os.path.join(WORKSPACE_DIR, f"{socket.gethostname()}-{os.getpid()}")
 
             
 def clean_workspace():
-    """Removes the workspace and vector store directories."""
-    print("Cleaning up workspace and vector store...")
-    if os.path.exists(WORKSPACE_DIR):
-        try:
-            shutil.rmtree(WORKSPACE_DIR, onerror=on_rmtree_error)
-        except Exception as e:
-            print(f"Warning: Could not clean up {WORKSPACE_DIR}. Error: {e}")
-    if os.path.exists(VECTOR_STORE_DIR):
-        try:
-            shutil.rmtree(VECTOR_STORE_DIR, onerror=on_rmtree_error)
-        except Exception as e:
-            print(f"Warning: Could not clean up {VECTOR_STORE_DIR}. Error: {e}")
+    """
+    Removes this process's workspace directory, and those left behind by
+    processes on this host that are no longer running. The index cache is
+    kept across runs.
+    """
+    print("Cleaning up workspace...")
+    own = get_workspace_dir()
+    paths = [own]
+    host = socket.gethostname()
+    if os.path.isdir(WORKSPACE_DIR):
+        for name in os.listdir(WORKSPACE_DIR):
+            name_host, _, pid = name.rpartition("-")
+            if name_host == host and pid.isdigit() and not pid_alive(int(pid)):
+                paths.append(os.path.join(WORKSPACE_DIR, name))
+    for path in paths:
+        if os.path.exists(path):
+            try:
+                shutil.rmtree(path, onerror=on_rmtree_error)
+            except Exception as e:
+                print(f"Warning: Could not clean up {path}. Error: {e}")
+    try:
+        os.rmdir(WORKSPACE_DIR)  # Only if no other process has a checkout in it
+    except OSError:
+        pass
     print("Cleanup complete.")
\ No newline at end of file
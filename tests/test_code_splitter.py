@@ -0,0 +1,81 @@
+import pytest
+
+from src.code_splitter import split_code
+from src.utils import CHUNK_SIZE
+
+
+def _check_chunks(text: str, chunks: list):
+    """
+    Every chunk is a slice of the file at its start index with matching
+    line numbers, no chunk is over CHUNK_SIZE, and together the chunks
+    cover every non-whitespace character of the file.
+    """
+    covered = [False] * len(text)
+    for chunk_text, start, metadata in chunks:
+        assert text[start:start + len(chunk_text)] == chunk_text
+        assert len(chunk_text) <= CHUNK_SIZE
+        assert metadata["start_line"] == text.count("\n", 0, start) + 1
+        assert metadata["end_line"] == text.count("\n", 0, start + len(chunk_text) - 1) + 1
+        covered[start:start + len(chunk_text)] = [True] * len(chunk_text)
+    missing = [i for i, char in enumerate(text) if not char.isspace() and not covered[i]]
+    assert not missing, f"uncovered text: {text[missing[0]:missing[0] + 40]!r}"
+
+
+def _python_module(functions: int, body_lines: int) -> str:
+    parts = ['"""Module docstring."""\nimport os\n\nLIMIT = 10\n']
+    for n in range(functions):
+        body = "".join(f"    value_{i} = os.path.join('a', '{n}', '{i}')\n" for i in range(body_lines))
+        parts.append(f"\n# Helper {n}\n@cached\ndef func_{n}(x):\n{body}    return x\n")
+    parts.append("\nclass Widget:\n    size = 3\n\n    def grow(self):\n        return self.size + 1\n")
+    parts.append("\nif __name__ == '__main__':\n    func_0(1)\n")
+    return "".join(parts)
+
+
+@pytest.mark.parametrize("functions, body_lines", [(3, 2), (40, 5), (2, 120)])
+def test_python_chunks_cover_the_file(functions, body_lines):
+    text = _python_module(functions, body_lines)
+    _check_chunks(text, split_code(text, ".py"))
+
+
+def test_small_definitions_are_packed_with_their_symbols():
+    text = _python_module(3, 2)
+    chunks = split_code(text, ".py")
+    assert len(chunks) == 1
+    assert chunks[0][2]["symbols"] == ["func_0", "func_1", "func_2", "Widget", "Widget.grow"]
+
+
+def test_comments_and_decorators_stay_with_their_definition():
+    text = _python_module(40, 5)
+    chunks = split_code(text, ".py")
+    for n in range(40):
+        chunk_text = next(c for c, _, metadata in chunks if f"func_{n}" in metadata["symbols"])
+        assert f"# Helper {n}\n@cached\ndef func_{n}(x):" in chunk_text
+
+
+def test_large_definition_is_split_and_keeps_its_symbol():
+    text = _python_module(2, 120)
+    chunks = split_code(text, ".py")
+    assert chunks[0][2]["symbols"] == []  # the module header
+    assert [metadata["symbols"][0] for _, _, metadata in chunks[1:]] == ["func_0"] * 3 + ["func_1"] * 3
+
+
+def test_braced_language_chunks_cover_the_file():
+    functions = "".join(
+        f"// Adds {n}\nfunction add{n}(a) {{\n" + "  a += 1;\n" * 30 + "  return a;\n}\n\n" for n in range(30)
+    )
+    text = "'use strict';\nconst base = 1;\n\n" + functions + "module.exports = { add0 };\n"
+    chunks = split_code(text, ".js")
+    _check_chunks(text, chunks)
+    assert "add29" in {symbol for _, _, metadata in chunks for symbol in metadata["symbols"]}
+
+
+@pytest.mark.parametrize("text, ext", [
+    ("plain words\n" * 500, ".txt"),
+    ("x = 1\n" * 600, ".py"),  # no definitions
+    ("", ".py"),
+    ("\n\n   \n", ".py"),
+])
+def test_files_without_definitions_are_covered(text, ext):
+    chunks = split_code(text, ext)
+    _check_chunks(text, chunks)
+    assert all(metadata["symbols"] == [] for _, _, metadata in chunks)
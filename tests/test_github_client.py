@@ -0,0 +1,136 @@
+import os
+import datetime
+
+from benchmarks.fake_servers import FakeGitHub
+from src.github_client import GitHubClient, issue_from_json, changed_files_between
+
+BASE = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _time(hours: float) -> str:
+    return (BASE + datetime.timedelta(hours=hours)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _issue(number: int, created_hours: float, comments: int) -> dict:
+    return {
+        "number": number,
+        "title": f"Issue {number}",
+        "body": "",
+        "html_url": f"https://github.com/o/r/issues/{number}",
+        "state": "open",
+        "labels": [],
+        "comments": comments,
+        "created_at": _time(created_hours),
+        "updated_at": _time(created_hours),
+    }
+
+
+def _comments(number: int, count: int, first_hours: float) -> list:
+    return [{
+        "issue_url": f"https://api.github.com/repos/o/r/issues/{number}",
+        "user": {"login": f"user{i}"},
+        "body": f"comment {i} on {number}",
+        "created_at": _time(first_hours + i / 60),
+    } for i in range(count)]
+
+
+def _fetch(server: FakeGitHub, numbers: list) -> tuple[list, int]:
+    """
+    Runs fetch_comments_bulk for the given issues of the server. Returns the
+    issue dicts and the number of requests it made.
+    """
+    client = GitHubClient(token="test", api_url=server.url)
+    issues = [issue_from_json(item) for item in server.issues if item["number"] in numbers]
+    before = server.requests
+    client.fetch_comments_bulk("o", "r", issues)
+    return issues, server.requests - before
+
+
+def test_bulk_comments_match_per_issue_fetches():
+    issues = [_issue(1, 0, 3), _issue(2, 1, 0), _issue(3, 2, 2), _issue(4, 3, 1)]
+    comments = _comments(1, 3, 10) + _comments(3, 2, 11) + _comments(4, 1, 12)
+    with FakeGitHub(issues, comments) as server:
+        fetched, requests = _fetch(server, [1, 2, 3, 4])
+        client = GitHubClient(token="test", api_url=server.url)
+        for issue in fetched:
+            # Oldest first, like the per-issue listing
+            assert issue["comments"] == client.fetch_issue_comments("o", "r", issue["number"])
+    assert [len(issue["comments"]) for issue in fetched] == [3, 0, 2, 1]
+    assert requests == 1
+
+
+def test_bulk_comments_stop_once_every_issue_is_covered():
+    issues = [_issue(n, n, 2) for n in range(1, 4)] + [_issue(4, 0.5, 300)]
+    # Issue 4's comments are older than those of the issues asked for, so they come last
+    comments = _comments(4, 300, 1) + [c for n in range(1, 4) for c in _comments(n, 2, 20 + n)]
+    with FakeGitHub(issues, comments) as server:
+        fetched, requests = _fetch(server, [1, 2, 3])
+    assert all(len(issue["comments"]) == 2 for issue in fetched)
+    assert requests == 1
+
+
+def test_bulk_comments_page_limit_leaves_the_rest_for_per_issue_fetches():
+    # Newest first the listing holds issue 3's comment, issue 2's 199 and then
+    # issue 1's: three pages, but three issues allow only two
+    issues = [_issue(1, 0, 1), _issue(2, 1, 199), _issue(3, 2, 1)]
+    comments = _comments(1, 1, 3) + _comments(2, 199, 4) + _comments(3, 1, 10)
+    with FakeGitHub(issues, comments) as server:
+        fetched, requests = _fetch(server, [1, 2, 3])
+    by_number = {issue["number"]: issue for issue in fetched}
+    assert by_number[1]["comments"] is None
+    assert len(by_number[2]["comments"]) == 199
+    assert len(by_number[3]["comments"]) == 1
+    assert requests == 2
+
+
+def test_bulk_comments_skipped_when_a_single_issue_has_comments():
+    issues = [_issue(1, 0, 2), _issue(2, 1, 0)]
+    with FakeGitHub(issues, _comments(1, 2, 5)) as server:
+        fetched, requests = _fetch(server, [1, 2])
+    by_number = {issue["number"]: issue for issue in fetched}
+    assert by_number[1]["comments"] is None
+    assert by_number[2]["comments"] == []
+    assert requests == 0
+
+
+def _commit(repo, files: dict, message: str) -> str:
+    """
+    Writes 'files' (path -> content, None to delete) and commits them. Returns the sha.
+    """
+    for path, content in files.items():
+        full_path = os.path.join(repo.working_tree_dir, path)
+        if content is None:
+            repo.index.remove([path], working_tree=True)
+            continue
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        repo.index.add([path])
+    return repo.index.commit(message).hexsha
+
+
+def test_changed_files_between_renames(tmp_path):
+    from git import Repo
+
+    repo = Repo.init(tmp_path)
+    body = "".join(f"def f{i}():\n    return {i}\n\n" for i in range(50))
+    old = _commit(repo, {"src/old.py": body, "src/keep.py": "x = 1\n", "src/gone.py": "y = 2\n"}, "old")
+    _commit(repo, {"src/old.py": None, "src/new.py": body}, "rename")
+    new = _commit(repo, {"src/keep.py": "x = 3\n", "src/gone.py": None, "src/added.py": "z = 4\n"}, "edit")
+
+    removed, changed = changed_files_between(repo, old, new)
+    assert removed == {"src/old.py", "src/keep.py", "src/gone.py"}
+    assert changed == {"src/new.py", "src/keep.py", "src/added.py"}
+
+
+def test_changed_files_between_rename_with_edits(tmp_path):
+    from git import Repo
+
+    repo = Repo.init(tmp_path)
+    body = "".join(f"def f{i}():\n    return {i}\n\n" for i in range(50))
+    old = _commit(repo, {"a/module.py": body}, "old")
+    new = _commit(repo, {"a/module.py": None, "b/module.py": body + "def extra():\n    pass\n"}, "move")
+
+    removed, changed = changed_files_between(repo, old, new)
+    assert removed == {"a/module.py"}
+    assert changed == {"b/module.py"}
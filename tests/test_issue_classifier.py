@@ -0,0 +1,77 @@
+import pytest
+
+from src.issue_classifier import rule_type
+
+
+def _issue(title: str, body: str = "", labels: list = None) -> dict:
+    return {"title": title, "body": body, "labels": labels or []}
+
+
+@pytest.mark.parametrize("labels, expected", [
+    (["bug"], "BUG"),
+    (["type: regression"], "BUG"),
+    (["kind/enhancement"], "FEATURE"),
+    (["Question"], "QUESTION"),
+    (["announcement"], "ANNOUNCEMENT"),
+    (["bug", "crash"], "BUG"),
+])
+def test_labels(labels, expected):
+    assert rule_type(_issue("Something happened", labels=labels)) == expected
+
+
+@pytest.mark.parametrize("labels", [["not a bug"], ["invalid: bug"], ["wontfix", "no-bug"]])
+def test_negated_labels_are_ignored(labels):
+    assert rule_type(_issue("Something happened", labels=labels)) is None
+
+
+def test_conflicting_labels_fall_through_to_the_title():
+    assert rule_type(_issue("[Feature] dark mode", labels=["bug", "enhancement"])) == "FEATURE"
+
+
+@pytest.mark.parametrize("title, expected", [
+    ("[Bug] parser crashes on empty input", "BUG"),
+    ("Bug report: wrong exit code", "BUG"),
+    ("Regression - slow startup", "BUG"),
+    ("Feature request: dark mode", "FEATURE"),
+    ("[RFC] plugin API", "FEATURE"),
+    ("[Question] how are retries configured", "QUESTION"),
+    ("How do I disable the cache?", "QUESTION"),
+    ("Is there a way to skip forks?", "QUESTION"),
+    ("ANN: version 2.0 released", "ANNOUNCEMENT"),
+])
+def test_title_prefixes(title, expected):
+    assert rule_type(_issue(title)) == expected
+
+
+@pytest.mark.parametrize("title", [
+    "Parser crashes on empty input",
+    "Bugfix for the parser",
+    "How do I disable the cache",  # not a question without the '?'
+    "The feature works great",
+])
+def test_titles_without_a_prefix(title):
+    assert rule_type(_issue(title)) is None
+
+
+@pytest.mark.parametrize("body, expected", [
+    ("**Describe the bug**\nIt fails.\n\n**Steps to reproduce**\n1. Run it", "BUG"),
+    ("Traceback (most recent call last):\n  File \"x.py\", line 1", "BUG"),
+    ("panic: runtime error: index out of range", "BUG"),
+    ("**Is your feature request related to a problem?**\nNo.", "FEATURE"),
+])
+def test_issue_templates(body, expected):
+    assert rule_type(_issue("Something happened", body)) == expected
+
+
+def test_labels_win_over_title_and_body():
+    issue = _issue("[Bug] it is slow", "Describe the solution you'd like", labels=["enhancement"])
+    assert rule_type(issue) == "FEATURE"
+
+
+def test_mixed_template_is_undecided():
+    body = "Describe the bug\n\nDescribe the solution you'd like"
+    assert rule_type(_issue("Something happened", body)) is None
+
+
+def test_missing_body_and_labels():
+    assert rule_type({"title": "Something happened", "body": None}) is None
@@ -0,0 +1,101 @@
+from src.results_log import ResultsLog, iter_results, read_result, completed_issue_numbers
+from src.scan_state import record_issue_result, remap_offsets
+
+
+def _result(number: int, report: str = "ok", updated_at: str = "2024-01-01T00:00:00+00:00") -> dict:
+    return {"issue": {"number": number, "updated_at": updated_at}, "report": report}
+
+
+def test_append_returns_offsets_of_the_records(tmp_path):
+    path = str(tmp_path / "results" / "o__r.jsonl")
+    log = ResultsLog(path)
+    offsets = [log.append(_result(n, f"report {n} ✓")) for n in range(1, 4)]
+    assert offsets[0] == 0
+    assert log.end_offset() > offsets[-1]
+    log.close()
+
+    for n, offset in zip(range(1, 4), offsets):
+        assert read_result(path, offset) == _result(n, f"report {n} ✓")
+    assert [offset for offset, _ in iter_results(path)] == offsets
+    assert log.append(_result(4)) is None
+
+
+def test_resume_after_a_torn_write(tmp_path):
+    path = str(tmp_path / "o__r.jsonl")
+    log = ResultsLog(path)
+    log.append(_result(1))
+    log.append(_result(2, "Failed to analyze: timeout"))
+    log.close()
+    with open(path, "ab") as f:
+        f.write(b'{"issue": {"number": 3}, "rep')  # killed mid-write
+
+    assert completed_issue_numbers(path) == {1}
+    log = ResultsLog(path)
+    offset = log.append(_result(2))
+    log.append(_result(3))
+    log.close()
+
+    assert read_result(path, offset) == _result(2)
+    assert completed_issue_numbers(path) == {1, 2, 3}
+    assert [result["issue"]["number"] for _, result in iter_results(path)] == [1, 2, 2, 3]
+
+
+def test_completed_issue_numbers_from_the_run_start(tmp_path):
+    path = str(tmp_path / "o__r.jsonl")
+    log = ResultsLog(path)
+    log.append(_result(1))
+    log.append(_result(2))
+    run_start = log.end_offset()
+    log.append(_result(2, "Failed to analyze: timeout"))  # a later failure is retried
+    log.append(_result(3))
+    log.close()
+
+    assert completed_issue_numbers(path) == {1, 3}
+    assert completed_issue_numbers(path, run_start) == {3}
+
+
+def test_compact_keeps_the_latest_and_latest_successful_records(tmp_path):
+    path = str(tmp_path / "o__r.jsonl")
+    log = ResultsLog(path)
+    log.append(_result(1, "first"))
+    log.append(_result(2, "first"))
+    log.append(_result(1, "second"))
+    log.append(_result(2, "Failed to analyze: timeout"))
+    log.append(_result(3, "Failed to analyze: timeout"))
+    offsets = log.compact()
+
+    kept = [(result["issue"]["number"], result["report"]) for _, result in iter_results(path)]
+    assert kept == [(2, "first"), (1, "second"), (2, "Failed to analyze: timeout"),
+                    (3, "Failed to analyze: timeout")]
+    assert set(offsets) == {1, 2}
+    assert read_result(path, offsets[1])["report"] == "second"
+    assert read_result(path, offsets[2])["report"] == "first"
+    assert log.appended == 0
+
+    # Appends continue at the end of the compacted log
+    offset = log.append(_result(3, "third"))
+    log.close()
+    assert read_result(path, offset) == _result(3, "third")
+    assert completed_issue_numbers(path) == {1, 3}
+
+
+def test_scan_state_offsets_follow_compaction(tmp_path):
+    path = str(tmp_path / "o__r.jsonl")
+    state = {"issues": {}}
+    log = ResultsLog(path)
+    for n in range(1, 4):
+        result = _result(n, f"report {n}")
+        record_issue_result(state, result, log.append(result))
+    result = _result(2, "report 2 again")
+    record_issue_result(state, result, log.append(result))
+    failed = _result(3, "Failed to analyze: timeout")
+    record_issue_result(state, failed, log.append(failed))
+
+    # Issue 4 points into a log that no longer holds it
+    state["issues"]["4"] = {"updated_at": None, "offset": 10_000}
+    remap_offsets(state, log.compact())
+    log.close()
+
+    assert set(state["issues"]) == {"1", "2", "3"}
+    for key, report in (("1", "report 1"), ("2", "report 2 again"), ("3", "report 3")):
+        assert read_result(path, state["issues"][key]["offset"])["report"] == report